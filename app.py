@@ -3,13 +3,14 @@ import sqlalchemy
 from flask import Flask, redirect
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 from src.models import db
 from src.routes import init_app
 from flasgger import Swagger
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime, UTC
-from src.models.listing_model import Listing
+from src.schedulers import register_jobs, scheduler_mode
+from src.schedulers.notification_dispatcher import init_notification_dispatcher
 
 load_dotenv()
 
@@ -39,6 +40,20 @@ def create_app():
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'uploads')
+    # Reverse proxies in front of the app; 1 is Azure App Service's front end. Their X-Forwarded-For
+    # entries give request.remote_addr, which rate limits key on. Set 0 only when clients connect
+    # directly, or every client would share the proxy's address and its rate limits
+    trusted_proxy_hops = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+    if trusted_proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_hops, x_proto=trusted_proxy_hops)
+    # Verification codes live in the database so every worker sees the same state
+    app.config['EXPIRING_STORE'] = os.getenv("EXPIRING_STORE", "sql")
+    # API rate limit buckets stay in each worker's memory; "sql" shares them at one transaction per request
+    app.config['RATE_LIMIT_STORE'] = os.getenv("RATE_LIMIT_STORE", "memory")
+    # Seconds cart items keep their stock set aside; 0 leaves stock untouched until checkout
+    app.config['STOCK_HOLD_SECONDS'] = int(os.getenv("STOCK_HOLD_SECONDS", "0"))
+    # Seconds a serialized cart is cached per worker; 0 reads it from the database every time
+    app.config['CART_CACHE_SECONDS'] = int(os.getenv("CART_CACHE_SECONDS", "0"))
 
     app.config['JWT_SECRET_KEY'] = required_env_vars['JWT_SECRET_KEY']
     JWTManager(app)
@@ -47,6 +62,13 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        try:
+            from src.models import UserCart
+            removed = UserCart.ensure_unique_index()
+            if removed is not None:
+                print(f"Added the unique cart index, merging {removed} duplicate cart rows")
+        except Exception as e:
+            print(f"Error adding the unique cart index: {e}")
         try:
             from src.services.achievement_service import AchievementService
             AchievementService.initialize_achievements()
@@ -111,27 +133,14 @@ def create_app():
 
     Swagger(app, config=swagger_config)
 
-    def update_all_listings():
-        with app.app_context():
-            try:
-                listings = Listing.query.filter(Listing.expires_at > datetime.now(UTC)).all()
-                for listing in listings:
-                    listing.update_expiry()
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error updating listings: {str(e)}")
-
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        func=update_all_listings,
-        trigger='interval',
-        hours=2,
-        id='update_listings_job',
-        name='Update listings fresh score and consume within time',
-        replace_existing=True
-    )
-    scheduler.start()
+    mode = scheduler_mode()
+    if mode != 'off':
+        scheduler = BackgroundScheduler()
+        register_jobs(app, scheduler, shared=mode == 'embedded', local=True)
+        scheduler.start()
+
+    # Push notifications are queued in the outbox and delivered by this worker pool
+    init_notification_dispatcher(app)
 
     init_app(app)
 
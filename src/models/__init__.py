@@ -18,6 +18,13 @@ from .achievement_model import Achievement, UserAchievement, AchievementType
 from .comment_badges_model import CommentBadge
 from .restaurant_punishment_model import RestaurantPunishment, RefundRecord
 from .enviromental_contribution_model import EnvironmentalContribution
+from .item_similarity_model import ItemSimilarity
+from .scheduler_lease_model import SchedulerLease
+from .notification_outbox_model import NotificationOutbox
+from .expiring_entry_model import ExpiringEntry
+from .stock_hold_model import StockHold
+from .sales_rollup_model import SalesRollup
+from .hourly_sales_model import HourlySales
 
 __all__ = [
     'db',
@@ -41,4 +48,11 @@ __all__ = [
     'RestaurantPunishment',
     'RefundRecord',
     'EnvironmentalContribution',
+    'ItemSimilarity',
+    'SchedulerLease',
+    'NotificationOutbox',
+    'ExpiringEntry',
+    'StockHold',
+    'SalesRollup',
+    'HourlySales',
 ]
\ No newline at end of file
@@ -3,6 +3,11 @@ from sqlalchemy import Integer, String, DECIMAL, Boolean, CheckConstraint
 
 class CustomerAddress(db.Model):
     __tablename__ = 'customeraddresses'
+
+    __table_args__ = (
+        db.Index('idx_customeraddress_lat_lon', 'latitude', 'longitude'),
+    )
+
     id = db.Column(Integer, primary_key=True, autoincrement=True, nullable=False)
     user_id = db.Column(Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(String(80), nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import String, Float, Text
+from . import db
+
+
+class ExpiringEntry(db.Model):
+    """
+    Row of the shared expiring key-value store used for verification codes and rate
+    limits. A key holds either a ``value`` or a token bucket (``tokens`` as of
+    ``updated_at``). Times are epoch seconds so every dialect compares them the same way.
+    """
+    __tablename__ = 'expiring_entries'
+
+    key = db.Column(String(255), primary_key=True)
+    value = db.Column(Text, nullable=True)
+    tokens = db.Column(Float, nullable=True)
+    updated_at = db.Column(Float, nullable=True)
+    expires_at = db.Column(Float, nullable=False, index=True)
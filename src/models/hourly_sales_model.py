@@ -0,0 +1,25 @@
+from datetime import datetime, UTC
+from sqlalchemy import Integer, ForeignKey, DECIMAL, DateTime
+from . import db
+
+
+class HourlySales(db.Model):
+    """
+    Completed sales of a restaurant in one hour (UTC, like ``Purchase.purchase_date``).
+    The finest bucket of the sales time series; kept current and rebuilt together with
+    the ``SalesRollup`` rows by ``sales_rollup_service``.
+    """
+    __tablename__ = 'hourly_sales'
+
+    __table_args__ = (
+        db.Index('uq_hourly_sales_restaurant_hour', 'restaurant_id', 'hour_start', unique=True),
+    )
+
+    id = db.Column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id = db.Column(Integer, ForeignKey('restaurants.id'), nullable=False)
+    hour_start = db.Column(DateTime, nullable=False)
+
+    orders = db.Column(Integer, nullable=False, default=0)
+    units = db.Column(Integer, nullable=False, default=0)
+    revenue = db.Column(DECIMAL(14, 2), nullable=False, default=0)
+    updated_at = db.Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
@@ -0,0 +1,20 @@
+from sqlalchemy import Integer, String, Float, DateTime
+from . import db
+from datetime import datetime, UTC
+
+
+class ItemSimilarity(db.Model):
+    """Precomputed top-K neighbors of an item ('listing' or 'restaurant'), one row per neighbor."""
+    __tablename__ = 'item_similarities'
+
+    id = db.Column(Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(String(20), nullable=False)
+    item_id = db.Column(Integer, nullable=False)
+    similar_item_id = db.Column(Integer, nullable=False)
+    rank = db.Column(Integer, nullable=False)
+    score = db.Column(Float, nullable=False)
+    computed_at = db.Column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        db.Index('idx_item_similarity_kind_item', 'kind', 'item_id', 'rank'),
+    )
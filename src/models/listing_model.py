@@ -1,7 +1,59 @@
+from collections import namedtuple
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from . import db, Restaurant
-from sqlalchemy import Integer, String, ForeignKey, DECIMAL, DateTime, Float
+from sqlalchemy import Integer, String, ForeignKey, DECIMAL, DateTime, Float, case, func, literal
 from datetime import datetime, timedelta, UTC
+import numpy as np
+from src.utils.sql_functions import seconds_between
+
+# Below this many hours left, consume_within is reported in hours instead of days
+CONSUME_WITHIN_HOURS_LIMIT = 12
+# update_count counts the freshness steps of this length since the listing was created
+FRESHNESS_STEP_HOURS = 2
+
+Freshness = namedtuple('Freshness', ['fresh_score', 'consume_within', 'consume_within_type', 'update_count'])
+
+
+def _epoch_seconds(value):
+    # SQLite hands back naive datetimes; every stored timestamp is UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+def freshness_arrays(created_at, expires_at, now=None):
+    """
+    Vectorized freshness of many listings at ``now``.
+
+    ``fresh_score`` is the share of the listing's lifetime still left, as a percentage,
+    and ``consume_within`` the time left in hours below 12 hours and in days otherwise.
+    Returns a ``Freshness`` of arrays aligned with the inputs.
+    """
+    now = _epoch_seconds(now or datetime.now(UTC))
+    created = np.fromiter((_epoch_seconds(value) for value in created_at), dtype=np.float64)
+    expires = np.fromiter((_epoch_seconds(value) for value in expires_at), dtype=np.float64)
+
+    lifetime = expires - created
+    seconds_left = np.clip(expires - now, 0, None)
+    scores = np.zeros_like(seconds_left)
+    np.divide(100.0 * seconds_left, lifetime, out=scores, where=lifetime > 0)
+
+    in_hours = seconds_left < CONSUME_WITHIN_HOURS_LIMIT * 3600
+    # Half-up rounding, the same as SQL ROUND
+    consume_within = np.floor(np.where(in_hours, seconds_left / 3600, seconds_left / 86400) + 0.5)
+    update_count = np.floor(np.clip(now - created, 0, None) / (FRESHNESS_STEP_HOURS * 3600))
+
+    return Freshness(
+        fresh_score=np.clip(scores, 0, 100),
+        consume_within=consume_within.astype(np.int64),
+        consume_within_type=np.where(in_hours, 'HOURS', 'DAYS'),
+        update_count=update_count.astype(np.int64)
+    )
+
+
+def _now_literal():
+    return literal(datetime.now(UTC), type_=DateTime(timezone=True))
 
 
 class Listing(db.Model):
@@ -45,7 +97,63 @@ class Listing(db.Model):
         cls.sync_availability(listing, restaurant)
         return listing
 
+    def freshness(self, now=None):
+        """``Freshness`` of this listing at ``now``, computed from its creation and expiry times."""
+        values = freshness_arrays([self.created_at], [self.expires_at], now)
+        return Freshness(
+            fresh_score=float(values.fresh_score[0]),
+            consume_within=int(values.consume_within[0]),
+            consume_within_type=str(values.consume_within_type[0]),
+            update_count=int(values.update_count[0])
+        )
+
+    @hybrid_property
+    def current_fresh_score(self):
+        return self.freshness().fresh_score
+
+    @current_fresh_score.expression
+    def current_fresh_score(cls):
+        lifetime = seconds_between(cls.created_at, cls.expires_at)
+        seconds_left = seconds_between(_now_literal(), cls.expires_at)
+        return case(
+            (seconds_left <= 0, 0.0),
+            (lifetime <= 0, 0.0),
+            else_=100.0 * seconds_left / lifetime
+        )
+
+    @hybrid_property
+    def current_consume_within(self):
+        return self.freshness().consume_within
+
+    @current_consume_within.expression
+    def current_consume_within(cls):
+        seconds_left = seconds_between(_now_literal(), cls.expires_at)
+        return case(
+            (seconds_left <= 0, 0),
+            (seconds_left < CONSUME_WITHIN_HOURS_LIMIT * 3600, func.round(seconds_left / 3600.0, 0)),
+            else_=func.round(seconds_left / 86400.0, 0)
+        )
+
+    @hybrid_property
+    def current_consume_within_type(self):
+        return self.freshness().consume_within_type
+
+    @current_consume_within_type.expression
+    def current_consume_within_type(cls):
+        seconds_left = seconds_between(_now_literal(), cls.expires_at)
+        return case((seconds_left < CONSUME_WITHIN_HOURS_LIMIT * 3600, 'HOURS'), else_='DAYS')
+
+    @hybrid_property
+    def current_update_count(self):
+        return self.freshness().update_count
+
+    @current_update_count.expression
+    def current_update_count(cls):
+        elapsed = seconds_between(cls.created_at, _now_literal())
+        return case((elapsed <= 0, 0), else_=func.floor(elapsed / (FRESHNESS_STEP_HOURS * 3600.0)))
+
     def to_dict(self):
+        freshness = self.freshness()
         return {
             "id": self.id,
             "restaurant_id": self.restaurant_id,
@@ -56,28 +164,16 @@ class Listing(db.Model):
             "original_price": float(self.original_price),
             "pick_up_price": float(self.pick_up_price) if self.pick_up_price is not None else None,
             "delivery_price": float(self.delivery_price) if self.delivery_price is not None else None,
-            "consume_within": self.consume_within,
-            "consume_within_type": self.consume_within_type,
+            "consume_within": freshness.consume_within,
+            "consume_within_type": freshness.consume_within_type,
             "expires_at": self.expires_at.strftime("%Y-%m-%d %H:%M:%S"),
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "update_count": self.update_count,
-            "fresh_score": round(self.fresh_score, 2),
+            "update_count": freshness.update_count,
+            "fresh_score": round(freshness.fresh_score, 2),
             "available_for_pickup": self.available_for_pickup,
             "available_for_delivery": self.available_for_delivery
         }
 
-    def decrease_stock(self, quantity):
-        if self.count < quantity:
-            return False
-        self.count -= quantity
-        if self.count == 0:
-            restaurant = Restaurant.query.get(self.restaurant_id)
-            if restaurant and restaurant.listings > 0:
-                restaurant.listings -= 1
-                db.session.add(restaurant)
-        db.session.add(self)
-        return True
-
     def reject_associated_purchases(self):
         from .purchase_model import PurchaseStatus, Purchase
         active_purchases = Purchase.query.filter(
@@ -131,6 +227,9 @@ class Listing(db.Model):
             if not listing:
                 return False, "Listing not found"
             listing.reject_associated_purchases()
+            # Holds reference the listing; their units go with it
+            from .stock_hold_model import StockHold
+            StockHold.query.filter_by(listing_id=listing.id).delete(synchronize_session=False)
             db.session.delete(listing)
             db.session.commit()
             return True, "Listing deleted successfully"
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, UTC
+from sqlalchemy import Integer, String, DateTime, Text, Boolean
+from . import db
+
+
+class NotificationOutbox(db.Model):
+    """
+    Push notification waiting to be delivered.
+
+    Rows are added in the same transaction as the change they announce and delivered
+    afterwards by the notification workers, so no push I/O happens while a request is
+    being served. ``nearby`` rows have no ``user_id``; they go to every user whose
+    primary address lies within the circle stored in ``options``. ``tickets`` maps the
+    Expo ticket ids of a row to the device tokens they were sent to, so a retry skips
+    those tokens and the delivery receipts can be checked later.
+    """
+    __tablename__ = 'notification_outbox'
+
+    PENDING = 'PENDING'
+    PROCESSING = 'PROCESSING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+
+    CHANNEL_EXPO = 'expo'
+    CHANNEL_WEB = 'web'
+    CHANNEL_NEARBY = 'nearby'
+
+    id = db.Column(Integer, primary_key=True)
+    channel = db.Column(String(10), nullable=False, default=CHANNEL_EXPO)
+    user_id = db.Column(Integer, db.ForeignKey('users.id'), nullable=True)
+    title = db.Column(String(255), nullable=False)
+    body = db.Column(Text, nullable=False)
+    data = db.Column(Text, nullable=True)
+    options = db.Column(Text, nullable=True)
+
+    status = db.Column(String(20), nullable=False, default=PENDING)
+    attempts = db.Column(Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
+    locked_by = db.Column(String(255), nullable=True)
+    locked_until = db.Column(DateTime(timezone=True), nullable=True)
+    last_error = db.Column(Text, nullable=True)
+
+    created_at = db.Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
+    sent_at = db.Column(DateTime(timezone=True), nullable=True)
+    tickets = db.Column(Text, nullable=True)
+    receipts_checked = db.Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.Index('idx_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+    @property
+    def payload_data(self):
+        return json.loads(self.data) if self.data else {}
+
+    @property
+    def payload_options(self):
+        return json.loads(self.options) if self.options else {}
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "channel": self.channel,
+            "user_id": self.user_id,
+            "title": self.title,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "sent_at": self.sent_at.strftime("%Y-%m-%d %H:%M:%S") if self.sent_at else None
+        }
@@ -9,6 +9,10 @@ from .restaurant_punishment_model import RestaurantPunishment
 class Restaurant(db.Model):
     __tablename__ = 'restaurants'
 
+    __table_args__ = (
+        db.Index('idx_restaurant_lat_lon', 'latitude', 'longitude'),
+    )
+
     id = db.Column(Integer, primary_key=True, autoincrement=True, nullable=False)
     owner_id = db.Column(Integer, db.ForeignKey('users.id'), nullable=False)
 
@@ -108,20 +112,8 @@ class Restaurant(db.Model):
     @property
     def is_active(self):
         """Check if restaurant is active (not under punishment)"""
-        current_time = datetime.now(UTC)
-        active_punishment = RestaurantPunishment.query.filter(
-            RestaurantPunishment.restaurant_id == self.id,
-            RestaurantPunishment.is_active == True,
-            RestaurantPunishment.is_reverted == False,
-            (
-                (RestaurantPunishment.punishment_type == "PERMANENT") |
-                (
-                    (RestaurantPunishment.punishment_type == "TEMPORARY") &
-                    (RestaurantPunishment.end_date > current_time)
-                )
-            )
-        ).first()
-        return active_punishment is None
+        from src.utils.punishment_cache import get_punishment_cache
+        return get_punishment_cache().is_active(self.id)
 
     def can_accept_orders(self):
         return self.is_active
@@ -129,12 +121,13 @@ class Restaurant(db.Model):
     def can_update_details(self):
         return self.is_active
 
-    def increment_flash_deals_count(self):
+    def increment_flash_deals_count(self, commit=True):
         self.flash_deals_count += 1
         if self.flash_deals_count >= 3:
             self.flash_deals_available = False
         db.session.add(self)
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
     @classmethod
     def delete_restaurant_service(cls, restaurant_id, owner_id):
@@ -0,0 +1,29 @@
+from datetime import datetime, UTC
+from sqlalchemy import Integer, String, ForeignKey, DECIMAL, Date, DateTime
+from . import db
+
+
+class SalesRollup(db.Model):
+    """
+    Completed sales of a restaurant in one day or month, split by delivery district.
+
+    ``period`` is ``'day'`` or ``'month'`` and ``period_start`` the first day of it;
+    orders without a district are counted under the empty district. Rows are kept current
+    by the purchase mapper events in ``sales_rollup_service`` and rebuilt by its backfill.
+    """
+    __tablename__ = 'sales_rollups'
+
+    __table_args__ = (
+        db.Index('uq_sales_rollup_bucket', 'restaurant_id', 'period', 'period_start', 'district', unique=True),
+    )
+
+    id = db.Column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id = db.Column(Integer, ForeignKey('restaurants.id'), nullable=False)
+    period = db.Column(String(5), nullable=False)
+    period_start = db.Column(Date, nullable=False)
+    district = db.Column(String(80), nullable=False, default='')
+
+    orders = db.Column(Integer, nullable=False, default=0)
+    units = db.Column(Integer, nullable=False, default=0)
+    revenue = db.Column(DECIMAL(14, 2), nullable=False, default=0)
+    updated_at = db.Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
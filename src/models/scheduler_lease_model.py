@@ -0,0 +1,35 @@
+from sqlalchemy import Integer, String, Float, DateTime, Text
+from . import db
+
+
+class SchedulerLease(db.Model):
+    """
+    Lease on a scheduled job. Only the process whose ``owner`` holds an unexpired lease
+    runs the job; the row also keeps the metrics of the job's last run.
+    """
+    __tablename__ = 'scheduler_leases'
+
+    job_id = db.Column(String(100), primary_key=True)
+    owner = db.Column(String(255), nullable=False)
+    acquired_at = db.Column(DateTime(timezone=True), nullable=False)
+    expires_at = db.Column(DateTime(timezone=True), nullable=False)
+
+    run_count = db.Column(Integer, nullable=False, default=0)
+    last_run_at = db.Column(DateTime(timezone=True), nullable=True)
+    last_duration_ms = db.Column(Float, nullable=True)
+    last_row_count = db.Column(Integer, nullable=True)
+    last_status = db.Column(String(20), nullable=True)
+    last_error = db.Column(Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "owner": self.owner,
+            "lease_expires_at": self.expires_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "run_count": self.run_count,
+            "last_run_at": self.last_run_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_run_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "last_row_count": self.last_row_count,
+            "last_status": self.last_status,
+            "last_error": self.last_error
+        }
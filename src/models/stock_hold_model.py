@@ -0,0 +1,23 @@
+from datetime import datetime, UTC
+from sqlalchemy import Integer, ForeignKey, DateTime
+from . import db
+
+
+class StockHold(db.Model):
+    """
+    Units of a listing set aside for a user's cart. The units are already taken out of
+    ``Listing.count``; checkout claims them and expired holds give them back.
+    """
+    __tablename__ = 'stock_holds'
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'listing_id', name='uq_stock_hold_user_listing'),
+        db.Index('idx_stock_hold_expires', 'expires_at'),
+    )
+
+    id = db.Column(Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(Integer, ForeignKey('users.id'), nullable=False)
+    listing_id = db.Column(Integer, ForeignKey('listings.id'), nullable=False)
+    quantity = db.Column(Integer, nullable=False)
+    expires_at = db.Column(DateTime(timezone=True), nullable=False)
+    created_at = db.Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
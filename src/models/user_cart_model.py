@@ -1,10 +1,28 @@
 from . import db
-from sqlalchemy import Integer, ForeignKey, DateTime, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Integer, ForeignKey, DateTime, func, text, update, delete, inspect
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import relationship, joinedload
+
+# SQL Server has no INSERT ... ON CONFLICT; MERGE with HOLDLOCK does the same in one statement
+_MSSQL_UPSERT = """
+MERGE user_cart WITH (HOLDLOCK) AS target
+USING (SELECT :user_id AS user_id, :listing_id AS listing_id) AS source
+ON target.user_id = source.user_id AND target.listing_id = source.listing_id
+WHEN MATCHED THEN UPDATE SET [count] = {new_count}
+WHEN NOT MATCHED THEN INSERT (user_id, listing_id, restaurant_id, [count], added_at)
+    VALUES (:user_id, :listing_id, :restaurant_id, :count, CURRENT_TIMESTAMP);
+"""
 
 
 class UserCart(db.Model):
     __tablename__ = 'user_cart'
+
+    UNIQUE_INDEX = 'idx_user_cart_user_listing'
+
+    __table_args__ = (
+        db.Index(UNIQUE_INDEX, 'user_id', 'listing_id', unique=True),
+    )
+
     id = db.Column(Integer, primary_key=True, autoincrement=True)
 
     user_id = db.Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -22,3 +40,79 @@ class UserCart(db.Model):
     user = relationship("User", backref="cart_items")
     listing = relationship("Listing", backref="cart_entries")
     restaurant = relationship("Restaurant", backref="cart_entries")  # Relationship to the Restaurant
+
+    @classmethod
+    def items_for_user(cls, user_id):
+        """The user's cart items with their listings, loaded in one joined query."""
+        return cls.query.options(joinedload(cls.listing)) \
+            .filter(cls.user_id == user_id) \
+            .order_by(cls.id) \
+            .all()
+
+    @classmethod
+    def ensure_unique_index(cls):
+        """
+        Add the unique (user_id, listing_id) index to a ``user_cart`` table created before
+        it existed; ``db.create_all`` never adds indexes to existing tables. Duplicate rows
+        are merged first into the oldest one, with their counts added up.
+
+        :return: Number of duplicate rows removed, or None when the index (or the
+                 table) was not missing
+        """
+        inspector = inspect(db.engine)
+        if not inspector.has_table(cls.__tablename__) or inspector.has_index(cls.__tablename__, cls.UNIQUE_INDEX):
+            return None
+        duplicates = db.session.query(
+            cls.user_id, cls.listing_id, func.min(cls.id), func.sum(cls.count)
+        ).group_by(cls.user_id, cls.listing_id).having(func.count(cls.id) > 1).all()
+
+        removed = 0
+        for user_id, listing_id, keep_id, total in duplicates:
+            db.session.execute(update(cls).where(cls.id == keep_id).values(count=total))
+            removed += db.session.execute(
+                delete(cls).where(cls.user_id == user_id, cls.listing_id == listing_id, cls.id != keep_id)
+            ).rowcount
+        db.session.commit()
+
+        next(index for index in cls.__table__.indexes if index.name == cls.UNIQUE_INDEX).create(db.engine)
+        return removed
+
+    @classmethod
+    def upsert(cls, user_id, listing_id, restaurant_id, count, increment=True):
+        """
+        Put ``count`` units of a listing in the user's cart with a single statement: a new
+        row is inserted, or an existing one has ``count`` added (or set when ``increment``
+        is False). Relies on the unique (user_id, listing_id) index, which older databases
+        get from ``ensure_unique_index``. The caller commits.
+        """
+        values = {'user_id': user_id, 'listing_id': listing_id, 'restaurant_id': restaurant_id, 'count': count}
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            statement = insert(cls).values(added_at=func.now(), **values)
+            new_count = statement.excluded['count']
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'listing_id'],
+                set_={'count': cls.count + new_count if increment else new_count}
+            )
+            db.session.execute(statement)
+        elif dialect == 'mysql':
+            statement = mysql.insert(cls).values(added_at=func.now(), **values)
+            new_count = statement.inserted['count']
+            db.session.execute(statement.on_duplicate_key_update(
+                count=cls.count + new_count if increment else new_count
+            ))
+        elif dialect == 'mssql':
+            new_count = "target.[count] + :count" if increment else ":count"
+            db.session.execute(text(_MSSQL_UPSERT.format(new_count=new_count)), values)
+        else:
+            result = db.session.execute(
+                update(cls)
+                .where(cls.user_id == user_id, cls.listing_id == listing_id)
+                .values(count=cls.count + count if increment else count)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                db.session.add(cls(**values))
+                db.session.flush()
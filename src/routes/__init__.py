@@ -24,6 +24,7 @@ from src.routes.environmental_routes import environmental_bp
 from src.routes.ticket_routes import ticket_bp
 from src.routes.chatbot_routes import chatbot_bp
 from src.routes.admin_routes import admin_bp
+from src.utils.rate_limit import init_rate_limiter
 
 def init_app(app):
     api_v1 = Blueprint('api_v1', __name__, url_prefix='/v1')
@@ -52,4 +53,5 @@ def init_app(app):
     api_v1.register_blueprint(chatbot_bp)
     api_v1.register_blueprint(admin_bp)
     app.register_blueprint(api_v1)
+    init_rate_limiter(app)
 
@@ -121,3 +121,55 @@ def clear_database():
     except Exception as e:
         print(f"Error clearing database: {str(e)}")
         return jsonify({"message": "Failed to clear database.", "error": str(e)}), 500
+
+@admin_bp.route('/scheduler-jobs', methods=['GET'])
+def get_scheduler_jobs():
+    """
+    Scheduler Job Metrics
+    ---
+    tags:
+      - Admin
+    summary: Lists the coordinated background jobs and their last run
+    description: |
+      Returns, for every background job that runs under a lease, the process currently
+      holding the lease and the duration, row count and status of its last run.
+    responses:
+      200:
+        description: Job metrics retrieved successfully.
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                jobs:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      job_id:
+                        type: string
+                        example: "update_listings_job"
+                      owner:
+                        type: string
+                        example: "web-1:4211:3f9a1c2e"
+                      run_count:
+                        type: integer
+                        example: 12
+                      last_duration_ms:
+                        type: number
+                        example: 84.2
+                      last_row_count:
+                        type: integer
+                        example: 37
+                      last_status:
+                        type: string
+                        example: "SUCCESS"
+      500:
+        description: Failed to read the job metrics.
+    """
+    try:
+        from src.schedulers.coordination import job_metrics
+        return jsonify({"jobs": job_metrics()}), 200
+    except Exception as e:
+        print(f"Error reading scheduler job metrics: {str(e)}")
+        return jsonify({"message": "Failed to read scheduler job metrics.", "error": str(e)}), 500
@@ -242,4 +242,111 @@ def get_restaurant_analytics(restaurant_id):
             "error": str(e)
         }
         print(json.dumps({"error_response": error_response}, indent=2))
-        return jsonify(error_response), 500
\ No newline at end of file
+        return jsonify(error_response), 500
+
+@analytics_bp.route('/analytics/timeseries', methods=['GET'])
+@jwt_required()
+@owner_required
+def get_sales_timeseries():
+    """
+    Get sales per hour, day, week or month over an arbitrary range
+    ---
+    tags:
+      - Analytics
+    security:
+      - BearerAuth: []
+    parameters:
+      - name: start
+        in: query
+        required: false
+        schema:
+          type: string
+        description: ISO 8601 date or datetime (UTC) the range starts at; defaults to 30 days before end
+      - name: end
+        in: query
+        required: false
+        schema:
+          type: string
+        description: ISO 8601 date or datetime (UTC) the range ends before; defaults to now
+      - name: bucket
+        in: query
+        required: false
+        schema:
+          type: string
+          enum: [auto, hour, day, week, month]
+        description: Bucket size; auto picks the finest one that keeps the series within 2000 points
+      - name: restaurant_id
+        in: query
+        required: false
+        schema:
+          type: integer
+        description: Only this restaurant instead of all the owner's restaurants
+    responses:
+      200:
+        description: Sales time series
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                data:
+                  type: object
+                  properties:
+                    bucket:
+                      type: string
+                    start:
+                      type: string
+                    end:
+                      type: string
+                    restaurant_ids:
+                      type: array
+                      items:
+                        type: integer
+                    points:
+                      type: array
+                      items:
+                        type: object
+                        properties:
+                          start:
+                            type: string
+                          orders:
+                            type: integer
+                          units:
+                            type: integer
+                          revenue:
+                            type: number
+                    totals:
+                      type: object
+                      properties:
+                        orders:
+                          type: integer
+                        units:
+                          type: integer
+                        revenue:
+                          type: number
+      400:
+        description: Invalid range or bucket, a range over 100 years, or more than 2000 buckets
+      403:
+        description: User is not a restaurant owner or does not own the restaurant
+      404:
+        description: No restaurants found for this owner
+    """
+    try:
+        owner_id = get_jwt_identity()
+        response, status_code = RestaurantAnalyticsService.get_sales_timeseries(owner_id, request.args)
+        # Series can hold thousands of points, so only the status is logged
+        print(json.dumps({"endpoint": request.path, "args": dict(request.args), "status": status_code}))
+        return jsonify(response), status_code
+    except Exception as e:
+        print("An error occurred:", str(e))
+        traceback.print_exc(file=sys.stderr)
+
+        error_response = {
+            "success": False,
+            "message": "An error occurred while fetching the sales time series.",
+            "error": str(e)
+        }
+        print(json.dumps({"error_response": error_response}, indent=2))
+        return jsonify(error_response), 500
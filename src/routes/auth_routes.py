@@ -18,8 +18,8 @@ coloredlogs.install(level="INFO", logger=logger, fmt=log_format)
 
 
 def get_client_ip():
-    """Retrieve the client's IP address."""
-    return request.headers.get("X-Forwarded-For", request.remote_addr) or "no_ip"
+    """Retrieve the client's IP address (see ``TRUSTED_PROXY_HOPS`` in app.py when behind a proxy)."""
+    return request.remote_addr or "no_ip"
 
 
 @auth_bp.route("/login", methods=["POST"])
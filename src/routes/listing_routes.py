@@ -300,7 +300,23 @@ search_doc = {
             "name": "restaurant_id",
             "type": "integer",
             "required": False,
-            "description": "Required for listing search - restaurant to search within"
+            "description": "Listing search only - restaurant to search within; all restaurants when omitted"
+        },
+        {
+            "in": "query",
+            "name": "page",
+            "type": "integer",
+            "required": False,
+            "default": 1,
+            "description": "Page number"
+        },
+        {
+            "in": "query",
+            "name": "per_page",
+            "type": "integer",
+            "required": False,
+            "default": 20,
+            "description": "Results per page (at most 100)"
         }
     ],
     "responses": {
@@ -542,7 +558,9 @@ def search():
         search_type = request.args.get("type")
         query_text = request.args.get("query", "").strip()
         restaurant_id = request.args.get("restaurant_id", type=int)
-        response, status = search_service(search_type, query_text, restaurant_id)
+        page = request.args.get("page", 1, type=int)
+        per_page = request.args.get("per_page", 20, type=int)
+        response, status = search_service(search_type, query_text, restaurant_id, page=page, per_page=per_page)
 
         print(json.dumps({"response": response, "status": status}, indent=2))
         return jsonify(response), status
@@ -15,6 +15,7 @@ from src.services.restaurant_service import (
     get_restaurant_service,
     delete_restaurant_service,
     get_restaurants_in_proximity, update_restaurant_service,
+    discover_restaurants_service,
 )
 from src.models import User, RestaurantComment, Achievement, AchievementType, UserAchievement
 from src.utils.cloud_storage import UPLOAD_FOLDER
@@ -401,7 +402,8 @@ def get_restaurants_proximity():
     {
        "latitude": number (required),
        "longitude": number (required),
-       "radius": number (optional, default 10 km)
+       "radius": number (optional, default 10 km),
+       "filters": object (optional)
     }
 
     ---
@@ -426,6 +428,12 @@ def get_restaurants_proximity():
               radius:
                 type: number
                 default: 10
+              filters:
+                type: object
+                description: >
+                  Optional query, category, min_rating, pickup, delivery, flash_deals and
+                  in_stock filters; with a limit the response has a next_cursor to pass back
+                  as cursor.
     responses:
       200:
         description: Restaurants within the specified radius.
@@ -449,7 +457,8 @@ def get_restaurants_proximity():
         user_lat = data.get('latitude')
         user_lon = data.get('longitude')
         radius = data.get('radius', 10)
-        response, status = get_restaurants_in_proximity(user_lat, user_lon, radius)
+        filters = data.get('filters')
+        response, status = get_restaurants_in_proximity(user_lat, user_lon, radius, filters=filters)
 
         print(json.dumps({"response": response, "status": status}, indent=2))
         return jsonify(response), status
@@ -463,6 +472,95 @@ def get_restaurants_proximity():
         return jsonify(error_response), 500
 
 
+@restaurant_bp.route("/restaurants/discover", methods=["GET"])
+def discover_restaurants():
+    """
+    Search restaurants by text, location and filters in one query.
+
+    Results are ordered by relevance when there is a search text and by distance
+    otherwise. Pass the returned next_cursor as cursor to get the next page.
+
+    ---
+    tags:
+      - Restaurant
+    parameters:
+      - in: query
+        name: query
+        schema:
+          type: string
+        description: Text matched against name, category and description.
+      - in: query
+        name: latitude
+        schema:
+          type: number
+      - in: query
+        name: longitude
+        schema:
+          type: number
+      - in: query
+        name: radius
+        schema:
+          type: number
+          default: 10
+      - in: query
+        name: category
+        schema:
+          type: string
+      - in: query
+        name: min_rating
+        schema:
+          type: number
+      - in: query
+        name: pickup
+        schema:
+          type: boolean
+      - in: query
+        name: delivery
+        schema:
+          type: boolean
+      - in: query
+        name: flash_deals
+        schema:
+          type: boolean
+      - in: query
+        name: in_stock
+        schema:
+          type: boolean
+        description: Only restaurants with an unexpired listing in stock.
+      - in: query
+        name: order
+        schema:
+          type: string
+          enum: [distance, relevance]
+      - in: query
+        name: limit
+        schema:
+          type: integer
+          default: 20
+      - in: query
+        name: cursor
+        schema:
+          type: string
+    responses:
+      200:
+        description: One page of matching restaurants and the cursor of the next one.
+      400:
+        description: Invalid parameters.
+      500:
+        description: An error occurred.
+    """
+    try:
+        response, status = discover_restaurants_service(request.args)
+        return jsonify(response), status
+    except Exception as e:
+        print("An error occurred:", str(e))
+        traceback.print_exc(file=sys.stderr)
+
+        error_response = {"success": False, "message": "An error occurred", "error": str(e)}
+        print(json.dumps({"error_response": error_response, "status": 500}, indent=2))
+        return jsonify(error_response), 500
+
+
 @restaurant_bp.route("/restaurants/<int:restaurant_id>/comments", methods=["POST"])
 @jwt_required()
 def add_comment(restaurant_id):
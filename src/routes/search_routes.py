@@ -4,7 +4,7 @@ from flask import Blueprint, request, jsonify
 import json
 import traceback
 import sys
-from src.services.search_service import search_restaurants, search_listings
+from src.services.search_service import search_restaurants, search_listings, page_bounds
 
 search_bp = Blueprint("search", __name__)
 
@@ -14,7 +14,8 @@ def search():
     """
     Search for restaurants or listings.
 
-    This endpoint searches for restaurants by name or listings by title within a specified restaurant.
+    This endpoint searches for restaurants or for in-stock, unexpired listings, optionally within one restaurant.
+    Listings are ranked by text match, freshness, discount and remaining stock.
 
     ---
     tags:
@@ -38,7 +39,21 @@ def search():
         required: false
         schema:
           type: integer
-        description: Required for search type "listing".
+        description: Restricts a "listing" search to one restaurant.
+      - in: query
+        name: page
+        required: false
+        schema:
+          type: integer
+          default: 1
+        description: Page number.
+      - in: query
+        name: per_page
+        required: false
+        schema:
+          type: integer
+          default: 20
+        description: Results per page (at most 100).
     Responses:
       200:
         description: Search results returned successfully.
@@ -74,6 +89,7 @@ def search():
         search_type = request.args.get("type")
         query = request.args.get("query", "").strip()
         restaurant_id = request.args.get("restaurant_id", type=int)
+        page, per_page = page_bounds(request.args.get("page", 1, type=int), request.args.get("per_page", 20, type=int))
 
         if not query:
             error_response = {"success": False, "message": "Query parameter is required"}
@@ -81,18 +97,14 @@ def search():
             return jsonify(error_response), 400
 
         if search_type == "restaurant":
-            data = search_restaurants(query)
-            response = {"success": True, "type": "restaurant", "results": data}
+            data = search_restaurants(query, page=page, per_page=per_page)
+            response = {"success": True, "type": "restaurant", "results": data, "page": page}
             print(json.dumps({"response": response, "status": 200}, indent=2))
             return jsonify(response), 200
 
         elif search_type == "listing":
-            if not restaurant_id:
-                error_response = {"success": False, "message": "Restaurant ID is required for listing search"}
-                print(json.dumps({"error_response": error_response, "status": 400}, indent=2))
-                return jsonify(error_response), 400
-            data = search_listings(query, restaurant_id)
-            response = {"success": True, "type": "listing", "results": data}
+            data = search_listings(query, restaurant_id, page=page, per_page=per_page)
+            response = {"success": True, "type": "listing", "results": data, "page": page}
             print(json.dumps({"response": response, "status": 200}, indent=2))
             return jsonify(response), 200
 
@@ -0,0 +1,34 @@
+import os
+
+# embedded: web workers run every job, the shared ones coordinated by a lease
+# external: web workers only refresh their own caches; shared jobs run in `python -m src.schedulers`
+# off: no scheduler in this process
+SCHEDULER_MODES = ('embedded', 'external', 'off')
+
+
+def scheduler_mode():
+    mode = os.getenv("SCHEDULER_MODE", "embedded").lower()
+    if mode not in SCHEDULER_MODES:
+        raise ValueError(f"SCHEDULER_MODE must be one of {', '.join(SCHEDULER_MODES)}, got {mode!r}")
+    return mode
+
+
+def register_jobs(app, scheduler, shared=True, local=True):
+    """
+    Add the background jobs to ``scheduler``.
+
+    :param shared: Jobs that write shared database state; they run under a lease so only
+        one process executes each run
+    :param local: Jobs that refresh this process's in-memory caches
+    """
+    from src.schedulers.analytics_scheduler import init_analytics_scheduler
+    from src.schedulers.listing_scheduler import init_listing_scheduler
+    from src.schedulers.notification_dispatcher import init_notification_scheduler
+    from src.schedulers.recommendation_scheduler import init_recommendation_scheduler
+
+    if shared:
+        init_listing_scheduler(app, scheduler)
+        init_notification_scheduler(app, scheduler)
+        init_analytics_scheduler(app, scheduler)
+    init_recommendation_scheduler(app, scheduler, shared=shared, local=local)
+    return scheduler
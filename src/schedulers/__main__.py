@@ -0,0 +1,68 @@
+"""
+Standalone scheduler for the shared background jobs.
+
+    python -m src.schedulers            # run the jobs on their intervals
+    python -m src.schedulers --once     # run every shared job once and exit
+    python -m src.schedulers --status   # print the last run metrics of every job
+    python -m src.schedulers --backfill-rollups   # rebuild every sales rollup from the purchases
+
+Run it next to web workers started with SCHEDULER_MODE=external.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.schedulers", description="FreshDeal background jobs")
+    parser.add_argument("--once", action="store_true", help="run every shared job once and exit")
+    parser.add_argument("--status", action="store_true", help="print job lease and run metrics and exit")
+    parser.add_argument("--backfill-rollups", action="store_true",
+                        help="rebuild the sales rollups of the whole purchase history and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    # The app module starts an embedded scheduler on import unless told otherwise
+    os.environ["SCHEDULER_MODE"] = "off"
+    from app import app
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from src.schedulers import register_jobs
+    from src.schedulers.analytics_scheduler import ROLLUP_JOB_ID, run_rollup_job
+    from src.schedulers.coordination import job_metrics, run_exclusive
+    from src.schedulers.listing_scheduler import LISTING_JOB_ID, STOCK_HOLD_JOB_ID, run_listing_job, run_stock_hold_job
+    from src.schedulers.notification_dispatcher import RECEIPTS_JOB_ID, run_receipts_job
+    from src.schedulers.recommendation_scheduler import SIMILARITY_JOB_ID, refresh_shared_similarities
+    from src.services.sales_rollup_service import backfill_sales_rollups
+
+    with app.app_context():
+        if args.status:
+            print(json.dumps(job_metrics(), indent=2))
+            return 0
+        if args.backfill_rollups:
+            ran = run_exclusive(ROLLUP_JOB_ID, backfill_sales_rollups, lease_seconds=3600)
+            print(f"{ROLLUP_JOB_ID}: {'backfilled' if ran else 'skipped, lease held by another process'}")
+            return 0
+        if args.once:
+            for job_id, func in ((LISTING_JOB_ID, run_listing_job),
+                                 (STOCK_HOLD_JOB_ID, run_stock_hold_job),
+                                 (ROLLUP_JOB_ID, run_rollup_job),
+                                 (SIMILARITY_JOB_ID, refresh_shared_similarities),
+                                 (RECEIPTS_JOB_ID, run_receipts_job)):
+                ran = run_exclusive(job_id, func, lease_seconds=60)
+                print(f"{job_id}: {'ran' if ran else 'skipped, lease held by another process'}")
+            print(json.dumps(job_metrics(), indent=2))
+            return 0
+
+    scheduler = BlockingScheduler()
+    register_jobs(app, scheduler, shared=True, local=False)
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+from datetime import datetime, UTC
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from src.models import db, SalesRollup
+from src.schedulers.coordination import run_exclusive
+from src.services.sales_rollup_service import backfill_sales_rollups, repair_recent_rollups
+
+ROLLUP_JOB_ID = 'repair_sales_rollups_job'
+ROLLUP_INTERVAL_HOURS = 24
+
+
+def run_rollup_job():
+    """Backfill the whole history while the rollups are empty (first deploy), else repair recent months."""
+    if db.session.query(SalesRollup.id).first() is None:
+        return backfill_sales_rollups()
+    return repair_recent_rollups()
+
+
+def init_analytics_scheduler(app, scheduler=None):
+    """
+    Register the job that rebuilds the recent sales rollups on ``scheduler`` (a new one is
+    started if omitted). Purchases keep the rollups current as they complete; the job only
+    repairs drift from writes that bypass the ORM. It runs under a lease in a single process.
+
+    The first run is right after startup, so a fresh deploy, whose dashboards read only
+    the rollups, backfills them from the purchases without waiting a day. A manual
+    ``python -m src.schedulers --backfill-rollups`` is only needed to rebuild older months.
+    """
+    def run_repair_sales_rollups():
+        with app.app_context():
+            try:
+                run_exclusive(ROLLUP_JOB_ID, run_rollup_job, lease_seconds=ROLLUP_INTERVAL_HOURS * 3600 - 60)
+            except Exception as e:
+                print(f"Error rebuilding sales rollups: {str(e)}")
+
+    owns_scheduler = scheduler is None
+    scheduler = scheduler or BackgroundScheduler()
+    scheduler.add_job(
+        func=run_repair_sales_rollups,
+        trigger=IntervalTrigger(hours=ROLLUP_INTERVAL_HOURS),
+        id=ROLLUP_JOB_ID,
+        name='Rebuild the sales rollups of the recent months',
+        next_run_time=datetime.now(UTC),  # backfill empty rollups right after a deploy
+        replace_existing=True
+    )
+    if owns_scheduler:
+        scheduler.start()
+    return scheduler
@@ -0,0 +1,112 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db, SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in the lease table
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(job_id, ttl_seconds, owner=WORKER_ID, now=None):
+    """
+    Take or renew the lease on ``job_id`` for ``ttl_seconds``.
+
+    The lease is claimed with a conditional ``UPDATE`` that only matches when ``owner``
+    already holds it or it has expired, so at most one process can win it. The row is
+    created on first use, and a concurrent insert loses on the primary key.
+
+    :return: True when ``owner`` holds the lease
+    """
+    now = now or datetime.now(UTC)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    try:
+        claimed = SchedulerLease.query.filter(
+            SchedulerLease.job_id == job_id,
+            db.or_(SchedulerLease.owner == owner, SchedulerLease.expires_at <= now)
+        ).update({
+            SchedulerLease.owner: owner,
+            SchedulerLease.acquired_at: now,
+            SchedulerLease.expires_at: expires_at
+        }, synchronize_session=False)
+        if claimed:
+            db.session.commit()
+            return True
+
+        if db.session.query(SchedulerLease.job_id).filter(SchedulerLease.job_id == job_id).first():
+            db.session.rollback()
+            return False
+
+        db.session.add(SchedulerLease(job_id=job_id, owner=owner, acquired_at=now, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def release_lease(job_id, owner=WORKER_ID):
+    """Give up the lease right away so another process can take the job."""
+    now = datetime.now(UTC)
+    SchedulerLease.query.filter(
+        SchedulerLease.job_id == job_id,
+        SchedulerLease.owner == owner
+    ).update({SchedulerLease.expires_at: now}, synchronize_session=False)
+    db.session.commit()
+
+
+def _record_run(job_id, started_at, duration_ms, row_count, status, error=None):
+    SchedulerLease.query.filter(SchedulerLease.job_id == job_id).update({
+        SchedulerLease.run_count: SchedulerLease.run_count + 1,
+        SchedulerLease.last_run_at: started_at,
+        SchedulerLease.last_duration_ms: duration_ms,
+        SchedulerLease.last_row_count: row_count,
+        SchedulerLease.last_status: status,
+        SchedulerLease.last_error: error
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def run_exclusive(job_id, func, lease_seconds, owner=WORKER_ID):
+    """
+    Run ``func`` only if this process wins the lease on ``job_id``.
+
+    The lease is kept for ``lease_seconds`` after a successful run, so processes whose
+    scheduler fires a little later in the same interval skip the job instead of
+    repeating it. After a failure the lease is released so the next tick can retry.
+    ``func`` returns the number of rows it touched; that count and the run duration
+    are stored on the lease row.
+
+    :return: True when the job ran here
+    """
+    if not acquire_lease(job_id, lease_seconds, owner=owner):
+        return False
+
+    started_at = datetime.now(UTC)
+    started = time.perf_counter()
+    try:
+        row_count = func()
+    except Exception as e:
+        db.session.rollback()
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.error(f"Scheduled job {job_id} failed after {duration_ms} ms: {str(e)}")
+        _record_run(job_id, started_at, duration_ms, None, 'FAILED', str(e))
+        release_lease(job_id, owner=owner)
+        return True
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Scheduled job {job_id} finished in {duration_ms} ms ({row_count} rows)")
+    _record_run(job_id, started_at, duration_ms, row_count, 'SUCCESS')
+    return True
+
+
+def job_metrics():
+    """Lease holder and last-run metrics of every coordinated job."""
+    return [lease.to_dict() for lease in SchedulerLease.query.order_by(SchedulerLease.job_id).all()]
@@ -1,28 +1,59 @@
-from datetime import datetime, timedelta
-from pytz import UTC
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from src.models.listing_model import Listing
-from src.models import db
-
-def update_all_listings():
-    try:
-        listings = Listing.query.filter(Listing.expires_at > datetime.now(UTC)).all()
-        for listing in listings:
-            listing.update_expiry()
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error updating listings: {str(e)}")
-
-def init_listing_scheduler():
-    scheduler = BackgroundScheduler()
+from src.schedulers.coordination import run_exclusive
+from src.services.listing_freshness_service import update_all_listings, UPDATE_INTERVAL_HOURS
+from src.services.stock_service import release_expired_holds
+
+LISTING_JOB_ID = 'update_listings_job'
+STOCK_HOLD_JOB_ID = 'release_stock_holds_job'
+STOCK_HOLD_INTERVAL_SECONDS = 60
+
+
+def run_listing_job():
+    metrics = update_all_listings()
+    return metrics["expired_listings"] + metrics["rejected_purchases"]
+
+
+def run_stock_hold_job():
+    return release_expired_holds()
+
+
+def init_listing_scheduler(app, scheduler=None):
+    """
+    Register the listing expiry and stock hold release jobs on ``scheduler`` (a new one is
+    started if omitted). The jobs write shared rows, so they run under a lease in a single process.
+    """
+    def run_update_all_listings():
+        with app.app_context():
+            try:
+                run_exclusive(LISTING_JOB_ID, run_listing_job, lease_seconds=UPDATE_INTERVAL_HOURS * 3600 - 60)
+            except Exception as e:
+                print(f"Error updating listings: {str(e)}")
+
+    def run_release_stock_holds():
+        with app.app_context():
+            try:
+                run_exclusive(STOCK_HOLD_JOB_ID, run_stock_hold_job, lease_seconds=STOCK_HOLD_INTERVAL_SECONDS - 10)
+            except Exception as e:
+                print(f"Error releasing stock holds: {str(e)}")
+
+    owns_scheduler = scheduler is None
+    scheduler = scheduler or BackgroundScheduler()
     scheduler.add_job(
-        func=update_all_listings,
-        trigger=IntervalTrigger(hours=2),
-        id='update_listings_job',
-        name='Update listings fresh score and consume within time',
+        func=run_update_all_listings,
+        trigger=IntervalTrigger(hours=UPDATE_INTERVAL_HOURS),
+        id=LISTING_JOB_ID,
+        name='Expire listings close to their expiry time',
         replace_existing=True
     )
-    scheduler.start()
-    return scheduler
\ No newline at end of file
+    if app.config.get('STOCK_HOLD_SECONDS'):
+        scheduler.add_job(
+            func=run_release_stock_holds,
+            trigger=IntervalTrigger(seconds=STOCK_HOLD_INTERVAL_SECONDS),
+            id=STOCK_HOLD_JOB_ID,
+            name='Give back the stock of expired cart holds',
+            replace_existing=True
+        )
+    if owns_scheduler:
+        scheduler.start()
+    return scheduler
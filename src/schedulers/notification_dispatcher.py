@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from src.models import db
+from src.schedulers.coordination import WORKER_ID, run_exclusive
+from src.services.notification_outbox_service import (
+    EXPO_BATCH_SIZE,
+    RECEIPT_DELAY_MINUTES,
+    check_receipts,
+    dispatch_pending,
+    purge_outbox
+)
+
+logger = logging.getLogger(__name__)
+
+RECEIPTS_JOB_ID = 'notification_receipts_job'
+
+
+class NotificationDispatcher:
+    """
+    Pool of daemon threads draining the notification outbox.
+
+    Each thread claims a batch, delivers it and immediately goes for the next one while
+    there is work; when the outbox is empty it sleeps for ``poll_seconds`` or until a
+    commit that queued a notification wakes it up.
+    """
+
+    def __init__(self, app, workers=2, poll_seconds=2.0, batch_size=EXPO_BATCH_SIZE):
+        self.app = app
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{WORKER_ID}:notify-{index}",),
+                name=f"notification-dispatcher-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self, owner):
+        while not self._stopped.is_set():
+            processed = 0
+            with self.app.app_context():
+                try:
+                    processed = dispatch_pending(owner, self.batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error dispatching notifications: {str(e)}")
+                finally:
+                    db.session.remove()
+            if not processed:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+
+def run_receipts_job():
+    checked = check_receipts()
+    return checked + purge_outbox()
+
+
+def init_notification_dispatcher(app, workers=None):
+    """
+    Start the outbox worker pool of this process. ``NOTIFICATION_WORKERS`` sets the
+    number of threads; 0 leaves delivery to other processes.
+    """
+    workers = int(os.getenv("NOTIFICATION_WORKERS", 2)) if workers is None else workers
+    if workers <= 0:
+        return None
+    dispatcher = NotificationDispatcher(app, workers=workers).start()
+    app.extensions['notification_dispatcher'] = dispatcher
+    return dispatcher
+
+
+def init_notification_scheduler(app, scheduler=None):
+    """
+    Register the receipt check on ``scheduler`` (a new one is started if omitted). It
+    deactivates tokens Expo reports as unregistered and prunes old outbox rows, under a
+    lease so a single process runs it.
+    """
+    def run_check_receipts():
+        with app.app_context():
+            try:
+                run_exclusive(RECEIPTS_JOB_ID, run_receipts_job, lease_seconds=RECEIPT_DELAY_MINUTES * 60 - 10)
+            except Exception as e:
+                print(f"Error checking notification receipts: {str(e)}")
+
+    owns_scheduler = scheduler is None
+    scheduler = scheduler or BackgroundScheduler()
+    scheduler.add_job(
+        func=run_check_receipts,
+        trigger=IntervalTrigger(minutes=RECEIPT_DELAY_MINUTES),
+        id=RECEIPTS_JOB_ID,
+        name='Check Expo push receipts and prune the notification outbox',
+        replace_existing=True
+    )
+    if owns_scheduler:
+        scheduler.start()
+    return scheduler
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, UTC
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from src.schedulers.coordination import run_exclusive
+from src.services.recommendation_system_service import (
+    rebuild_recommendation_models,
+    refresh_item_similarities,
+    reload_item_similarities
+)
+
+SIMILARITY_JOB_ID = 'refresh_item_similarities_job'
+
+
+def refresh_shared_similarities():
+    # The leader reloads the models so purchases completed in other workers are included
+    return refresh_item_similarities(reload_models=True)
+
+
+def init_recommendation_scheduler(app, scheduler=None, shared=True, local=True):
+    """
+    Register the recommendation jobs on ``scheduler`` (a new one is started if omitted).
+
+    The models are per-process caches, so with ``local`` every web worker rebuilds its
+    own. Similarity tables are stored in the database: with ``shared`` the job recomputes
+    them under a lease in one process, and processes that lose the lease (or run with
+    ``local`` only) reload what the leader stored.
+    """
+    rebuild_minutes = int(os.getenv("RECOMMENDATION_REBUILD_MINUTES", 30))
+    similarity_minutes = int(os.getenv("SIMILARITY_REFRESH_MINUTES", 5))
+
+    owns_scheduler = scheduler is None
+    scheduler = scheduler or BackgroundScheduler()
+
+    if local:
+        def rebuild_recommendations():
+            with app.app_context():
+                try:
+                    rebuild_recommendation_models()
+                except Exception as e:
+                    print(f"Error rebuilding recommendation models: {str(e)}")
+
+        scheduler.add_job(
+            func=rebuild_recommendations,
+            trigger=IntervalTrigger(minutes=rebuild_minutes),
+            id='rebuild_recommendations_job',
+            name='Rebuild recommendation models from purchase history',
+            next_run_time=datetime.now(UTC),  # warm the models right after startup
+            replace_existing=True
+        )
+
+    def refresh_similarities():
+        with app.app_context():
+            try:
+                ran = shared and run_exclusive(
+                    SIMILARITY_JOB_ID, refresh_shared_similarities, lease_seconds=similarity_minutes * 60 - 10
+                )
+                if not ran and local:
+                    reload_item_similarities()
+            except Exception as e:
+                print(f"Error refreshing item similarities: {str(e)}")
+
+    if shared or local:
+        scheduler.add_job(
+            func=refresh_similarities,
+            trigger=IntervalTrigger(minutes=similarity_minutes),
+            id=SIMILARITY_JOB_ID,
+            name='Recompute similar items touched by new purchases',
+            replace_existing=True
+        )
+
+    if owns_scheduler:
+        scheduler.start()
+    return scheduler
@@ -0,0 +1,229 @@
+"""
+Benchmark of the sales time series in src/services/sales_series_service.py.
+
+The SampleData generators are run to get the sample users, restaurants and purchases;
+the purchases are then repeated at random moments over the range until there are
+--orders of them, and the rollups are rebuilt. Each bucket size is timed for all the
+restaurants of one owner over the whole range, next to a scan of the purchases table
+that computes the same series.
+
+    python -m src.scripts.analytics_timeseries_benchmark
+    python -m src.scripts.analytics_timeseries_benchmark --orders 500000 --days 730 --owner 2
+    python -m src.scripts.analytics_timeseries_benchmark --database-uri mssql+pyodbc://...   # a scratch database
+
+Without --database-uri a temporary SQLite file is used. The tables are created in the
+target database and the rows written by the run are left in place, so never point it at
+a database that holds real data.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+
+from flask import Flask
+from sqlalchemy import insert, func
+
+from src.models import db, User, Restaurant, Purchase, PurchaseStatus
+from src.services.sales_rollup_service import backfill_sales_rollups
+from src.services.sales_series_service import BUCKETS, MAX_POINTS, bucket_edges, sales_series
+
+INSERT_CHUNK_SIZE = 5000
+
+
+def create_benchmark_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def generate_sample_data(seed=None):
+    """
+    Run the SampleData generators in a scratch directory (they write to ../exported_json
+    relative to the working directory) and return their users, restaurants and purchases.
+    """
+    from src.scripts.SampleData import (generate_users, generate_restaurants, generate_user_address,
+                                        generate_listings, generate_purchases)
+
+    random.seed(seed)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        work = os.path.join(directory, 'work')
+        os.makedirs(work)
+        os.chdir(work)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_users.generate_users()
+                generate_restaurants.generate_restaurants()
+                generate_user_address.generate_addresses()
+                generate_listings.generate_listings()
+                generate_purchases.generate_purchases()
+            exported = {}
+            for name in ('users', 'restaurants', 'purchases'):
+                with open(os.path.join(directory, 'exported_json', f'{name}.json'), encoding='utf-8') as f:
+                    exported[name] = json.load(f)
+        finally:
+            os.chdir(cwd)
+    return exported
+
+
+def _columns(model, record):
+    return {key: value for key, value in record.items() if key in model.__table__.c}
+
+
+def _insert(model, rows):
+    for chunk_start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(insert(model), rows[chunk_start:chunk_start + INSERT_CHUNK_SIZE])
+
+
+def seed(sample, orders, days, end):
+    """
+    Load the sample users and restaurants, and ``orders`` completed purchases modelled on
+    the sample ones at random moments in the ``days`` before ``end``. The listings are
+    not loaded, so the purchases carry no listing.
+    """
+    _insert(User, [_columns(User, user) for user in sample['users']])
+    _insert(Restaurant, [_columns(Restaurant, restaurant) for restaurant in sample['restaurants']])
+
+    templates = sample['purchases']
+    span = days * 24 * 3600
+    start = end - timedelta(days=days)
+    rows = []
+    for _ in range(orders):
+        template = random.choice(templates)
+        row = _columns(Purchase, template)
+        row.pop('id', None)
+        row['listing_id'] = None
+        row['status'] = PurchaseStatus.COMPLETED
+        row['total_price'] = Decimal(str(template['total_price'])).quantize(Decimal('0.01'))
+        row['purchase_date'] = start + timedelta(seconds=random.randrange(span))
+        rows.append(row)
+    _insert(Purchase, rows)
+    db.session.commit()
+
+
+def _scan_series(restaurant_ids, start, end, bucket):
+    """The same series computed from the purchases table, for comparison."""
+    edges = bucket_edges(start, end, bucket)
+    rows = db.session.query(
+        Purchase.purchase_date, Purchase.quantity, Purchase.total_price
+    ).filter(
+        Purchase.restaurant_id.in_(restaurant_ids),
+        Purchase.status == PurchaseStatus.COMPLETED,
+        Purchase.purchase_date >= edges[0].astype(datetime),
+        Purchase.purchase_date < edges[-1].astype(datetime)
+    ).all()
+    totals = [[0, 0, Decimal(0)] for _ in range(len(edges) - 1)]
+    starts = edges.astype(datetime).tolist()
+    for purchased_at, quantity, total_price in rows:
+        point = totals[bisect_right(starts, purchased_at) - 1]
+        point[0] += 1
+        point[1] += quantity
+        point[2] += total_price
+    return totals
+
+
+def _median_ms(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2), result
+
+
+def run_benchmark(app, orders=200000, days=365, owner_id=1, repeat=5, seed_value=None):
+    """
+    Seed ``orders`` purchases over ``days`` days and time every bucket size over the
+    whole range for the restaurants of ``owner_id``.
+
+    :return: dict with the seeding and backfill times, the rollup rows written and per
+             bucket the points, the median milliseconds of the series and of the scan,
+             and whether both gave the same orders
+    """
+    end = datetime.now(UTC).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    sample = generate_sample_data(seed_value)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(sample, orders, days, end)
+        seeded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        written = backfill_sales_rollups()
+        backfilled = time.perf_counter() - started
+
+        restaurant_ids = [row.id for row in Restaurant.query.with_entities(Restaurant.id).filter_by(
+            owner_id=owner_id)]
+        result = {
+            'orders': db.session.query(func.count(Purchase.id)).scalar(),
+            'restaurants': len(restaurant_ids),
+            'seed_seconds': round(seeded, 2),
+            'backfill_seconds': round(backfilled, 2),
+            'rollup_rows': written,
+            'buckets': {},
+        }
+        for bucket in BUCKETS:
+            points = len(bucket_edges(start, end, bucket)) - 1
+            series_ms, series = _median_ms(lambda: sales_series(restaurant_ids, start, end, bucket), repeat)
+            scan_ms, scan = _median_ms(lambda: _scan_series(restaurant_ids, start, end, bucket), 1)
+            result['buckets'][bucket] = {
+                'points': points,
+                'over_max_points': points > MAX_POINTS,
+                'series_ms': series_ms,
+                'scan_ms': scan_ms,
+                'matches': series.orders.tolist() == [point[0] for point in scan],
+            }
+        db.session.remove()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.scripts.analytics_timeseries_benchmark",
+                                     description="Sales time series against a scan of the purchases")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--owner", type=int, default=1, help="owner whose restaurants are charted")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per bucket; the median is reported")
+    parser.add_argument("--seed", type=int, help="random seed for repeatable data")
+    parser.add_argument("--database-uri", help="scratch database to run against (default: a temporary SQLite file)")
+    args = parser.parse_args(argv)
+
+    directory = None
+    database_uri = args.database_uri
+    if database_uri is None:
+        directory = tempfile.TemporaryDirectory()
+        database_uri = f"sqlite:///{os.path.join(directory.name, 'analytics_timeseries.db')}"
+
+    try:
+        app = create_benchmark_app(database_uri)
+        result = run_benchmark(app, args.orders, args.days, args.owner, args.repeat, args.seed)
+    finally:
+        if directory is not None:
+            directory.cleanup()
+
+    buckets = result.pop('buckets')
+    for name, value in result.items():
+        print(f"{name:>20}: {value}")
+    print(f"{'bucket':>20}  {'points':>7}  {'series ms':>10}  {'scan ms':>10}  matches")
+    for bucket, timing in buckets.items():
+        note = '  (over MAX_POINTS, refused by the API)' if timing['over_max_points'] else ''
+        print(f"{bucket:>20}  {timing['points']:>7}  {timing['series_ms']:>10}  {timing['scan_ms']:>10}  "
+              f"{timing['matches']}{note}")
+    return 0 if all(timing['matches'] for timing in buckets.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
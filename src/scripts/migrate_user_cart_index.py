@@ -0,0 +1,39 @@
+"""
+Add the unique (user_id, listing_id) index of user_cart to an existing database.
+
+Cart upserts rely on the index, but db.create_all() does not add indexes to tables that
+already exist. Duplicate cart rows are merged into the oldest one first, adding up their
+counts. app.py runs the same migration at startup; this runs it on its own:
+
+    python -m src.scripts.migrate_user_cart_index --database-uri mssql+pyodbc://...
+"""
+import argparse
+import sys
+
+from flask import Flask
+
+from src.models import db, UserCart
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.scripts.migrate_user_cart_index",
+                                     description="Deduplicate user_cart and add its unique index")
+    parser.add_argument("--database-uri", required=True, help="database to migrate")
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        removed = UserCart.ensure_unique_index()
+    if removed is None:
+        print("Nothing to migrate: user_cart is missing or already has its unique index")
+    else:
+        print(f"Merged {removed} duplicate cart rows and added the unique index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
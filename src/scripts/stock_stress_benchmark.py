@@ -0,0 +1,171 @@
+"""
+Concurrency stress test of the stock reservation in src/services/stock_service.py.
+
+Hundreds of buyer threads try to buy the same listing at once; the run checks that no
+more units were sold than were in stock and reports the throughput.
+
+    python -m src.scripts.stock_stress_benchmark
+    python -m src.scripts.stock_stress_benchmark --buyers 500 --stock 120 --quantity 2 --holds
+    python -m src.scripts.stock_stress_benchmark --database-uri mssql+pyodbc://...   # a scratch database
+
+Without --database-uri a temporary SQLite file is used. The tables are created in the
+target database and the rows written by the run are left in place, so never point it at
+a database that holds real data.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from src.models import db, User, Restaurant, Listing
+from src.services.stock_service import take_stock, hold_stock, claim_stock, user_holds
+
+LOCK_RETRIES = 20
+
+
+def create_benchmark_app(database_uri, hold_seconds):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['STOCK_HOLD_SECONDS'] = hold_seconds
+    if database_uri.startswith('sqlite'):
+        # Writers queue on the database lock instead of failing straight away
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30, 'check_same_thread': False}}
+    db.init_app(app)
+    return app
+
+
+def _seed(buyers, stock):
+    """One restaurant with one listing of ``stock`` units, and a user per buyer."""
+    run = uuid.uuid4().hex[:8]
+    users = [
+        User(name=f"buyer {index}", email=f"buyer{index}.{run}@example.com",
+             phone_number=f"{run}{index:06d}"[:15], password="x")
+        for index in range(buyers + 1)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    restaurant = Restaurant(owner_id=users[-1].id, restaurantName=f"Stress {run}", category="Bench",
+                            latitude=Decimal('41'), longitude=Decimal('29'), listings=1)
+    db.session.add(restaurant)
+    db.session.flush()
+    listing = Listing(restaurant_id=restaurant.id, title="Flash deal", original_price=Decimal('10'),
+                      count=stock, consume_within=12,
+                      expires_at=datetime.now(UTC) + timedelta(hours=12))
+    db.session.add(listing)
+    db.session.commit()
+    return listing.id, [user.id for user in users[:-1]]
+
+
+def _buy(listing_id, user_id, quantity, use_holds):
+    """One checkout attempt in its own transaction; True when the units were sold."""
+    if use_holds:
+        bought = hold_stock(user_id, listing_id, quantity) and \
+            claim_stock({listing_id: quantity}, user_holds(user_id)) is None
+    else:
+        bought = take_stock(listing_id, quantity)
+    if bought:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return bought
+
+
+def run_benchmark(app, buyers=200, stock=50, quantity=1, use_holds=False):
+    """
+    Let ``buyers`` threads each try to buy ``quantity`` units of one listing at once.
+
+    :return: dict with the units sold and left, the rejected and failed attempts, whether
+             the listing was oversold, and the elapsed time and attempts per second
+    """
+    with app.app_context():
+        db.create_all()
+        listing_id, user_ids = _seed(buyers, stock)
+        db.session.remove()
+
+    results = {'sold': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    start_line = threading.Barrier(buyers)
+
+    def buyer(user_id):
+        with app.app_context():
+            start_line.wait()
+            outcome = 'errors'
+            try:
+                for _ in range(LOCK_RETRIES):
+                    try:
+                        outcome = 'sold' if _buy(listing_id, user_id, quantity, use_holds) else 'rejected'
+                        break
+                    except OperationalError:
+                        # SQLite reports a busy database instead of waiting on a row lock
+                        db.session.rollback()
+                        time.sleep(0.01)
+            finally:
+                db.session.remove()
+            with lock:
+                results[outcome] += 1
+
+    threads = [threading.Thread(target=buyer, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.get(Listing, listing_id).count
+        db.session.remove()
+
+    sold_units = results['sold'] * quantity
+    return {
+        'buyers': buyers,
+        'stock': stock,
+        'sold_units': sold_units,
+        'remaining': remaining,
+        'rejected': results['rejected'],
+        'errors': results['errors'],
+        'oversold': remaining < 0 or sold_units + remaining != stock,
+        'seconds': round(elapsed, 3),
+        'attempts_per_second': round(buyers / elapsed, 1) if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.scripts.stock_stress_benchmark",
+                                     description="Concurrent buyers against one listing")
+    parser.add_argument("--buyers", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--holds", action="store_true", help="hold the units in the cart before checking out")
+    parser.add_argument("--database-uri", help="scratch database to run against (default: a temporary SQLite file)")
+    args = parser.parse_args(argv)
+
+    directory = None
+    database_uri = args.database_uri
+    if database_uri is None:
+        directory = tempfile.TemporaryDirectory()
+        database_uri = f"sqlite:///{os.path.join(directory.name, 'stock_stress.db')}"
+
+    try:
+        app = create_benchmark_app(database_uri, hold_seconds=600 if args.holds else 0)
+        result = run_benchmark(app, args.buyers, args.stock, args.quantity, args.holds)
+    finally:
+        if directory is not None:
+            directory.cleanup()
+
+    for name, value in result.items():
+        print(f"{name:>20}: {value}")
+    return 1 if result['oversold'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,28 @@
-from datetime import datetime
-from src.models import Restaurant, Purchase, PurchaseStatus, RestaurantComment
-from decimal import Decimal
+from datetime import datetime, date
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import Restaurant, RestaurantComment
+from src.services.sales_rollup_service import sales_totals
+from src.services.sales_series_service import parse_range, sales_series, series_to_dict
+
+RECENT_COMMENTS = 5
+
+
+def _recent_comments(restaurant_id, with_badges=False):
+    """The newest comments of a restaurant with their authors (and badges), without loading the rest."""
+    options = [joinedload(RestaurantComment.user)]
+    if with_badges:
+        options.append(selectinload(RestaurantComment.badges))
+    return RestaurantComment.query.options(*options) \
+        .filter_by(restaurant_id=restaurant_id) \
+        .order_by(RestaurantComment.timestamp.desc()) \
+        .limit(RECENT_COMMENTS).all()
 
 
 class RestaurantAnalyticsService:
     @staticmethod
     def get_owner_analytics(owner_id):
         today = datetime.utcnow()
-        start_date = datetime(today.year, today.month, 1)
+        start_date = date(today.year, today.month, 1)
 
         restaurants = Restaurant.query.filter_by(owner_id=owner_id).all()
         restaurant_ids = [r.id for r in restaurants]
@@ -18,25 +33,12 @@ class RestaurantAnalyticsService:
                 "message": "No restaurants found for this owner"
             }, 404
 
-        monthly_purchases = Purchase.query.filter(
-            Purchase.restaurant_id.in_(restaurant_ids),
-            Purchase.status == PurchaseStatus.COMPLETED,
-            Purchase.purchase_date >= start_date
-        ).all()
-
-        monthly_products = sum(p.quantity for p in monthly_purchases)
-        monthly_revenue = sum(Decimal(p.total_price) for p in monthly_purchases)
-
-        regions = {}
-        for purchase in monthly_purchases:
-            if purchase.delivery_district:
-                district = purchase.delivery_district
-                regions[district] = regions.get(district, 0) + 1
+        # Sales come from the monthly rollups, so the cost does not grow with the order volume
+        totals = sales_totals(restaurant_ids, start_date)
 
         restaurant_stats = {}
         for restaurant in restaurants:
-            comments = RestaurantComment.query.filter_by(restaurant_id=restaurant.id) \
-                .order_by(RestaurantComment.timestamp.desc()).all()
+            comments = _recent_comments(restaurant.id)
 
             restaurant_stats[restaurant.restaurantName] = {
                 "id": restaurant.id,
@@ -47,18 +49,18 @@ class RestaurantAnalyticsService:
                     "rating": float(comment.rating),
                     "comment": comment.comment,
                     "timestamp": comment.timestamp if isinstance(comment.timestamp, str) else comment.timestamp.isoformat()
-                } for comment in comments[:5]]
+                } for comment in comments]
             }
 
         return {
             "success": True,
             "data": {
                 "monthly_stats": {
-                    "total_products_sold": monthly_products,
-                    "total_revenue": str(monthly_revenue),
+                    "total_products_sold": totals.units,
+                    "total_revenue": str(totals.revenue),
                     "period": f"{today.year}-{today.month:02d}"
                 },
-                "regional_distribution": regions,
+                "regional_distribution": totals.regions,
                 "restaurant_ratings": restaurant_stats
             }
         }, 200
@@ -66,7 +68,7 @@ class RestaurantAnalyticsService:
     @staticmethod
     def get_restaurant_analytics(restaurant_id):
         today = datetime.utcnow()
-        start_date = datetime(today.year, today.month, 1)
+        start_date = date(today.year, today.month, 1)
 
         restaurant = Restaurant.query.get(restaurant_id)
         if not restaurant:
@@ -75,23 +77,8 @@ class RestaurantAnalyticsService:
                 "message": f"Restaurant with ID {restaurant_id} not found"
             }, 404
 
-        monthly_purchases = Purchase.query.filter(
-            Purchase.restaurant_id == restaurant_id,
-            Purchase.status == PurchaseStatus.COMPLETED,
-            Purchase.purchase_date >= start_date
-        ).all()
-
-        monthly_products = sum(p.quantity for p in monthly_purchases)
-        monthly_revenue = sum(Decimal(p.total_price) for p in monthly_purchases)
-
-        regions = {}
-        for purchase in monthly_purchases:
-            if purchase.delivery_district:
-                district = purchase.delivery_district
-                regions[district] = regions.get(district, 0) + 1
-
-        comments = RestaurantComment.query.filter_by(restaurant_id=restaurant_id) \
-            .order_by(RestaurantComment.timestamp.desc()).all()
+        totals = sales_totals([restaurant_id], start_date)
+        comments = _recent_comments(restaurant_id, with_badges=True)
 
         restaurant_stats = {
             "id": restaurant.id,
@@ -107,18 +94,57 @@ class RestaurantAnalyticsService:
                     "name": badge.badge_name,
                     "is_positive": badge.is_positive
                 } for badge in comment.badges]
-            } for comment in comments[:5]]
+            } for comment in comments]
         }
 
         return {
             "success": True,
             "data": {
                 "monthly_stats": {
-                    "total_products_sold": monthly_products,
-                    "total_revenue": str(monthly_revenue),
+                    "total_products_sold": totals.units,
+                    "total_revenue": str(totals.revenue),
                     "period": f"{today.year}-{today.month:02d}"
                 },
-                "regional_distribution": regions,
+                "regional_distribution": totals.regions,
                 "restaurant_stats": restaurant_stats
             }
-        }, 200
\ No newline at end of file
+        }, 200
+
+    @staticmethod
+    def get_sales_timeseries(owner_id, params):
+        """
+        Sales of the owner's restaurants (or of the one in ``restaurant_id``) per hour, day,
+        week or month over an arbitrary range; see ``sales_series_service.parse_range``.
+        """
+        owned = [row.id for row in Restaurant.query.with_entities(Restaurant.id).filter_by(owner_id=owner_id).all()]
+        if not owned:
+            return {
+                "success": False,
+                "message": "No restaurants found for this owner"
+            }, 404
+
+        restaurant_ids = owned
+        if params.get('restaurant_id'):
+            try:
+                restaurant_id = int(params['restaurant_id'])
+            except (TypeError, ValueError):
+                return {"success": False, "message": "Invalid restaurant_id"}, 400
+            if restaurant_id not in owned:
+                return {
+                    "success": False,
+                    "message": "You don't have permission to view this restaurant's analytics"
+                }, 403
+            restaurant_ids = [restaurant_id]
+
+        try:
+            start, end, bucket = parse_range(params)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}, 400
+
+        data = series_to_dict(sales_series(restaurant_ids, start, end, bucket))
+        data.update({
+            "restaurant_ids": restaurant_ids,
+            "start": start.isoformat(),
+            "end": end.isoformat()
+        })
+        return {"success": True, "data": data}, 200
@@ -1,13 +1,54 @@
 import logging
 from datetime import datetime, UTC
 from typing import Dict, Any
-from src.models import Purchase, Restaurant
+from src.models import Purchase, Restaurant, NotificationOutbox
+from src.services.notification_outbox_service import enqueue_notification
 from src.services.web_push_notification_service import WebPushNotificationService
 
 logger = logging.getLogger(__name__)
 
 class BusinessNotificationService:
 
+    @staticmethod
+    def _purchase_message(purchase: Purchase, restaurant: Restaurant):
+        notification_data: Dict[str, Any] = {
+            'type': 'new_purchase',
+            'purchase_id': purchase.id,
+            'listing_title': purchase.listing.title if purchase.listing else 'Unknown',
+            'total_price': str(purchase.total_price),
+            'quantity': purchase.quantity,
+            'restaurant_id': restaurant.id,
+            'restaurant_name': restaurant.restaurantName
+        }
+
+        title = "New Order Received!"
+        body = f"New order: {purchase.quantity}x {notification_data['listing_title']} at {restaurant.restaurantName}"
+        return title, body, notification_data
+
+    @staticmethod
+    def queue_purchase_notification(purchase: Purchase, restaurant: Restaurant) -> bool:
+        """
+        Queue the new-order web notification for the restaurant owner in the current
+        transaction; it is delivered by the notification workers after the commit.
+        The purchase must be flushed so it has an id.
+        """
+        if not restaurant or not restaurant.owner_id:
+            logger.warning(f"Restaurant or owner not found for purchase {purchase.id}")
+            return False
+
+        title, body, notification_data = BusinessNotificationService._purchase_message(purchase, restaurant)
+        enqueue_notification(
+            restaurant.owner_id,
+            title,
+            body,
+            notification_data,
+            channel=NotificationOutbox.CHANNEL_WEB,
+            icon="/static/images/logo.png",
+            tag=f"purchase_{purchase.id}",
+            require_interaction=True
+        )
+        return True
+
     @staticmethod
     def send_purchase_notification(purchase_id: int) -> bool:
         try:
@@ -21,18 +62,7 @@ class BusinessNotificationService:
                 logger.warning(f"Restaurant or owner not found for purchase {purchase_id}")
                 return False
 
-            notification_data: Dict[str, Any] = {
-                'type': 'new_purchase',
-                'purchase_id': purchase.id,
-                'listing_title': purchase.listing.title if purchase.listing else 'Unknown',
-                'total_price': str(purchase.total_price),
-                'quantity': purchase.quantity,
-                'restaurant_id': restaurant.id,
-                'restaurant_name': restaurant.restaurantName
-            }
-
-            title = "New Order Received!"
-            body = f"New order: {purchase.quantity}x {notification_data['listing_title']} at {restaurant.restaurantName}"
+            title, body, notification_data = BusinessNotificationService._purchase_message(purchase, restaurant)
 
             # Send web notification only (restaurant owners don't use mobile)
             web_success = WebPushNotificationService.send_notification_to_user_web(
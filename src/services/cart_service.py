@@ -1,12 +1,94 @@
-from src.models import db, UserCart, Listing
+from flask import current_app
+from sqlalchemy import select, literal
+
+from src.models import db, UserCart, Listing, StockHold
+from src.services.stock_service import hold_seconds, user_holds, hold_stock, release_holds
+from src.utils.expiring_store import MemoryStore
+
+CART_CACHE_PREFIX = "cart:"
+
+
+def _cart_cache():
+    """
+    Per-process cache of serialized carts, on when ``CART_CACHE_SECONDS`` is set.
+    Writes through this module invalidate it; changes made elsewhere (checkout in another
+    worker, expired listings) show up once the entry times out.
+    """
+    if not current_app.config.get('CART_CACHE_SECONDS'):
+        return None
+    cache = current_app.extensions.get('cart_cache')
+    if cache is None:
+        cache = MemoryStore(max_entries=current_app.config.get('CART_CACHE_MAX_ENTRIES', 10000))
+        current_app.extensions['cart_cache'] = cache
+    return cache
+
+
+def invalidate_cart(user_id):
+    """Drop the user's cached cart; call after committing a change to it."""
+    cache = _cart_cache()
+    if cache is not None:
+        cache.delete(f"{CART_CACHE_PREFIX}{user_id}")
+
+
+def _cart_state(user_id, listing_id):
+    """
+    Everything a cart write checks, in one query: the listing, the restaurant of the
+    user's cart, the quantity of the listing already in it and the units the user holds.
+    Returns None when the listing does not exist.
+    """
+    if hold_seconds():
+        held = select(StockHold.quantity).where(
+            StockHold.user_id == user_id, StockHold.listing_id == listing_id
+        ).scalar_subquery()
+    else:
+        held = literal(0)
+    return db.session.query(
+        Listing.id,
+        Listing.title,
+        Listing.restaurant_id,
+        Listing.count,
+        select(UserCart.restaurant_id).where(
+            UserCart.user_id == user_id
+        ).limit(1).scalar_subquery().label('cart_restaurant_id'),
+        select(UserCart.count).where(
+            UserCart.user_id == user_id, UserCart.listing_id == listing_id
+        ).scalar_subquery().label('in_cart'),
+        held.label('held')
+    ).filter(Listing.id == listing_id).first()
+
+
+def _available(state):
+    """Units the user can have in the cart: the stock left plus what the user already holds."""
+    return state.count + (state.held or 0)
+
+
+def _insufficient_stock(listing, requested, available):
+    return {
+        "message": (f"Insufficient stock for '{listing.title}'. "
+                    f"Requested: {requested}, Available: {available}")
+    }, 400
+
+
+def _hold(user_id, state, quantity):
+    """Hold ``quantity`` units when holds are on; returns an error response when stock ran out."""
+    if not hold_seconds() or hold_stock(user_id, state.id, quantity):
+        return None
+    db.session.rollback()
+    hold = user_holds(user_id).get(state.id)
+    available = db.session.get(Listing, state.id).count + (hold.quantity if hold else 0)
+    return _insufficient_stock(state, quantity, available)
+
 
 def get_cart_items_service(user_id):
     """
-    Retrieve all cart items for the given user.
+    Retrieve all cart items for the given user, with their listings loaded in the same query.
     """
-    cart_items = UserCart.query.filter_by(user_id=user_id).all()
-    if not cart_items:
-        return [], 200
+    cache = _cart_cache()
+    key = f"{CART_CACHE_PREFIX}{user_id}"
+    if cache is not None:
+        cart = cache.get(key)
+        if cart is not None:
+            return list(cart), 200
 
     cart = [
         {
@@ -17,61 +99,48 @@ def get_cart_items_service(user_id):
             "count": item.count,
             "added_at": item.added_at.isoformat() if item.added_at else None
         }
-        for item in cart_items
+        for item in UserCart.items_for_user(user_id)
     ]
-    return cart, 200
+    if cache is not None:
+        cache.set(key, cart, current_app.config['CART_CACHE_SECONDS'])
+    return list(cart), 200
 
 
 def add_to_cart_service(user_id, listing_id, count=1):
     """
     Add an item to the user's cart. If the item is already present, increment its count.
     Enforces that all items in the cart come from the same restaurant.
-    Checks if there's enough stock before committing.
+    Checks if there's enough stock before committing; with STOCK_HOLD_SECONDS set the
+    units are also held for the user until checkout or until the hold expires.
     """
-    # Check if the listing exists:
-    listing = Listing.query.get(listing_id)
-    if not listing:
+    state = _cart_state(user_id, listing_id)
+    if not state:
         return {"message": "Listing not found"}, 404
 
-    # Get all cart items for the current user
-    user_cart_items = UserCart.query.filter_by(user_id=user_id).all()
-
     # If there are items in the cart, ensure they belong to the same restaurant as this listing
-    if user_cart_items:
-        # We assume all items in the cart have the same restaurant_id.
-        existing_restaurant_id = user_cart_items[0].restaurant_id
-        if listing.restaurant_id != existing_restaurant_id:
-            return {
-                "message": "Cannot add item from a different restaurant. "
-                           "Please reset your cart before adding items from another restaurant."
-            }, 400
-
-    # Check if the item already exists in the cart:
-    cart_item = UserCart.query.filter_by(user_id=user_id, listing_id=listing_id).first()
+    if state.cart_restaurant_id is not None and state.cart_restaurant_id != state.restaurant_id:
+        return {
+            "message": "Cannot add item from a different restaurant. "
+                       "Please reset your cart before adding items from another restaurant."
+        }, 400
 
     # Calculate the new total quantity that the user wants in the cart
-    new_quantity = (cart_item.count + count) if cart_item else count
+    new_quantity = (state.in_cart or 0) + count
 
     # Check if there is enough stock
-    if new_quantity > listing.count:
-        return {
-            "message": (f"Insufficient stock for '{listing.title}'. "
-                        f"Requested: {new_quantity}, Available: {listing.count}")
-        }, 400
+    available = _available(state)
+    if new_quantity > available:
+        return _insufficient_stock(state, new_quantity, available)
 
-    # If there's enough stock, proceed
-    if cart_item:
-        cart_item.count = new_quantity
-    else:
-        cart_item = UserCart(
-            user_id=user_id,
-            listing_id=listing_id,
-            restaurant_id=listing.restaurant_id,  # set restaurant_id from listing
-            count=new_quantity
-        )
-        db.session.add(cart_item)
+    UserCart.upsert(user_id, listing_id, state.restaurant_id, count)
+
+    # Another cart may have taken the units since they were read
+    error = _hold(user_id, state, new_quantity)
+    if error:
+        return error
 
     db.session.commit()
+    invalidate_cart(user_id)
     return {"message": "Item added to cart"}, 201
 
 
@@ -80,29 +149,29 @@ def update_cart_item_service(user_id, listing_id, count):
     Update the quantity of an item in the user's cart.
     Checks if there's enough stock before committing.
     """
-    cart_item = UserCart.query.filter_by(user_id=user_id, listing_id=listing_id).first()
-    if not cart_item:
+    state = _cart_state(user_id, listing_id)
+    if not state or state.in_cart is None:
         return {"message": "Item not found in cart"}, 404
 
-    listing = Listing.query.get(listing_id)
-    if not listing:
-        return {"message": "Listing not found"}, 404
-
     # Check if there is enough stock
-    if count > listing.count:
-        return {
-            "message": (f"Insufficient stock for '{listing.title}'. "
-                        f"Requested: {count}, Available: {listing.count}")
-        }, 400
+    available = _available(state)
+    if count > available:
+        return _insufficient_stock(state, count, available)
+
+    error = _hold(user_id, state, count)
+    if error:
+        return error
 
     # If count is set to zero, remove the item instead
     if count == 0:
-        db.session.delete(cart_item)
+        UserCart.query.filter_by(user_id=user_id, listing_id=listing_id).delete(synchronize_session=False)
         db.session.commit()
+        invalidate_cart(user_id)
         return {"message": "Item removed from cart"}, 200
 
-    cart_item.count = count
+    UserCart.upsert(user_id, listing_id, state.restaurant_id, count, increment=False)
     db.session.commit()
+    invalidate_cart(user_id)
     return {"message": "Cart item updated"}, 200
 
 
@@ -110,12 +179,14 @@ def remove_from_cart_service(user_id, listing_id):
     """
     Remove an item from the user's cart.
     """
-    cart_item = UserCart.query.filter_by(user_id=user_id, listing_id=listing_id).first()
-    if not cart_item:
+    removed = UserCart.query.filter_by(user_id=user_id, listing_id=listing_id).delete(synchronize_session=False)
+    if not removed:
+        db.session.rollback()
         return {"message": "Item not found in cart"}, 404
 
-    db.session.delete(cart_item)
+    release_holds(user_id, [listing_id])
     db.session.commit()
+    invalidate_cart(user_id)
     return {"message": "Item removed from cart"}, 200
 
 
@@ -123,11 +194,12 @@ def reset_cart_service(user_id):
     """
     Remove all items from the user's cart.
     """
-    cart_items = UserCart.query.filter_by(user_id=user_id).all()
-    if not cart_items:
+    removed = UserCart.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    if not removed:
+        db.session.rollback()
         return {"message": "Cart is already empty"}, 200
 
-    for item in cart_items:
-        db.session.delete(item)
+    release_holds(user_id)
     db.session.commit()
-    return {"message": "Cart reset successfully"}, 200
\ No newline at end of file
+    invalidate_cart(user_id)
+    return {"message": "Cart reset successfully"}, 200
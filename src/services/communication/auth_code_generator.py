@@ -1,13 +1,15 @@
 # auth_code_generator.py
-import time
 import random
 
-# Rate-limiting dictionaries
-IP_TRACKER = {}
-EMAIL_TRACKER = {}
-PHONE_TRACKER = {}
+from src.utils.expiring_store import get_expiring_store
+
+# Rate limits: at most REQUEST_LIMIT requests in a burst, refilled evenly over TIME_FRAME
 REQUEST_LIMIT = 3
 TIME_FRAME = 30 * 60  # 30 minutes in seconds
+REFILL_PER_SECOND = REQUEST_LIMIT / TIME_FRAME
+
+CODE_PREFIX = "verification:"
+RATE_LIMIT_PREFIX = "auth-rate:"
 
 
 def set_verification_code():
@@ -17,84 +19,52 @@ def set_verification_code():
     return f"{random.randint(100000, 999999)}"
 
 
-def check_rate_limit_ip(ip_address):
-    # noinspection GrazieInspection
+def _check_rate_limit(kind, value, message):
     """
-        Check and update rate limits for the given IP address.
+    Take one token from the bucket of ``value``. Uses the shared expiring store, so the
+    limit holds across workers and a check costs the same however busy the key is.
 
-        Returns:
-            (bool, str): (Success status, Message)
-        """
-    if not ip_address:
+    Returns:
+        (bool, str): (Success status, Message)
+    """
+    if not value:
         return True, ""
 
-    current_time = time.time()
-    timestamps = IP_TRACKER.get(ip_address, [])
+    state = get_expiring_store().consume(f"{RATE_LIMIT_PREFIX}{kind}:{value}", REQUEST_LIMIT, REFILL_PER_SECOND)
+    if not state.allowed:
+        return False, message
+    return True, ""
 
-    # Remove timestamps older than TIME_FRAME
-    IP_TRACKER[ip_address] = [t for t in timestamps if current_time - t < TIME_FRAME]
 
-    if len(IP_TRACKER[ip_address]) >= REQUEST_LIMIT:
-        return False, "Too many requests from this IP address. Try again later."
+def check_rate_limit_ip(ip_address):
+    """
+        Check and update rate limits for the given IP address.
 
-    # Record the current request
-    IP_TRACKER[ip_address].append(current_time)
-    return True, ""
+        Returns:
+            (bool, str): (Success status, Message)
+        """
+    return _check_rate_limit("ip", ip_address, "Too many requests from this IP address. Try again later.")
 
 
 def check_rate_limit_email(email):
-    # noinspection GrazieInspection
     """
         Check and update rate limits for the given email address.
 
         Returns:
             (bool, str): (Success status, Message)
         """
-    if not email:
-        return True, ""
-
-    current_time = time.time()
-    timestamps = EMAIL_TRACKER.get(email, [])
-
-    # Remove timestamps older than TIME_FRAME
-    EMAIL_TRACKER[email] = [t for t in timestamps if current_time - t < TIME_FRAME]
-
-    if len(EMAIL_TRACKER[email]) >= REQUEST_LIMIT:
-        return False, "Too many requests to this email. Try again later."
-
-    # Record the current request
-    EMAIL_TRACKER[email].append(current_time)
-    return True, ""
+    return _check_rate_limit("email", email, "Too many requests to this email. Try again later.")
 
 
 def check_rate_limit_phone(phone_number):
-    # noinspection GrazieInspection
     """
         Check and update rate limits for the given phone number.
 
         Returns:
             (bool, str): (Success status, Message)
         """
-    if not phone_number:
-        return True, ""
-
-    current_time = time.time()
-    timestamps = PHONE_TRACKER.get(phone_number, [])
-
-    # Remove timestamps older than TIME_FRAME
-    PHONE_TRACKER[phone_number] = [t for t in timestamps if current_time - t < TIME_FRAME]
-
-    if len(PHONE_TRACKER[phone_number]) >= REQUEST_LIMIT:
-        return False, "Too many requests to this phone number. Try again later."
-
-    # Record the current request
-    PHONE_TRACKER[phone_number].append(current_time)
-    return True, ""
-
+    return _check_rate_limit("phone", phone_number, "Too many requests to this phone number. Try again later.")
 
-# Example storage mechanism (in-memory for simplicity)
-# In production, consider using a database or cache like Redis
-VERIFICATION_CODES = {}
 
 def store_verification_code(identifier, code, expiry=30 * 24 * 60 * 60):
     """
@@ -105,8 +75,7 @@ def store_verification_code(identifier, code, expiry=30 * 24 * 60 * 60):
         Code (str): The verification code.
         Expiry (int): Time in seconds before the code expires.
     """
-    expiration_time = time.time() + expiry
-    VERIFICATION_CODES[identifier] = {'code': code, 'expires_at': expiration_time}
+    get_expiring_store().set(f"{CODE_PREFIX}{identifier}", code, expiry)
 
 
 
@@ -154,14 +123,7 @@ def get_stored_code(identifier):
     Returns:
         str or None: The stored verification code if valid, else None.
     """
-    record = VERIFICATION_CODES.get(identifier)
-    if not record:
-        return None
-    if time.time() > record['expires_at']:
-        # Code has expired
-        del VERIFICATION_CODES[identifier]
-        return None
-    return record['code']
+    return get_expiring_store().get(f"{CODE_PREFIX}{identifier}")
 
 
 def verify_code(identifier, provided_code):
@@ -178,7 +140,7 @@ def verify_code(identifier, provided_code):
     stored_code = get_stored_code(identifier)
     if stored_code and stored_code == provided_code:
         # Optionally delete the code after successful verification
-        del VERIFICATION_CODES[identifier]
+        get_expiring_store().delete(f"{CODE_PREFIX}{identifier}")
         return True, ""
     elif stored_code and stored_code != provided_code:
         return False, "Code does not match"
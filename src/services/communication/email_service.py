@@ -1,50 +1,58 @@
 import os
 import base64
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
 from azure.communication.email import EmailClient
 
 # Load environment variables (if needed)
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SENDER_EMAIL_ADDRESS = os.getenv("SENDER_ADDRESS")
-def send_email(recipient_address, subject, verification_code):
-    try:
-        # Retrieve the connection string
-        connection_string = os.getenv("EMAIL_CONNECTION_STRING")
-        if not connection_string:
-            raise ValueError("EMAIL_CONNECTION_STRING is not set in the .env file.")
-
-        client = EmailClient.from_connection_string(connection_string)
-
-        # Construct the correct path to the logo
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static', 'freshdeal-logo.png')
-        attachments = []
-        image_html = ""  # Default: no image
-
-        # Check if the logo exists
-        if os.path.exists(logo_path):
-            with open(logo_path, 'rb') as logo_file:
-                logo_content = logo_file.read()
-                logo_base64 = base64.b64encode(logo_content).decode()
-
-            logo_cid = "freshdeallogo"
-            image_html = f"""
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static', 'freshdeal-logo.png')
+LOGO_CID = "freshdeallogo"
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2.0
+
+
+@lru_cache(maxsize=1)
+def logo_attachment():
+    """The inline logo attachment, read and base64-encoded once per process; None if the file is missing."""
+    if not os.path.exists(LOGO_PATH):
+        logger.warning(f"Logo not found at {LOGO_PATH}. Sending emails without the logo.")
+        return None
+    with open(LOGO_PATH, 'rb') as logo_file:
+        logo_base64 = base64.b64encode(logo_file.read()).decode()
+    return {
+        "name": "freshdeal-logo.png",
+        "contentInBase64": logo_base64,
+        "contentType": "image/png",
+        "disposition": "inline",
+        "contentId": LOGO_CID
+    }
+
+
+def build_email(recipient_address, subject, verification_code):
+    """Build the verification email message in the format Azure Communication Services expects."""
+    attachment = logo_attachment()
+    image_html = ""
+    if attachment:
+        image_html = f"""
             <div style="text-align: center; margin-bottom: 20px;">
-                <img src="cid:{logo_cid}" alt="FreshDeal Logo" style="max-width:200px;">
+                <img src="cid:{LOGO_CID}" alt="FreshDeal Logo" style="max-width:200px;">
             </div>
             """
-            attachments.append({
-                "name": "freshdeal-logo.png",
-                "contentInBase64": logo_base64,  # Correct key name
-                "contentType": "image/png",
-                "disposition": "inline",
-                "contentId": logo_cid
-            })
-        else:
-            print(f"Logo not found at {logo_path}. Sending email without the logo.")
-
-        # Construct email content
-        html_content = f"""
+
+    html_content = f"""
         <html>
             <body>
                 {image_html}
@@ -55,34 +63,242 @@ def send_email(recipient_address, subject, verification_code):
         </html>
         """
 
-        email_message = {
-            "senderAddress": SENDER_EMAIL_ADDRESS,
-            "recipients": {"to": [{"address": recipient_address}]},
-            "content": {"subject": subject, "html": html_content},
-        }
+    email_message = {
+        "senderAddress": SENDER_EMAIL_ADDRESS,
+        "recipients": {"to": [{"address": recipient_address}]},
+        "content": {"subject": subject, "html": html_content},
+    }
+    if attachment:
+        email_message["attachments"] = [attachment]
+    return email_message
+
+
+class AzureEmailTransport:
+    """
+    Sends through one shared ``EmailClient``. A batch is sent by starting every
+    message first and then waiting for all of them, so their round trips overlap.
+    """
+
+    def __init__(self, connection_string):
+        self.client = EmailClient.from_connection_string(connection_string)
+
+    def send_batch(self, messages):
+        """:return: One error per message, None for the ones that were accepted"""
+        pollers = []
+        for message in messages:
+            try:
+                pollers.append(self.client.begin_send(message))
+            except Exception as e:
+                pollers.append(e)
+
+        errors = []
+        for poller in pollers:
+            if isinstance(poller, Exception):
+                errors.append(str(poller))
+                continue
+            try:
+                result = poller.result()
+                logger.info(f"Message sent successfully, Message ID: {result.get('id') or result.get('messageId')}")
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e))
+        return errors
+
+
+class InMemoryEmailTransport:
+    """
+    Stand-in transport that keeps the last ``max_sent`` messages in ``sent``. ``latency``
+    seconds are spent per batch to mimic the service round trip, and ``fail_every`` makes
+    every n-th message fail, so throughput and retries can be measured offline.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, max_sent=10000):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = deque(maxlen=max_sent)
+        self.batches = 0
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        errors = []
+        with self._lock:
+            self.batches += 1
+            for message in messages:
+                self._calls += 1
+                if self.fail_every and self._calls % self.fail_every == 0:
+                    errors.append("Simulated failure")
+                else:
+                    self.sent.append(message)
+                    errors.append(None)
+        return errors
+
+
+class EmailQueue:
+    """
+    Background sender for outgoing emails.
 
-        if attachments:
-            email_message["attachments"] = attachments
+    ``submit`` only appends to an in-memory queue; a daemon thread takes up to
+    ``batch_size`` messages at a time and hands them to the transport. Failed messages
+    are retried after ``retry_base_seconds`` doubling per attempt, and dropped with an
+    error log after ``max_attempts``.
+    """
 
-        # Send the email
-        poller = client.begin_send(email_message)
-        result = poller.result()
+    def __init__(self, transport, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS,
+                 retry_base_seconds=RETRY_BASE_SECONDS):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.sent = 0
+        self.failed = 0
+        self._ready = deque()
+        self._retries = []  # heap of (ready_at, sequence, attempts, message)
+        self._sequence = 0
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="email-queue", daemon=True)
+        self._thread.start()
 
-        if "messageId" in result:
-            print("Message sent successfully, Message ID:", result["messageId"])
-        else:
-            print("Message sent successfully, Response Details:", result)
+    def submit(self, message):
+        with self._condition:
+            self._ready.append((1, message))
+            self._condition.notify_all()
+
+    def pending(self):
+        with self._condition:
+            return len(self._ready) + len(self._retries) + self._in_flight
+
+    def flush(self, timeout=None):
+        """Wait until every submitted message was sent or given up on; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._ready or self._retries or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stop(self, timeout=None):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._retries and self._retries[0][0] <= now:
+                    _, _, attempts, message = heapq.heappop(self._retries)
+                    self._ready.append((attempts, message))
+                if self._ready:
+                    batch = [self._ready.popleft() for _ in range(min(self.batch_size, len(self._ready)))]
+                    self._in_flight = len(batch)
+                    return batch
+                self._condition.wait(self._retries[0][0] - now if self._retries else None)
+            return None
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                errors = self.transport.send_batch([message for _, message in batch])
+            except Exception as e:
+                errors = [str(e)] * len(batch)
+
+            with self._condition:
+                for (attempts, message), error in zip(batch, errors):
+                    if error is None:
+                        self.sent += 1
+                    elif attempts >= self.max_attempts:
+                        self.failed += 1
+                        logger.error(f"Giving up on email to {message['recipients']['to']}: {error}")
+                    else:
+                        delay = self.retry_base_seconds * 2 ** (attempts - 1)
+                        self._sequence += 1
+                        heapq.heappush(self._retries, (time.monotonic() + delay, self._sequence, attempts + 1, message))
+                self._in_flight = 0
+                self._condition.notify_all()
+
+
+_email_queue = None
+_email_queue_lock = threading.Lock()
+
+
+def create_transport():
+    """
+    Azure transport from ``EMAIL_CONNECTION_STRING``; raises when it is missing, so a
+    misconfigured server fails instead of silently dropping verification emails. Set
+    ``EMAIL_TRANSPORT=memory`` to keep emails in memory, e.g. for local development.
+    """
+    if os.getenv("EMAIL_TRANSPORT", "azure").lower() == "memory":
+        logger.warning("EMAIL_TRANSPORT is memory; emails are kept in memory and not delivered.")
+        return InMemoryEmailTransport()
+    connection_string = os.getenv("EMAIL_CONNECTION_STRING")
+    if not connection_string:
+        raise ValueError("EMAIL_CONNECTION_STRING is not set in the .env file.")
+    return AzureEmailTransport(connection_string)
+
+
+def get_email_queue():
+    """Return the process-wide email queue, creating its transport and preloading the logo on first use."""
+    global _email_queue
+    if _email_queue is None:
+        with _email_queue_lock:
+            if _email_queue is None:
+                logo_attachment()
+                _email_queue = EmailQueue(create_transport())
+    return _email_queue
+
+
+def send_email(recipient_address, subject, verification_code):
+    """Queue the verification email; it is sent by the background queue, off the request path."""
+    try:
+        get_email_queue().submit(build_email(recipient_address, subject, verification_code))
     except Exception as e:
         print("Error occurred while sending email:", e)
 
 
+def benchmark(count, batch_size=BATCH_SIZE, latency=0.05):
+    """Send ``count`` emails through an in-memory transport and return the messages per second."""
+    transport = InMemoryEmailTransport(latency=latency)
+    queue = EmailQueue(transport, batch_size=batch_size)
+    started = time.perf_counter()
+    for index in range(count):
+        queue.submit(build_email(f"user{index}@example.com", "Benchmark", "123456"))
+    queue.flush()
+    elapsed = time.perf_counter() - started
+    queue.stop()
+    return count / elapsed
+
+
 if __name__ == "__main__":
-    print("Testing email sending...")
-    print("SENDER_ADDRESS:", SENDER_EMAIL_ADDRESS)
-    print("EMAIL_CONNECTION_STRING:", os.getenv("EMAIL_CONNECTION_STRING"))
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send a test email or benchmark the email queue")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="queue COUNT emails to an in-memory transport")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per batch")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        rate = benchmark(args.benchmark, batch_size=args.batch_size, latency=args.latency)
+        print(f"{args.benchmark} emails, batch size {args.batch_size}: {rate:.0f} emails/s")
+    else:
+        print("Testing email sending...")
+        print("SENDER_ADDRESS:", SENDER_EMAIL_ADDRESS)
+        print("EMAIL_CONNECTION_STRING:", os.getenv("EMAIL_CONNECTION_STRING"))
 
-    test_recipient = os.getenv("TEST_EMAIL_ADDRESS")
-    test_subject = "Test Email from FreshDeal"
-    test_verification_code = "123456"
+        test_recipient = os.getenv("TEST_EMAIL_ADDRESS")
+        test_subject = "Test Email from FreshDeal"
+        test_verification_code = "123456"
 
-    send_email(test_recipient, test_subject, test_verification_code)
+        send_email(test_recipient, test_subject, test_verification_code)
+        get_email_queue().flush()
@@ -0,0 +1,82 @@
+import numpy as np
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from src.models import db, Restaurant, CustomerAddress
+from src.utils.geo import bounding_box, to_float_array, within_radius
+from src.utils.spatial_index import get_restaurant_index
+
+
+def bounding_box_filter(lat_column, lon_column, lat, lon, radius_km):
+    """
+    SQL predicate restricting ``lat_column``/``lon_column`` to the bounding box of the
+    search circle, so the composite (latitude, longitude) indexes can be used before the
+    exact haversine check runs in Python.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    lat_predicate = lat_column.between(min_lat, max_lat)
+
+    if max_lon - min_lon >= 360:
+        return lat_predicate
+    if min_lon < -180:
+        lon_predicate = or_(lon_column >= min_lon + 360, lon_column <= max_lon)
+    elif max_lon > 180:
+        lon_predicate = or_(lon_column >= min_lon, lon_column <= max_lon - 360)
+    else:
+        lon_predicate = lon_column.between(min_lon, max_lon)
+    return and_(lat_predicate, lon_predicate)
+
+
+def find_restaurants_near(lat, lon, radius_km, flash_deals_only=False):
+    """
+    Return ``(restaurant_id, distance_km)`` pairs within ``radius_km``, nearest first.
+
+    Uses the in-process spatial index unless ``SPATIAL_INDEX_ENABLED`` is turned off, in
+    which case the candidates come from a bounding-box query against the database.
+    """
+    if current_app.config.get('SPATIAL_INDEX_ENABLED', True):
+        return get_restaurant_index().query(lat, lon, radius_km, flash_deals_only=flash_deals_only)
+
+    query = db.session.query(
+        Restaurant.id,
+        Restaurant.latitude,
+        Restaurant.longitude,
+        Restaurant.maxDeliveryDistance
+    ).filter(bounding_box_filter(Restaurant.latitude, Restaurant.longitude, lat, lon, radius_km))
+    if flash_deals_only:
+        query = query.filter(Restaurant.flash_deals_available == True)
+
+    rows = query.all()
+    ids, distances = within_radius(
+        lat, lon, radius_km,
+        [row.id for row in rows],
+        to_float_array(row.latitude for row in rows),
+        to_float_array(row.longitude for row in rows),
+        max_distances=to_float_array(
+            np.inf if row.maxDeliveryDistance is None else row.maxDeliveryDistance for row in rows
+        )
+    )
+    return list(zip(ids.tolist(), distances.tolist()))
+
+
+def find_primary_addresses_near(lat, lon, radius_km):
+    """
+    Return ``(user_id, distance_km)`` pairs for users whose primary address lies within
+    ``radius_km`` of the point, nearest first.
+    """
+    rows = db.session.query(
+        CustomerAddress.user_id,
+        CustomerAddress.latitude,
+        CustomerAddress.longitude
+    ).filter(
+        CustomerAddress.is_primary == True,
+        bounding_box_filter(CustomerAddress.latitude, CustomerAddress.longitude, lat, lon, radius_km)
+    ).all()
+
+    ids, distances = within_radius(
+        lat, lon, radius_km,
+        [row.user_id for row in rows],
+        to_float_array(row.latitude for row in rows),
+        to_float_array(row.longitude for row in rows)
+    )
+    return list(zip(ids.tolist(), distances.tolist()))
@@ -0,0 +1,284 @@
+import threading
+from datetime import datetime, UTC
+
+import numpy as np
+from flask import current_app
+from scipy import sparse
+from sqlalchemy import insert
+
+from src.models import db, ItemSimilarity
+
+# Number of neighbors kept per item for each recommendation model
+SIMILARITY_TOP_K = {
+    'listing': 10,
+    'restaurant': 5,
+}
+
+CHUNK_SIZE = 1000
+
+
+def _top_k(indices, scores, own_index, k):
+    mask = (indices != own_index) & (scores > 0)
+    indices, scores = indices[mask], scores[mask]
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        indices, scores = indices[keep], scores[keep]
+    order = np.argsort(-scores, kind='stable')
+    return indices[order], scores[order]
+
+
+def compute_top_k(snapshot, rows, k, chunk_size=CHUNK_SIZE):
+    """
+    Top-``k`` neighbors of the given snapshot rows.
+
+    Similarities are computed a chunk of rows at a time as a sparse product, so only
+    co-purchased items are ever materialized. Returns ``(neighbors, scores)`` arrays of
+    shape ``(len(rows), k)`` holding item ids (padded with -1) and cosine similarities.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    item_ids = np.asarray(snapshot.item_ids, dtype=np.int64)
+    neighbors = np.full((len(rows), k), -1, dtype=np.int64)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        similarities = snapshot.similarity_rows(chunk)
+        for offset, own_index in enumerate(chunk):
+            begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            top_indices, top_scores = _top_k(
+                similarities.indices[begin:end], similarities.data[begin:end], own_index, k
+            )
+            neighbors[start + offset, :len(top_indices)] = item_ids[top_indices]
+            scores[start + offset, :len(top_scores)] = top_scores
+
+    return neighbors, scores
+
+
+def changed_rows(previous, snapshot):
+    """
+    Rows of ``snapshot`` whose neighbor lists may differ from those computed on ``previous``.
+
+    An item's similarities only change when its own purchase row changes, so the rows to
+    recompute are the items whose row changed plus every item sharing a user with one of
+    them. Returns None when a full recompute is needed.
+    """
+    if previous is None:
+        return None
+    if previous.version == snapshot.version:
+        return np.empty(0, dtype=np.int64)
+
+    row_map = np.array([snapshot.item_index.get(item_id, -1) for item_id in previous.item_ids], dtype=np.int64)
+    col_map = np.array([snapshot.user_index.get(user_id, -1) for user_id in previous.user_ids], dtype=np.int64)
+    if (row_map < 0).any() or (col_map < 0).any():
+        # Interactions were removed from the purchase history; positions can't be aligned
+        return None
+
+    old = previous.matrix.tocoo()
+    aligned = sparse.csr_matrix((old.data, (row_map[old.row], col_map[old.col])), shape=snapshot.matrix.shape)
+    diff = (snapshot.matrix - aligned).tocsr()
+    diff.eliminate_zeros()
+
+    touched = np.union1d(
+        np.flatnonzero(np.diff(diff.indptr)),
+        np.setdiff1d(np.arange(snapshot.matrix.shape[0]), row_map)
+    )
+    if len(touched) == 0:
+        return touched
+    return np.union1d(touched, snapshot.similarity_rows(touched).indices)
+
+
+class SimilarityTable:
+    """
+    Read-only, array-backed map from item id to its precomputed neighbors.
+
+    Row ``i`` of ``neighbors``/``scores`` belongs to ``item_ids[i]``; a lookup is one dict
+    access and one array slice. ``source`` is the model snapshot the rows were computed
+    from, or None when they were loaded from the database.
+    """
+
+    def __init__(self, k, item_ids=(), neighbors=None, scores=None, source=None):
+        self.k = k
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.index = {item_id: row for row, item_id in enumerate(self.item_ids.tolist())}
+        self.neighbors = neighbors if neighbors is not None else np.empty((0, k), dtype=np.int64)
+        self.scores = scores if scores is not None else np.empty((0, k), dtype=np.float32)
+        self.source = source
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.index
+
+    def similar(self, item_id):
+        """Return the ``(item_id, similarity)`` neighbors of ``item_id``, best first."""
+        row = self.index.get(item_id)
+        if row is None:
+            return []
+        count = int(np.count_nonzero(self.neighbors[row] >= 0))
+        return list(zip(self.neighbors[row, :count].tolist(), self.scores[row, :count].tolist()))
+
+    def neighbors_of(self, item_ids):
+        """
+        Neighbors of several items in one lookup.
+
+        Returns flat ``(base_ids, neighbor_ids, scores)`` arrays with one entry per
+        neighbor; items missing from the table are skipped.
+        """
+        rows = np.array([self.index[item_id] for item_id in item_ids if item_id in self.index], dtype=np.int64)
+        neighbors = self.neighbors[rows]
+        valid = neighbors >= 0
+        base_ids = np.repeat(self.item_ids[rows], self.k).reshape(neighbors.shape)
+        return base_ids[valid], neighbors[valid], self.scores[rows][valid]
+
+    def updated(self, item_ids, neighbors, scores, source):
+        """Return a new table with the rows of ``item_ids`` replaced or appended."""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        all_ids = self.item_ids.copy()
+        all_neighbors = self.neighbors.copy()
+        all_scores = self.scores.copy()
+
+        existing = np.array([self.index.get(item_id, -1) for item_id in item_ids.tolist()], dtype=np.int64)
+        known = existing >= 0
+        all_neighbors[existing[known]] = neighbors[known]
+        all_scores[existing[known]] = scores[known]
+
+        return SimilarityTable(
+            self.k,
+            np.concatenate([all_ids, item_ids[~known]]),
+            np.concatenate([all_neighbors, neighbors[~known]]),
+            np.concatenate([all_scores, scores[~known]]),
+            source
+        )
+
+
+class ItemSimilarityStore:
+    """
+    Precomputed top-K similar items for one recommendation model.
+
+    The neighbor lists are persisted in ``item_similarities`` so every worker can serve
+    them, and kept in memory as a ``SimilarityTable`` for O(1) reads. ``refresh``
+    recomputes only the items affected by purchases since the previous run.
+    """
+
+    def __init__(self, kind, k):
+        self.kind = kind
+        self.k = k
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = self._load()
+        return self._table
+
+    def similar(self, item_id):
+        return self.table.similar(item_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+
+    def _load(self):
+        rows = db.session.query(
+            ItemSimilarity.item_id,
+            ItemSimilarity.similar_item_id,
+            ItemSimilarity.rank,
+            ItemSimilarity.score
+        ).filter(
+            ItemSimilarity.kind == self.kind,
+            ItemSimilarity.rank < self.k
+        ).all()
+        if not rows:
+            return SimilarityTable(self.k)
+
+        item_ids, similar_ids, ranks, scores = (np.asarray(column) for column in zip(*rows))
+        items, positions = np.unique(item_ids.astype(np.int64), return_inverse=True)
+        neighbors = np.full((len(items), self.k), -1, dtype=np.int64)
+        table_scores = np.zeros((len(items), self.k), dtype=np.float32)
+        neighbors[positions, ranks.astype(np.int64)] = similar_ids
+        table_scores[positions, ranks.astype(np.int64)] = scores
+        return SimilarityTable(self.k, items, neighbors, table_scores)
+
+    def refresh(self, snapshot):
+        """
+        Bring the neighbor lists up to date with ``snapshot``.
+
+        :return: Number of items whose neighbors were recomputed
+        """
+        self.table  # make sure the persisted rows are loaded first
+        with self._lock:
+            table = self._table
+            rows = changed_rows(table.source, snapshot)
+            full = rows is None
+            if full:
+                rows = np.arange(len(snapshot.item_ids))
+            if len(rows) == 0:
+                self._table = SimilarityTable(self.k, table.item_ids, table.neighbors, table.scores, snapshot)
+                return 0
+
+            item_ids = np.asarray(snapshot.item_ids, dtype=np.int64)[rows]
+            neighbors, scores = compute_top_k(snapshot, rows, self.k)
+            self._persist(item_ids, neighbors, scores, full)
+
+            if full:
+                self._table = SimilarityTable(self.k, item_ids, neighbors, scores, snapshot)
+            else:
+                self._table = table.updated(item_ids, neighbors, scores, snapshot)
+            return len(rows)
+
+    def _persist(self, item_ids, neighbors, scores, full):
+        try:
+            existing = ItemSimilarity.query.filter(ItemSimilarity.kind == self.kind)
+            if full:
+                existing.delete(synchronize_session=False)
+            else:
+                for start in range(0, len(item_ids), CHUNK_SIZE):
+                    chunk = item_ids[start:start + CHUNK_SIZE].tolist()
+                    existing.filter(ItemSimilarity.item_id.in_(chunk)).delete(synchronize_session=False)
+
+            computed_at = datetime.now(UTC)
+            item_rows, ranks = np.nonzero(neighbors >= 0)
+            records = [
+                {
+                    'kind': self.kind,
+                    'item_id': item_id,
+                    'similar_item_id': similar_item_id,
+                    'rank': rank,
+                    'score': score,
+                    'computed_at': computed_at
+                }
+                for item_id, similar_item_id, rank, score in zip(
+                    item_ids[item_rows].tolist(),
+                    neighbors[item_rows, ranks].tolist(),
+                    ranks.tolist(),
+                    scores[item_rows, ranks].tolist()
+                )
+            ]
+            for start in range(0, len(records), CHUNK_SIZE):
+                db.session.execute(insert(ItemSimilarity), records[start:start + CHUNK_SIZE])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+_stores_lock = threading.Lock()
+
+
+def get_similarity_store(kind):
+    """Return the similarity store of the current app for ``kind``, creating it on first use."""
+    stores = current_app.extensions.setdefault('item_similarities', {})
+    store = stores.get(kind)
+    if store is None:
+        with _stores_lock:
+            store = stores.get(kind)
+            if store is None:
+                if kind not in SIMILARITY_TOP_K:
+                    raise ValueError(f"Unknown recommendation model: {kind}")
+                store = ItemSimilarityStore(kind, SIMILARITY_TOP_K[kind])
+                stores[kind] = store
+    return store
@@ -0,0 +1,85 @@
+import logging
+import time
+from datetime import datetime, timedelta, UTC
+
+from src.models import db, Listing, Purchase, PurchaseStatus, PurchaseReport, UserCart, StockHold
+
+logger = logging.getLogger(__name__)
+
+# Listings with this many hours or fewer left are taken off the market
+EXPIRY_THRESHOLD_HOURS = 6
+# Interval between scheduler runs
+UPDATE_INTERVAL_HOURS = 2
+CHUNK_SIZE = 1000
+
+
+def expire_listings(now=None, chunk_size=CHUNK_SIZE):
+    """
+    Remove listings with ``EXPIRY_THRESHOLD_HOURS`` or less left, one chunk per transaction.
+
+    Pending purchases of those listings are rejected in bulk (accepted ones cannot be
+    rejected any more), purchases and reports keep their rows with ``listing_id`` cleared
+    as an ORM delete would do, and cart entries and stock holds pointing at the listings
+    are dropped (the held units leave with the listing, so nothing is given back).
+
+    :return: ``(expired_listings, rejected_purchases)``
+    """
+    now = now or datetime.now(UTC)
+    horizon = now + timedelta(hours=EXPIRY_THRESHOLD_HOURS)
+    listing_ids = [
+        listing_id for listing_id, in db.session.query(Listing.id).filter(
+            Listing.expires_at > now,
+            Listing.expires_at <= horizon
+        )
+    ]
+
+    expired = 0
+    rejected = 0
+    for start in range(0, len(listing_ids), chunk_size):
+        chunk = listing_ids[start:start + chunk_size]
+        try:
+            chunk_rejected = db.session.query(Purchase).filter(
+                Purchase.listing_id.in_(chunk),
+                Purchase.status == PurchaseStatus.PENDING
+            ).update({Purchase.status: PurchaseStatus.REJECTED}, synchronize_session=False)
+            db.session.query(Purchase).filter(
+                Purchase.listing_id.in_(chunk)
+            ).update({Purchase.listing_id: None}, synchronize_session=False)
+            db.session.query(PurchaseReport).filter(
+                PurchaseReport.listing_id.in_(chunk)
+            ).update({PurchaseReport.listing_id: None}, synchronize_session=False)
+            db.session.query(UserCart).filter(
+                UserCart.listing_id.in_(chunk)
+            ).delete(synchronize_session=False)
+            db.session.query(StockHold).filter(
+                StockHold.listing_id.in_(chunk)
+            ).delete(synchronize_session=False)
+            chunk_expired = db.session.query(Listing).filter(
+                Listing.id.in_(chunk)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            expired += chunk_expired
+            rejected += chunk_rejected
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error expiring listings {chunk[0]}-{chunk[-1]}: {str(e)}")
+    return expired, rejected
+
+
+def update_all_listings(now=None):
+    """
+    Scheduler entry point: expire listings about to run out. Freshness values are
+    computed on read (see ``Listing.freshness``), so nothing else is written.
+
+    :return: Dict with row counts and the run duration in milliseconds
+    """
+    started = time.perf_counter()
+    expired, rejected = expire_listings(now)
+
+    metrics = {
+        "expired_listings": expired,
+        "rejected_purchases": rejected,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    logger.info(f"Listing expiry run: {metrics}")
+    return metrics
@@ -1,5 +1,6 @@
 import os
 from src.models import db, Listing
+from src.models.listing_model import freshness_arrays
 from datetime import datetime, timedelta, UTC
 from src.utils.cloud_storage import upload_file, delete_file, allowed_file
 
@@ -81,8 +82,14 @@ def get_listings_service(restaurant_id, page, per_page, url_for_func):
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     listings = pagination.items
 
+    # Freshness is computed for the whole page at once from the timestamps
+    freshness = freshness_arrays(
+        [listing.created_at for listing in listings],
+        [listing.expires_at for listing in listings]
+    )
+
     listings_data = []
-    for listing in listings:
+    for position, listing in enumerate(listings):
         if listing.image_url:
             # Check for both possible Firebase Storage domains
             if "firebasestorage.googleapis.com" in listing.image_url or "firebasestorage.app" in listing.image_url:
@@ -104,10 +111,10 @@ def get_listings_service(restaurant_id, page, per_page, url_for_func):
             "pick_up_price": float(listing.pick_up_price) if listing.pick_up_price else None,
             "delivery_price": float(listing.delivery_price) if listing.delivery_price else None,
             "count": listing.count,
-            "consume_within": listing.consume_within,
-            "consume_within_type": listing.consume_within_type,
-            "fresh_score": round(listing.fresh_score, 2),
-            "update_count": listing.update_count,
+            "consume_within": int(freshness.consume_within[position]),
+            "consume_within_type": str(freshness.consume_within_type[position]),
+            "fresh_score": round(float(freshness.fresh_score[position]), 2),
+            "update_count": int(freshness.update_count[position]),
             "expires_at": listing.expires_at.strftime("%Y-%m-%d %H:%M:%S"),
             "available_for_delivery": listing.available_for_delivery,
             "available_for_pickup": listing.available_for_pickup
@@ -128,56 +135,28 @@ def get_listings_service(restaurant_id, page, per_page, url_for_func):
     return response, 200
 
 
-def search_service(search_type, query_text, restaurant_id):
-    from src.models import Restaurant, Listing
+def search_service(search_type, query_text, restaurant_id, page=1, per_page=20):
+    from src.services.search_service import search_restaurants, search_listings, page_bounds
 
+    page, per_page = page_bounds(page, per_page)
     if not query_text:
         return {"success": False, "message": "Query parameter is required"}, 400
 
     if search_type == "restaurant":
-        results = Restaurant.query.filter(Restaurant.restaurantName.ilike(f"%{query_text}%")).all()
-        data = [{
-            "id": restaurant.id,
-            "name": restaurant.restaurantName,
-            "description": restaurant.restaurantDescription,
-            "image_url": restaurant.image_url,
-            "rating": float(restaurant.rating) if restaurant.rating else None,
-            "category": restaurant.category,
-        } for restaurant in results]
-        return {"success": True, "type": "restaurant", "results": data}, 200
+        data = search_restaurants(query_text, page=page, per_page=per_page)
+        return {"success": True, "type": "restaurant", "results": data, "page": page}, 200
 
     elif search_type == "listing":
-        if not restaurant_id:
-            return {"success": False, "message": "Restaurant ID is required for listing search"}, 400
-
-        results = Listing.query.filter(
-            Listing.restaurant_id == restaurant_id,
-            Listing.title.ilike(f"%{query_text}%")
-        ).all()
-
-        data = []
-        for listing in results:
-            image_url = listing.image_url
+        data = search_listings(query_text, restaurant_id, page=page, per_page=per_page)
+        for listing in data:
+            image_url = listing["image_url"]
             if image_url and not ("firebasestorage.googleapis.com" in image_url or "firebasestorage.app" in image_url):
                 # For local files, construct the URL using the basename
                 filename = os.path.basename(image_url)
                 from flask import url_for
-                image_url = url_for('api_v1.listings.get_uploaded_file', filename=filename, _external=True)
-
-            data.append({
-                "id": listing.id,
-                "restaurant_id": listing.restaurant_id,
-                "title": listing.title,
-                "description": listing.description,
-                "image_url": image_url,
-                "original_price": float(listing.original_price),
-                "count": listing.count,
-                "fresh_score": round(listing.fresh_score, 2),
-                "consume_within": listing.consume_within,
-                "consume_within_type": listing.consume_within_type,
-            })
-
-        return {"success": True, "type": "listing", "results": data}, 200
+                listing["image_url"] = url_for('api_v1.listings.get_uploaded_file', filename=filename, _external=True)
+
+        return {"success": True, "type": "listing", "results": data, "page": page}, 200
 
     else:
         return {"success": False, "message": "Invalid search type. Use 'restaurant' or 'listing'"}, 400
@@ -0,0 +1,488 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, UTC
+
+import requests
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models import db, NotificationOutbox, UserDevice, CustomerAddress
+from src.services.geo_service import bounding_box_filter
+from src.services.notification_service import NotificationService
+from src.services.web_push_notification_service import WebPushNotificationService
+from src.utils.geo import to_float_array, within_radius
+
+logger = logging.getLogger(__name__)
+
+EXPO_PUSH_API = NotificationService.EXPO_PUSH_API
+EXPO_RECEIPTS_API = "https://exp.host/--/api/v2/push/getReceipts"
+# Expo accepts at most 100 messages per send and 1000 ids per receipt request
+EXPO_BATCH_SIZE = 100
+EXPO_RECEIPT_BATCH_SIZE = 1000
+# Expo asks to wait before fetching receipts; they are kept for a day
+RECEIPT_DELAY_MINUTES = 15
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+# How long a claimed row stays with a worker before another one may take it over
+CLAIM_SECONDS = 120
+SENT_RETENTION_DAYS = 7
+FAILED_RETENTION_DAYS = 30
+
+_PENDING_FLAG = 'notification_outbox_pending'
+_http = threading.local()
+
+
+def _session():
+    # One keep-alive session per worker thread; requests.Session is not thread-safe
+    session = getattr(_http, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update({
+            "Accept": "application/json",
+            "Accept-encoding": "gzip, deflate",
+            "Content-Type": "application/json",
+        })
+        _http.session = session
+    return session
+
+
+def enqueue_notification(user_id, title, body, data=None, channel=NotificationOutbox.CHANNEL_EXPO, **options):
+    """
+    Queue a notification to all active devices of a user.
+
+    The row is only added to the session: it is committed, and therefore sent, together
+    with the caller's own changes. Extra keyword arguments are passed to the web push
+    sender for the ``web`` channel (``icon``, ``tag``, ``require_interaction``...).
+    """
+    notification = NotificationOutbox(
+        channel=channel,
+        user_id=user_id,
+        title=title,
+        body=body,
+        data=json.dumps(data, default=str) if data else None,
+        options=json.dumps(options) if options else None,
+        status=NotificationOutbox.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.now(UTC)
+    )
+    db.session.add(notification)
+    db.session.info[_PENDING_FLAG] = True
+    return notification
+
+
+def enqueue_nearby_notification(latitude, longitude, radius_km, title, body, data=None):
+    """
+    Queue a notification to every user whose primary address is within ``radius_km``
+    of the point. Finding the users and their devices is left to the workers, so the
+    cost for the caller does not depend on how many users are nearby.
+    """
+    notification = enqueue_notification(None, title, body, data, channel=NotificationOutbox.CHANNEL_NEARBY)
+    notification.options = json.dumps({
+        "latitude": float(latitude),
+        "longitude": float(longitude),
+        "radius_km": float(radius_km)
+    })
+    return notification
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher(session):
+    if session.info.pop(_PENDING_FLAG, False) and has_app_context():
+        dispatcher = current_app.extensions.get('notification_dispatcher')
+        if dispatcher is not None:
+            dispatcher.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_flag(session):
+    session.info.pop(_PENDING_FLAG, None)
+
+
+def claim_batch(owner, batch_size=EXPO_BATCH_SIZE, now=None):
+    """
+    Lock up to ``batch_size`` due notifications for ``owner``.
+
+    Rows are taken with a conditional ``UPDATE``, so concurrent workers (in this or
+    other processes) never claim the same row. Rows whose claim ran out, because the
+    worker holding them died, are picked up again.
+    """
+    now = now or datetime.now(UTC)
+    claimable = db.or_(
+        db.and_(NotificationOutbox.status == NotificationOutbox.PENDING,
+                NotificationOutbox.next_attempt_at <= now),
+        db.and_(NotificationOutbox.status == NotificationOutbox.PROCESSING,
+                NotificationOutbox.locked_until <= now)
+    )
+    ids = [
+        notification_id for notification_id, in db.session.query(NotificationOutbox.id)
+        .filter(claimable)
+        .order_by(NotificationOutbox.id)
+        .limit(batch_size)
+    ]
+    if not ids:
+        db.session.rollback()
+        return []
+
+    NotificationOutbox.query.filter(NotificationOutbox.id.in_(ids), claimable).update({
+        NotificationOutbox.status: NotificationOutbox.PROCESSING,
+        NotificationOutbox.locked_by: owner,
+        NotificationOutbox.locked_until: now + timedelta(seconds=CLAIM_SECONDS)
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return NotificationOutbox.query.filter(
+        NotificationOutbox.id.in_(ids),
+        NotificationOutbox.status == NotificationOutbox.PROCESSING,
+        NotificationOutbox.locked_by == owner
+    ).order_by(NotificationOutbox.id).all()
+
+
+class _Delivery:
+    """Outcome of one outbox row in a dispatch round."""
+
+    def __init__(self, row):
+        # Tickets of earlier attempts; their tokens are not sent to again
+        self.tickets = json.loads(row.tickets) if row.tickets else {}
+        self.retry_error = None
+        self.error = None
+
+    def unsent(self, tokens):
+        sent = set(self.tickets.values())
+        return [token for token in tokens if token not in sent]
+
+
+def _expo_devices():
+    return db.and_(
+        UserDevice.is_active == True,
+        db.or_(UserDevice.device_type.is_(None), UserDevice.device_type != 'web')
+    )
+
+
+def _expo_tokens(user_ids):
+    tokens = {}
+    rows = db.session.query(UserDevice.user_id, UserDevice.push_token).filter(
+        UserDevice.user_id.in_(user_ids),
+        _expo_devices()
+    ).order_by(UserDevice.id)
+    for user_id, push_token in rows:
+        tokens.setdefault(user_id, []).append(push_token)
+    return tokens
+
+
+def _expo_message(row, to):
+    return {
+        "to": to,
+        "title": row.title,
+        "body": row.body,
+        "data": row.payload_data,
+        "sound": "default",
+        "priority": "high",
+    }
+
+
+def _pack_messages(rows, tokens, deliveries):
+    """
+    Expo messages of ``rows`` in chunks of at most ``EXPO_BATCH_SIZE``.
+
+    Each chunk is ``(recipients, messages)`` with one ``(row_id, token)`` recipient per
+    message. A row's messages are kept in one chunk when they fit, so a failed request
+    only retries the rows it carried.
+    """
+    chunks, current = [], []
+    for row in rows:
+        delivery = deliveries[row.id]
+        user_tokens = delivery.unsent(tokens.get(row.user_id, []))
+        if not user_tokens:
+            if not delivery.tickets:
+                delivery.error = "No active devices"
+            continue
+        messages = [
+            ((row.id, token), _expo_message(row, NotificationService.format_expo_token(token)))
+            for token in user_tokens
+        ]
+        if current and len(current) + len(messages) > EXPO_BATCH_SIZE:
+            chunks.append(current)
+            current = []
+        current.extend(messages)
+        while len(current) >= EXPO_BATCH_SIZE:
+            chunks.append(current[:EXPO_BATCH_SIZE])
+            current = current[EXPO_BATCH_SIZE:]
+    if current:
+        chunks.append(current)
+    return [([recipient for recipient, _ in chunk], [message for _, message in chunk]) for chunk in chunks]
+
+
+def _send_expo_chunk(recipients, messages, deliveries, dead_tokens):
+    """Send one Expo request; ``recipients`` lists the ``(row_id, token)`` of each ticket in order."""
+    row_ids = {row_id for row_id, _ in recipients}
+    try:
+        response = _session().post(EXPO_PUSH_API, json=messages, timeout=10)
+    except requests.exceptions.RequestException as e:
+        for row_id in row_ids:
+            deliveries[row_id].retry_error = f"Network error: {str(e)}"
+        return
+
+    if response.status_code == 429 or response.status_code >= 500:
+        for row_id in row_ids:
+            deliveries[row_id].retry_error = f"Expo returned {response.status_code}"
+        return
+    if response.status_code != 200:
+        for row_id in row_ids:
+            deliveries[row_id].error = f"Expo returned {response.status_code}: {response.text}"
+        return
+
+    tickets = response.json().get('data')
+    if not isinstance(tickets, list) or len(tickets) != len(recipients):
+        for row_id in row_ids:
+            deliveries[row_id].retry_error = f"Unexpected Expo response: {response.text}"
+        return
+
+    for (row_id, token), ticket in zip(recipients, tickets):
+        if ticket.get('status') == 'ok':
+            deliveries[row_id].tickets[ticket['id']] = token
+            continue
+        error = (ticket.get('details') or {}).get('error')
+        if error == 'DeviceNotRegistered':
+            dead_tokens.add(token)
+        elif error == 'MessageRateExceeded':
+            deliveries[row_id].retry_error = ticket.get('message', error)
+        else:
+            deliveries[row_id].error = ticket.get('message', error)
+
+
+def _deliver_expo(rows, deliveries):
+    tokens = _expo_tokens({row.user_id for row in rows})
+    dead_tokens = set()
+    for recipients, messages in _pack_messages(rows, tokens, deliveries):
+        _send_expo_chunk(recipients, messages, deliveries, dead_tokens)
+    deactivate_tokens(dead_tokens)
+
+
+def _nearby_expo_tokens(latitude, longitude, radius_km):
+    """
+    Expo tokens of the users whose primary address lies within ``radius_km``, nearest
+    first. Addresses and devices come from one bounding-box filtered join.
+    """
+    rows = db.session.query(
+        UserDevice.push_token,
+        CustomerAddress.latitude,
+        CustomerAddress.longitude
+    ).join(
+        CustomerAddress, CustomerAddress.user_id == UserDevice.user_id
+    ).filter(
+        CustomerAddress.is_primary == True,
+        bounding_box_filter(CustomerAddress.latitude, CustomerAddress.longitude, latitude, longitude, radius_km),
+        _expo_devices()
+    ).all()
+
+    positions, _ = within_radius(
+        latitude, longitude, radius_km,
+        range(len(rows)),
+        to_float_array(row.latitude for row in rows),
+        to_float_array(row.longitude for row in rows)
+    )
+    return list(dict.fromkeys(rows[position].push_token for position in positions.tolist()))
+
+
+def _deliver_nearby(row, deliveries):
+    """Fan ``row`` out to nearby devices with multi-recipient messages of ``EXPO_BATCH_SIZE`` tokens."""
+    delivery = deliveries[row.id]
+    area = row.payload_options
+    tokens = delivery.unsent(_nearby_expo_tokens(area["latitude"], area["longitude"], area["radius_km"]))
+    if not tokens and not delivery.tickets:
+        delivery.error = "No active devices nearby"
+
+    dead_tokens = set()
+    for start in range(0, len(tokens), EXPO_BATCH_SIZE):
+        chunk = tokens[start:start + EXPO_BATCH_SIZE]
+        message = _expo_message(row, [NotificationService.format_expo_token(token) for token in chunk])
+        _send_expo_chunk([(row.id, token) for token in chunk], [message], deliveries, dead_tokens)
+        if delivery.retry_error:
+            break
+    deactivate_tokens(dead_tokens)
+
+
+def _deliver_web(rows, deliveries):
+    subscribed = {
+        user_id for user_id, in db.session.query(UserDevice.user_id).filter(
+            UserDevice.user_id.in_({row.user_id for row in rows}),
+            UserDevice.device_type == 'web',
+            UserDevice.is_active == True
+        ).distinct()
+    }
+    for row in rows:
+        if row.user_id not in subscribed:
+            deliveries[row.id].error = "No active devices"
+        elif not WebPushNotificationService.send_notification_to_user_web(
+                row.user_id, row.title, row.body, row.payload_data, **row.payload_options):
+            deliveries[row.id].retry_error = "Web push failed"
+
+
+def _finish(row, delivery, now):
+    row.locked_by = None
+    row.locked_until = None
+    if delivery.retry_error:
+        row.attempts += 1
+        row.last_error = delivery.retry_error
+        row.tickets = json.dumps(delivery.tickets) if delivery.tickets else None
+        if row.attempts >= MAX_ATTEMPTS:
+            row.status = NotificationOutbox.FAILED
+        else:
+            delay = min(RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), RETRY_MAX_SECONDS)
+            row.status = NotificationOutbox.PENDING
+            row.next_attempt_at = now + timedelta(seconds=delay)
+    elif delivery.error and not delivery.tickets:
+        row.attempts += 1
+        row.status = NotificationOutbox.FAILED
+        row.last_error = delivery.error
+    else:
+        row.attempts += 1
+        row.status = NotificationOutbox.SENT
+        row.sent_at = now
+        row.last_error = delivery.error
+        row.tickets = json.dumps(delivery.tickets) if delivery.tickets else None
+        row.receipts_checked = not delivery.tickets
+
+
+def dispatch_pending(owner, batch_size=EXPO_BATCH_SIZE, now=None):
+    """
+    Claim one batch of due notifications and deliver it.
+
+    Expo messages of the whole batch go out in as few requests as possible, and nearby
+    announcements as multi-recipient messages. Network errors, 429 and 5xx responses
+    are retried with exponential backoff up to ``MAX_ATTEMPTS`` times, skipping tokens
+    that already got a ticket; tokens Expo reports as unregistered are deactivated.
+
+    :return: Number of notifications processed
+    """
+    rows = claim_batch(owner, batch_size, now)
+    if not rows:
+        return 0
+
+    deliveries = {row.id: _Delivery(row) for row in rows}
+    expo_rows = [row for row in rows if row.channel == NotificationOutbox.CHANNEL_EXPO]
+    web_rows = [row for row in rows if row.channel == NotificationOutbox.CHANNEL_WEB]
+    if expo_rows:
+        _deliver_expo(expo_rows, deliveries)
+    if web_rows:
+        _deliver_web(web_rows, deliveries)
+    for row in rows:
+        if row.channel == NotificationOutbox.CHANNEL_NEARBY:
+            _deliver_nearby(row, deliveries)
+
+    finished_at = now or datetime.now(UTC)
+    for row in rows:
+        _finish(row, deliveries[row.id], finished_at)
+    db.session.commit()
+
+    sent = sum(1 for row in rows if row.status == NotificationOutbox.SENT)
+    logger.info(f"Dispatched {len(rows)} notifications ({sent} sent)")
+    return len(rows)
+
+
+def deactivate_tokens(tokens):
+    """Deactivate the devices of Expo push tokens that are no longer registered."""
+    cleaned = {NotificationService.clean_token(token) for token in tokens}
+    if not cleaned:
+        return 0
+    count = UserDevice.query.filter(UserDevice.push_token.in_(cleaned)).update({
+        UserDevice.is_active: False,
+        UserDevice.last_used: datetime.now(UTC)
+    }, synchronize_session=False)
+    db.session.commit()
+    logger.info(f"Deactivated {count} unregistered push tokens")
+    return count
+
+
+def check_receipts(now=None, limit=EXPO_RECEIPT_BATCH_SIZE):
+    """
+    Fetch the Expo receipts of sent notifications and deactivate dead tokens.
+
+    Only rows sent at least ``RECEIPT_DELAY_MINUTES`` ago are checked; rows whose
+    receipt request fails are left for the next run.
+
+    :return: Number of notifications whose receipts were checked
+    """
+    now = now or datetime.now(UTC)
+    rows = NotificationOutbox.query.filter(
+        NotificationOutbox.status == NotificationOutbox.SENT,
+        NotificationOutbox.receipts_checked == False,
+        NotificationOutbox.tickets.isnot(None),
+        NotificationOutbox.sent_at <= now - timedelta(minutes=RECEIPT_DELAY_MINUTES)
+    ).order_by(NotificationOutbox.id).limit(limit).all()
+
+    # Tickets are fetched EXPO_RECEIPT_BATCH_SIZE at a time; a nearby announcement can
+    # span several requests and only counts as checked when all of them succeed
+    dead_tokens = set()
+    failed = set()
+    batch, batch_rows = {}, set()
+    for row in rows:
+        tickets = list(json.loads(row.tickets).items())
+        for start in range(0, len(tickets), EXPO_RECEIPT_BATCH_SIZE):
+            piece = tickets[start:start + EXPO_RECEIPT_BATCH_SIZE]
+            if batch and len(batch) + len(piece) > EXPO_RECEIPT_BATCH_SIZE:
+                if not _fetch_receipts(batch, dead_tokens):
+                    failed |= batch_rows
+                batch, batch_rows = {}, set()
+            batch.update(piece)
+            batch_rows.add(row.id)
+    if batch and not _fetch_receipts(batch, dead_tokens):
+        failed |= batch_rows
+
+    checked = 0
+    for row in rows:
+        if row.id not in failed:
+            row.receipts_checked = True
+            checked += 1
+
+    db.session.commit()
+    deactivate_tokens(dead_tokens)
+    return checked
+
+
+def _fetch_receipts(tickets, dead_tokens):
+    try:
+        response = _session().post(EXPO_RECEIPTS_API, json={"ids": list(tickets)}, timeout=10)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Network error while fetching push receipts: {str(e)}")
+        return False
+    if response.status_code != 200:
+        logger.error(f"Fetching push receipts failed with status {response.status_code}: {response.text}")
+        return False
+
+    for ticket_id, receipt in (response.json().get('data') or {}).items():
+        if receipt.get('status') == 'error':
+            error = (receipt.get('details') or {}).get('error')
+            if error == 'DeviceNotRegistered' and ticket_id in tickets:
+                dead_tokens.add(tickets[ticket_id])
+            else:
+                logger.warning(f"Push receipt {ticket_id} failed: {receipt.get('message', error)}")
+    return True
+
+
+def purge_outbox(now=None):
+    """Delete delivered notifications after ``SENT_RETENTION_DAYS`` and failed ones after ``FAILED_RETENTION_DAYS``."""
+    now = now or datetime.now(UTC)
+    sent = NotificationOutbox.query.filter(
+        NotificationOutbox.status == NotificationOutbox.SENT,
+        NotificationOutbox.receipts_checked == True,
+        NotificationOutbox.sent_at <= now - timedelta(days=SENT_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    failed = NotificationOutbox.query.filter(
+        NotificationOutbox.status == NotificationOutbox.FAILED,
+        NotificationOutbox.created_at <= now - timedelta(days=FAILED_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return sent + failed
+
+
+def outbox_status():
+    """Number of outbox rows per status."""
+    counts = db.session.query(NotificationOutbox.status, db.func.count(NotificationOutbox.id)).group_by(
+        NotificationOutbox.status
+    )
+    return {status: count for status, count in counts}
@@ -5,31 +5,62 @@ from sqlalchemy import and_
 from werkzeug.utils import secure_filename
 from decimal import Decimal
 
-from src.models import db, UserCart, Purchase, Restaurant, CustomerAddress
+from src.models import db, UserCart, Purchase, Restaurant, CustomerAddress, Listing
 
 from src.models.purchase_model import PurchaseStatus
-from src.services.notification_service import NotificationService
+from src.services.notification_outbox_service import enqueue_notification
 from src.services.achievement_service import AchievementService
 from src.services.business_notification_service import BusinessNotificationService
+from src.services.cart_service import invalidate_cart
 from src.services.discount_service import apply_discount
+from src.services.recommendation_system_service import record_completed_purchase
+# Registers the purchase events that keep the sales rollups current
+import src.services.sales_rollup_service  # noqa: F401
+from src.services.stock_service import user_holds, claim_stock, return_stock, update_sold_out_counters
+
+
+def _format_address(address):
+    address_str = f"{address.street}"
+    if address.apartmentNo:
+        address_str += f" No:{address.apartmentNo}"
+    if address.doorNo:
+        address_str += f" Door:{address.doorNo}"
+    if address.neighborhood:
+        address_str += f", {address.neighborhood}"
+    return address_str
+
+
+def _load_checkout_rows(user_id):
+    """The user's cart items with their listing and restaurant, in one joined query."""
+    return db.session.query(UserCart, Listing, Restaurant).outerjoin(
+        Listing, UserCart.listing_id == Listing.id
+    ).outerjoin(
+        Restaurant, Listing.restaurant_id == Restaurant.id
+    ).filter(
+        UserCart.user_id == user_id
+    ).order_by(UserCart.id).all()
 
 
 def create_purchase_order_service(user_id, data=None):
-    try:
-        cart_items = UserCart.query.filter_by(user_id=user_id).all()
-
-        if not cart_items:
-            return {"message": "Cart is empty"}, 400
-
-        purchases = []
-        cart_items_to_clear = []
+    """
+    Turn the user's cart into pending purchases in a single transaction.
 
+    Cart items, listings and restaurants are read in one joined query and validated in
+    memory. Stock is then taken with one conditional UPDATE per listing (using up the
+    user's cart holds first), the purchases are inserted in one batch and the cart is
+    cleared with one DELETE.
+    """
+    try:
         is_delivery = data.get('is_delivery', False) if data else False
         notes = data.get('pickup_notes') if not is_delivery else data.get('delivery_notes')
         is_flash_deal = data.get('flashdealsactivated', 0) == 1 if data else False
 
+        rows = _load_checkout_rows(user_id)
+        if not rows:
+            return {"message": "Cart is empty"}, 400
+
         # Get user's primary address or the specified address
-        address_id = data.get('address_id')
+        address_id = data.get('address_id') if data else None
         if address_id:
             address = CustomerAddress.query.filter_by(id=address_id, user_id=user_id).first()
         else:
@@ -37,22 +68,26 @@ def create_purchase_order_service(user_id, data=None):
 
         if not address:
             return {"message": "No valid address found for the user"}, 400
+        address_str = _format_address(address)
 
-        for item in cart_items:
-            listing = item.listing
+        # Units held for this cart are no longer in listing.count but belong to the user
+        holds = user_holds(user_id)
+        purchases = []
+        quantities = {}
+        listings = {}
+        restaurants = {}
+        for item, listing, restaurant in rows:
             if not listing:
                 return {"message": f"Listing (ID: {item.listing_id}) not found"}, 404
 
-            if item.count > listing.count:
+            quantities[listing.id] = quantities.get(listing.id, 0) + item.count
+            hold = holds.get(listing.id)
+            available = listing.count + (hold.quantity if hold else 0)
+            if quantities[listing.id] > available:
                 return {
-                    "message": f"Cannot purchase {item.count} of {listing.title}. Only {listing.count} left in stock."
+                    "message": f"Cannot purchase {quantities[listing.id]} of {listing.title}. Only {available} left in stock."
                 }, 400
 
-            price_to_use = listing.delivery_price if is_delivery else listing.pick_up_price
-            if price_to_use is None:
-                price_to_use = listing.original_price
-
-            restaurant = Restaurant.query.get(listing.restaurant_id)
             if not restaurant:
                 return {"message": f"Restaurant (ID: {listing.restaurant_id}) not found"}, 404
 
@@ -60,18 +95,13 @@ def create_purchase_order_service(user_id, data=None):
             if is_flash_deal and not restaurant.flash_deals_available:
                 return {"message": f"Flash deals are not available for restaurant: {restaurant.restaurantName}"}, 400
 
+            price_to_use = listing.delivery_price if is_delivery else listing.pick_up_price
+            if price_to_use is None:
+                price_to_use = listing.original_price
+
             delivery_fee = restaurant.deliveryFee if is_delivery else 0
             total_price = (price_to_use * item.count) + delivery_fee
 
-            # Create address string from components
-            address_str = f"{address.street}"
-            if address.apartmentNo:
-                address_str += f" No:{address.apartmentNo}"
-            if address.doorNo:
-                address_str += f" Door:{address.doorNo}"
-            if address.neighborhood:
-                address_str += f", {address.neighborhood}"
-
             try:
                 purchase = Purchase(
                     user_id=user_id,
@@ -90,46 +120,52 @@ def create_purchase_order_service(user_id, data=None):
                     delivery_notes=notes
                 )
             except ValueError as e:
-                db.session.rollback()
                 return {"message": str(e)}, 400
 
-            if not listing.decrease_stock(item.count):
-                db.session.rollback()
-                return {
-                    "message": f"Cannot create purchase. Not enough stock available for {listing.title}. Current stock: {listing.count}"
-                }, 400
-
-            db.session.add(purchase)
             purchases.append(purchase)
-            cart_items_to_clear.append(item)
+            listings[listing.id] = listing
+            restaurants[restaurant.id] = restaurant
+
+        short_listing_id = claim_stock(quantities, holds)
+        if short_listing_id is not None:
+            db.session.rollback()
+            return {
+                "message": f"Cannot create purchase. Not enough stock available for {listings[short_listing_id].title}."
+            }, 400
+        update_sold_out_counters(list(listings.values()))
+        for listing in listings.values():
+            db.session.expire(listing, ['count'])
 
         # Apply discount based on total purchase amount
         total_before_discount, discount_amount, purchases_with_discount = apply_discount(purchases)
 
-        for item in cart_items_to_clear:
-            db.session.delete(item)
+        db.session.add_all(purchases_with_discount)
+        UserCart.query.filter(
+            UserCart.user_id == user_id,
+            UserCart.id.in_([item.id for item, _, _ in rows])
+        ).delete(synchronize_session=False)
+        for item, _, _ in rows:
+            db.session.expunge(item)
 
         # Increment flash deals count if applicable
-        processed_restaurants = set()
-        for purchase in purchases_with_discount:
-            if purchase.is_flash_deal and purchase.restaurant_id not in processed_restaurants:
-                restaurant = Restaurant.query.get(purchase.restaurant_id)
-                if restaurant:
-                    restaurant.increment_flash_deals_count()
-                    processed_restaurants.add(purchase.restaurant_id)
+        if is_flash_deal:
+            for restaurant in restaurants.values():
+                restaurant.increment_flash_deals_count(commit=False)
 
-        db.session.commit()
-
-        # Send notifications to restaurant owners for each purchase
+        # Notify restaurant owners through the outbox, committed with the order itself
+        db.session.flush()
         for purchase in purchases_with_discount:
-            BusinessNotificationService.send_purchase_notification(purchase.id)
+            BusinessNotificationService.queue_purchase_notification(purchase, restaurants[purchase.restaurant_id])
 
-        # Prepare response with discount information
+        # Serialized before the commit expires the purchases, so it needs no reloads
         response = {
             "message": "Purchase order created successfully, waiting for restaurant approval",
             "purchases": [p.to_dict() for p in purchases_with_discount]
         }
 
+        db.session.commit()
+        invalidate_cart(user_id)
+
         # Include discount information if a discount was applied
         if discount_amount > Decimal('0'):
             response["discount_info"] = {
@@ -183,44 +219,37 @@ def handle_restaurant_response_service(purchase_id, owner_id, action):
             if action == 'reject':
                 # Restore stock when rejected
                 print(f"[DEBUG] Restoring stock. Before: {purchase.listing.count}, Adding back: {purchase.quantity}")
-                purchase.listing.count += purchase.quantity
+                return_stock(purchase.listing_id, purchase.quantity)
+                db.session.expire(purchase.listing, ['count'])
+
+            # Queue the notification to the user in the same transaction as the status change
+            listing = purchase.listing
+            if action == 'accept':
+                enqueue_notification(
+                    user_id=purchase.user_id,
+                    title="Order Accepted",
+                    body=f"Your order for {listing.title} from {restaurant.restaurantName} has been accepted!",
+                    data={
+                        "type": "order_status",
+                        "purchase_id": purchase.id,
+                        "status": "accepted"
+                    }
+                )
+            else:  # action == 'reject'
+                enqueue_notification(
+                    user_id=purchase.user_id,
+                    title="Order Rejected",
+                    body=f"Unfortunately, your order for {listing.title} from {restaurant.restaurantName} has been rejected.",
+                    data={
+                        "type": "order_status",
+                        "purchase_id": purchase.id,
+                        "status": "rejected"
+                    }
+                )
 
             db.session.commit()
             print(f"[DEBUG] Purchase {action}ed successfully.")
 
-            # Send notification to user based on action
-            try:
-                user_id = purchase.user_id
-                listing = purchase.listing
-                restaurant_name = restaurant.restaurantName
-
-                if action == 'accept':
-                    NotificationService.send_notification_to_user(
-                        user_id=user_id,
-                        title="Order Accepted",
-                        body=f"Your order for {listing.title} from {restaurant_name} has been accepted!",
-                        data={
-                            "type": "order_status",
-                            "purchase_id": purchase.id,
-                            "status": "accepted"
-                        }
-                    )
-                else:  # action == 'reject'
-                    NotificationService.send_notification_to_user(
-                        user_id=user_id,
-                        title="Order Rejected",
-                        body=f"Unfortunately, your order for {listing.title} from {restaurant_name} has been rejected.",
-                        data={
-                            "type": "order_status",
-                            "purchase_id": purchase.id,
-                            "status": "rejected"
-                        }
-                    )
-                print(f"[DEBUG] Notification sent to user {user_id} for {action} action.")
-            except Exception as e:
-                # Log the error but don't disrupt the main flow
-                print(f"[DEBUG] Failed to send notification: {str(e)}")
-
             return {
                 "message": f"Purchase {action}ed successfully",
                 "purchase": purchase.to_dict(include_relations=True)
@@ -447,53 +476,47 @@ def add_completion_image_service(purchase_id, owner_id, file_obj, url_for_func):
             purchase.update_status(PurchaseStatus.COMPLETED)
             print("[DEBUG] Updating purchase status to COMPLETED.")
 
+            enqueue_notification(
+                user_id=purchase.user_id,
+                title="Order Ready for Pickup",
+                body=f"Your order for {purchase.listing.title} from {restaurant.restaurantName} is ready! Restaurant has uploaded a confirmation image.",
+                data={
+                    "type": "order_completed",
+                    "purchase_id": purchase.id,
+                    "image_url": image_url
+                }
+            )
+
             db.session.commit()
             print("[DEBUG] Completion image added and purchase updated successfully.")
 
+            # Keep the warm recommendation models in step with the purchase history
+            try:
+                record_completed_purchase(purchase)
+            except Exception as rec_error:
+                print(f"[DEBUG] Failed to update recommendation models: {str(rec_error)}")
+
             # Check and award achievements
             try:
                 newly_earned_achievements = AchievementService.check_and_award_achievements(purchase.user_id,
                                                                                             purchase.id)
 
-                # If achievements were earned, prepare notification data
+                # Queue a notification for each earned achievement
                 if newly_earned_achievements:
-
-                    # Send notification to user for earned achievements
-                    try:
-                        for achievement in newly_earned_achievements:
-                            NotificationService.send_notification_to_user(
-                                user_id=purchase.user_id,
-                                title=f"Achievement Unlocked: {achievement.name}",
-                                body=f"Congratulations! You've earned the {achievement.name} achievement: {achievement.description}",
-                                data={
-                                    "type": "achievement",
-                                    "achievement_id": achievement.id
-                                }
-                            )
-                    except Exception as notify_error:
-                        print(f"[DEBUG] Failed to send achievement notification: {str(notify_error)}")
+                    for achievement in newly_earned_achievements:
+                        enqueue_notification(
+                            user_id=purchase.user_id,
+                            title=f"Achievement Unlocked: {achievement.name}",
+                            body=f"Congratulations! You've earned the {achievement.name} achievement: {achievement.description}",
+                            data={
+                                "type": "achievement",
+                                "achievement_id": achievement.id
+                            }
+                        )
+                    db.session.commit()
             except Exception as ach_error:
+                db.session.rollback()
                 print(f"[DEBUG] Error checking achievements: {str(ach_error)}")
-            # Send notification about order completion
-            try:
-                user_id = purchase.user_id
-                listing = purchase.listing
-                restaurant_name = restaurant.restaurantName
-
-                NotificationService.send_notification_to_user(
-                    user_id=user_id,
-                    title="Order Ready for Pickup",
-                    body=f"Your order for {listing.title} from {restaurant_name} is ready! Restaurant has uploaded a confirmation image.",
-                    data={
-                        "type": "order_completed",
-                        "purchase_id": purchase.id,
-                        "image_url": image_url
-                    }
-                )
-                print(f"[DEBUG] Completion notification sent to user {user_id}")
-            except Exception as e:
-                # Log the error but don't disrupt the main flow
-                print(f"[DEBUG] Failed to send completion notification: {str(e)}")
 
             return {
                 "message": "Completion image added successfully",
@@ -1,66 +1,309 @@
-from datetime import datetime
+import heapq
+import threading
+from datetime import datetime, UTC
+from flask import current_app
 from sqlalchemy import func, and_
 from src.models import db, Purchase, Listing, Restaurant, PurchaseStatus
-from sklearn.neighbors import NearestNeighbors
+from src.services.item_similarity_service import get_similarity_store
+from scipy import sparse
+from sklearn.preprocessing import normalize
 import numpy as np
-import pandas as pd
+
+
+class ModelSnapshot:
+    """
+    Item-based collaborative filtering model over a sparse item x user CSR matrix.
+
+    Rows are L2-normalized once when the snapshot is built, so the cosine similarity
+    between two items is a sparse dot product. Snapshots are never mutated once
+    published; updates build a new snapshot and swap it in.
+    """
+
+    def __init__(self, version, item_ids, user_ids, matrix):
+        self.version = version
+        self.built_at = datetime.now(UTC)
+        self.item_ids = [int(item_id) for item_id in item_ids]
+        self.user_ids = [int(user_id) for user_id in user_ids]
+        self.item_index = {item_id: idx for idx, item_id in enumerate(self.item_ids)}
+        self.user_index = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+        self.matrix = matrix
+        self.normalized = normalize(matrix, norm='l2', axis=1)
+        self._normalized_t = self.normalized.T.tocsr()
+        self._item_array = np.asarray(self.item_ids, dtype=np.int64)
+
+    def similarity_rows(self, rows):
+        """Sparse CSR matrix of cosine similarities between the given rows and every item."""
+        return (self.normalized[rows] @ self._normalized_t).tocsr()
+
+    def similarities(self, item_id):
+        """Cosine similarity of ``item_id`` to every item as a dense array, or None if unknown."""
+        row = self.item_index.get(item_id)
+        if row is None:
+            return None
+        return self.similarity_rows([row]).toarray().ravel()
+
+    def similar_items(self, item_id, k):
+        """
+        Return up to ``k`` ``(item_id, similarity)`` pairs most similar to ``item_id``,
+        best first. The item itself and items sharing no users with it are left out.
+        """
+        scores = self.similarities(item_id)
+        if scores is None:
+            return []
+        scores[self.item_index[item_id]] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return list(zip(self._item_array[candidates].tolist(), scores[candidates].tolist()))
+
+
+def build_interaction_matrix(rows, binary=False):
+    """
+    Build a CSR item x user matrix from ``(item_id, user_id, value)`` tuples.
+
+    Duplicate pairs are summed, or collapsed to 1 when ``binary`` is set. Returns
+    ``(item_ids, user_ids, matrix)`` with the ids in row/column order.
+    """
+    item_ids, user_ids, values = (np.asarray(column) for column in zip(*rows))
+    items, item_rows = np.unique(item_ids, return_inverse=True)
+    users, user_cols = np.unique(user_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (values.astype(np.float64), (item_rows, user_cols)),
+        shape=(len(items), len(users))
+    )
+    matrix.sum_duplicates()
+    if binary:
+        matrix.data[:] = 1
+    return items, users, matrix
+
+
+class RecommendationModelCache:
+    """
+    Process-wide, versioned cache of a recommendation model.
+
+    The model is built once from the purchase history and then kept warm: completed
+    purchases are recorded as deltas and folded into a new snapshot on the next read,
+    and ``rebuild`` reloads everything from the database (run on a schedule). Readers
+    always get a complete snapshot because new snapshots are published with a single
+    reference swap.
+    """
+
+    def __init__(self, name, load_interactions, k_neighbors, binary=False):
+        self.name = name
+        self.k_neighbors = k_neighbors
+        self.binary = binary
+        self._load_interactions = load_interactions
+        self._snapshot = None
+        self._version = 0
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._snapshot.version if self._snapshot else 0
+
+    def get(self):
+        """Return the current snapshot, building it or applying pending deltas first if needed."""
+        if self._snapshot is None:
+            return self.rebuild()
+        if self._pending:
+            return self._apply_pending()
+        return self._snapshot
+
+    def record(self, item_id, user_id, value=1):
+        """Queue a completed purchase so the next read includes it without a full reload."""
+        if item_id is None or user_id is None:
+            return
+        with self._pending_lock:
+            self._pending.append((item_id, user_id, value))
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def rebuild(self):
+        """Reload all interactions from the database and publish a fresh snapshot."""
+        with self._build_lock:
+            # Deltas recorded so far are already committed, so the reload includes them
+            self._take_pending()
+            rows = self._load_interactions()
+            if not rows:
+                self._snapshot = None
+                return None
+
+            self._publish(*build_interaction_matrix(rows, binary=self.binary))
+            return self._snapshot
+
+    def _apply_pending(self):
+        with self._build_lock:
+            snapshot = self._snapshot
+            pending = self._take_pending()
+            if snapshot is None or not pending:
+                return snapshot
+
+            item_ids = list(snapshot.item_ids)
+            user_ids = list(snapshot.user_ids)
+            item_index = dict(snapshot.item_index)
+            user_index = dict(snapshot.user_index)
+            rows, cols, values = [], [], []
+            for item_id, user_id, value in pending:
+                if item_id not in item_index:
+                    item_index[item_id] = len(item_ids)
+                    item_ids.append(item_id)
+                if user_id not in user_index:
+                    user_index[user_id] = len(user_ids)
+                    user_ids.append(user_id)
+                rows.append(item_index[item_id])
+                cols.append(user_index[user_id])
+                values.append(value)
+
+            shape = (len(item_ids), len(user_ids))
+            matrix = snapshot.matrix.copy()
+            matrix.resize(shape)
+            matrix = (matrix + sparse.csr_matrix((np.asarray(values, dtype=np.float64), (rows, cols)),
+                                                 shape=shape)).tocsr()
+            if self.binary:
+                matrix.data[:] = 1
+
+            self._publish(item_ids, user_ids, matrix)
+            return self._snapshot
+
+    def _publish(self, item_ids, user_ids, matrix):
+        self._version += 1
+        self._snapshot = ModelSnapshot(self._version, item_ids, user_ids, matrix)
+
+
+def _load_listing_interactions():
+    return db.session.query(
+        Purchase.listing_id,
+        Purchase.user_id,
+        Purchase.quantity
+    ).filter(
+        Purchase.status == PurchaseStatus.COMPLETED,
+        Purchase.listing_id.isnot(None),
+        Purchase.user_id.isnot(None)
+    ).all()
+
+
+def _load_restaurant_interactions():
+    return db.session.query(
+        Listing.restaurant_id,
+        Purchase.user_id,
+        func.count(Purchase.id)
+    ).join(
+        Listing, Purchase.listing_id == Listing.id
+    ).filter(
+        Purchase.status == PurchaseStatus.COMPLETED,
+        Purchase.user_id.isnot(None)
+    ).group_by(
+        Listing.restaurant_id,
+        Purchase.user_id
+    ).all()
+
+
+_caches_lock = threading.Lock()
+
+
+def get_model_cache(name):
+    """Return the named model cache of the current app, creating it on first use."""
+    caches = current_app.extensions.setdefault('recommendation_models', {})
+    cache = caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = caches.get(name)
+            if cache is None:
+                if name == 'listing':
+                    cache = RecommendationModelCache(name, _load_listing_interactions, k_neighbors=10)
+                elif name == 'restaurant':
+                    cache = RecommendationModelCache(name, _load_restaurant_interactions, k_neighbors=5,
+                                                     binary=True)
+                else:
+                    raise ValueError(f"Unknown recommendation model: {name}")
+                caches[name] = cache
+    return cache
+
+
+def record_completed_purchase(purchase):
+    """Feed a purchase that just moved to COMPLETED into the warm recommendation models."""
+    get_model_cache('listing').record(purchase.listing_id, purchase.user_id, purchase.quantity)
+    restaurant_id = purchase.listing.restaurant_id if purchase.listing else purchase.restaurant_id
+    get_model_cache('restaurant').record(restaurant_id, purchase.user_id)
+
+
+def rebuild_recommendation_models():
+    """Reload every recommendation model from the purchase history."""
+    for name in ('listing', 'restaurant'):
+        snapshot = get_model_cache(name).rebuild()
+        print(f"Rebuilt {name} recommendation model "
+              f"(version {snapshot.version if snapshot else 0}, "
+              f"{len(snapshot.item_ids) if snapshot else 0} items)")
+
+
+def refresh_item_similarities(reload_models=False):
+    """
+    Recompute the stored top-K neighbors of the items touched by purchases since the last run.
+
+    :param reload_models: Reload the models from the database first, so purchases recorded
+        by other processes are included
+    :return: Number of items whose neighbors were recomputed
+    """
+    total = 0
+    for name in ('listing', 'restaurant'):
+        cache = get_model_cache(name)
+        snapshot = cache.rebuild() if reload_models else cache.get()
+        if snapshot is None:
+            continue
+        recomputed = get_similarity_store(name).refresh(snapshot)
+        print(f"Refreshed {name} similarities for {recomputed} items (model version {snapshot.version})")
+        total += recomputed
+    return total
+
+
+def reload_item_similarities():
+    """Drop the in-memory similarity tables so the next read loads what another process stored."""
+    for name in ('listing', 'restaurant'):
+        get_similarity_store(name).invalidate()
+
+
+def get_item_similarities(name):
+    """
+    Return the precomputed similarity table for the named model. If nothing has been
+    computed yet, neither in this process nor in the database, it is computed once here.
+    """
+    store = get_similarity_store(name)
+    table = store.table
+    if len(table) == 0 and table.source is None:
+        snapshot = get_model_cache(name).get()
+        if snapshot is not None:
+            store.refresh(snapshot)
+            table = store.table
+    return table
 
 
 class RecommendationSystemService:
     def __init__(self):
         self.purchase_matrix = None
         self.listing_ids = None
-        self.model = None
         self.is_initialized = False
         self.k_neighbors = 10
+        self.snapshot = None
 
     def initialize_model(self):
         if self.is_initialized:
             return True
 
         try:
-            # Get all completed purchases
-            purchases = Purchase.query.filter_by(status='COMPLETED').all()
-            if not purchases:
-                return False
-
-            # Create purchase data
-            purchase_data = []
-            for purchase in purchases:
-                purchase_data.append({
-                    'user_id': purchase.user_id,
-                    'listing_id': purchase.listing_id,
-                    'quantity': purchase.quantity
-                })
-
-            # Convert to DataFrame
-            df = pd.DataFrame(purchase_data)
-
-            if df.empty:
-                return False
-
-            # Create user-item matrix
-            user_listing_matrix = pd.pivot_table(
-                data=df,
-                index='listing_id',
-                columns='user_id',
-                values='quantity',
-                fill_value=0
-            )
-
-            self.purchase_matrix = user_listing_matrix.values
-            self.listing_ids = user_listing_matrix.index.tolist()
-
-            if len(self.listing_ids) == 0:
+            snapshot = get_model_cache('listing').get()
+            if snapshot is None or len(snapshot.item_ids) == 0:
                 return False
 
-            # Create KNN model
-            self.model = NearestNeighbors(
-                n_neighbors=min(self.k_neighbors, len(self.listing_ids)),
-                metric='cosine',
-                algorithm='brute'
-            )
-            self.model.fit(self.purchase_matrix)
+            self.snapshot = snapshot
+            self.purchase_matrix = snapshot.matrix
+            self.listing_ids = snapshot.item_ids
             self.is_initialized = True
             return True
 
@@ -70,8 +313,12 @@ class RecommendationSystemService:
 
     @staticmethod
     def get_recommendations_for_listing(listing_id):
-        service = RecommendationSystemService()
-        if not service.initialize_model():
+        try:
+            similarities = get_item_similarities('listing')
+        except Exception as e:
+            print(f"Error loading listing similarities: {e}")
+            similarities = None
+        if not similarities:
             return {
                 "success": False,
                 "message": "Could not initialize recommendation model"
@@ -86,32 +333,14 @@ class RecommendationSystemService:
                     "message": "Listing not found"
                 }, 404
 
-            # Find listing index
-            try:
-                listing_idx = service.listing_ids.index(listing_id)
-            except ValueError:
+            if listing_id not in similarities:
                 return {
                     "success": False,
                     "message": "Listing not found in training data"
                 }, 404
 
-            # Get recommendations using KNN
-            distances, indices = service.model.kneighbors(
-                [service.purchase_matrix[listing_idx]],
-                n_neighbors=min(service.k_neighbors, len(service.listing_ids))
-            )
-
-            # Convert distances to similarity scores
-            similarities = 1 - distances.flatten()
-
-            listing_recommendations = []
-            for idx, similarity in zip(indices.flatten(), similarities):
-                rec_id = service.listing_ids[idx]
-                if rec_id != listing_id:  # Skip the input listing
-                    listing_recommendations.append((rec_id, float(similarity)))
-
-            # Sort by similarity score
-            listing_recommendations.sort(key=lambda x: x[1], reverse=True)
+            # Precomputed neighbors, ordered by cosine similarity
+            listing_recommendations = similarities.similar(listing_id)
 
             # Extract just the listing IDs
             listing_ids = [rec_id for rec_id, _ in listing_recommendations]
@@ -133,77 +362,32 @@ class RestaurantRecommendationSystemService:
     def __init__(self):
         self.restaurant_matrix = None
         self.restaurant_ids = None
-        self.model = None
         self.is_initialized = False
         self.k_neighbors = 5  # Reduced from 10 to work better with smaller datasets
+        self.snapshot = None
 
     def initialize_model(self):
         if self.is_initialized:
             return True
 
         try:
-            # Get all completed purchases
-            purchases = Purchase.query.filter_by(status='COMPLETED').all()
+            snapshot = get_model_cache('restaurant').get()
 
-            print(f"Found {len(purchases)} completed purchases for recommendation model")
-
-            if not purchases:
+            if snapshot is None:
                 print("No completed purchases found. Cannot initialize recommendation model.")
                 return False
 
-            # Create restaurant purchase data
-            data = []
-            for purchase in purchases:
-                if purchase.listing and purchase.listing.restaurant_id:
-                    data.append({
-                        'user_id': purchase.user_id,
-                        'restaurant_id': purchase.listing.restaurant_id
-                    })
-
-            df = pd.DataFrame(data)
-            if df.empty:
-                print("Empty dataframe after filtering. Cannot initialize recommendation model.")
-                return False
-
-            print(f"Created dataframe with {len(df)} purchase records for recommendation model")
-
-            # Check if we have enough unique restaurants and users
-            unique_users = df['user_id'].nunique()
-            unique_restaurants = df['restaurant_id'].nunique()
-
-            print(f"Recommendation data: {unique_users} unique users, {unique_restaurants} unique restaurants")
-
-            if unique_users < 2 or unique_restaurants < 3:
-                print("Not enough unique users or restaurants for meaningful recommendations")
-                # We'll still try to proceed, but with lower expectations
-
-            user_restaurant_matrix = df.pivot_table(
-                index='restaurant_id',
-                columns='user_id',
-                aggfunc=lambda x: 1,
-                fill_value=0
-            )
+            print(f"Recommendation data: {len(snapshot.user_ids)} unique users, "
+                  f"{len(snapshot.item_ids)} unique restaurants (model version {snapshot.version})")
 
-            self.restaurant_matrix = user_restaurant_matrix.values
-            self.restaurant_ids = user_restaurant_matrix.index.tolist()
-
-            print(f"Created user-restaurant matrix with {len(self.restaurant_ids)} restaurants")
-
-            if len(self.restaurant_ids) < 2:
+            if len(snapshot.item_ids) < 2:
                 print("Not enough restaurant data for recommendations")
                 return False
 
-            # Reduce neighbors for small datasets
-            actual_k = min(self.k_neighbors, max(1, len(self.restaurant_ids) - 1))
-
-            self.model = NearestNeighbors(
-                n_neighbors=actual_k,
-                metric='cosine',
-                algorithm='brute'
-            )
-            self.model.fit(self.restaurant_matrix)
+            self.snapshot = snapshot
+            self.restaurant_matrix = snapshot.matrix
+            self.restaurant_ids = snapshot.item_ids
             self.is_initialized = True
-            print(f"Successfully initialized recommendation model with {actual_k} neighbors")
             return True
 
         except Exception as e:
@@ -222,69 +406,28 @@ class RestaurantRecommendationSystemService:
             return RestaurantRecommendationSystemService.get_fallback_recommendations()
 
         try:
-            purchases = Purchase.query.filter(
-                Purchase.user_id == user_id,
-                Purchase.status == PurchaseStatus.COMPLETED
-            ).all()
-
-            print(f"Found {len(purchases)} completed purchases for user {user_id}")
-
-            if not purchases:
-                print(f"No purchase history found for user {user_id}, using fallback")
-                return RestaurantRecommendationSystemService.get_fallback_recommendations()
-
-            restaurant_ids = set()
-            for purchase in purchases:
-                if purchase.listing and purchase.listing.restaurant_id:
-                    restaurant_ids.add(purchase.listing.restaurant_id)
+            restaurant_ids = {
+                restaurant_id for restaurant_id, in db.session.query(Listing.restaurant_id).join(
+                    Purchase, Purchase.listing_id == Listing.id
+                ).filter(
+                    Purchase.user_id == user_id,
+                    Purchase.status == PurchaseStatus.COMPLETED,
+                    Listing.restaurant_id.isnot(None)
+                ).distinct()
+            }
 
             print(f"User {user_id} has purchased from {len(restaurant_ids)} restaurants")
 
             if not restaurant_ids:
-                print(f"No restaurants found in user {user_id}'s purchase history, using fallback")
+                print(f"No purchase history found for user {user_id}, using fallback")
                 return RestaurantRecommendationSystemService.get_fallback_recommendations()
 
-            all_recommendations = []
-            for restaurant_id in restaurant_ids:
-                try:
-                    idx = service.restaurant_ids.index(restaurant_id)
-                except ValueError:
-                    print(f"Restaurant ID {restaurant_id} not found in model data")
-                    continue
-
-                # Get at most k_neighbors or max available
-                actual_neighbors = min(service.k_neighbors + 1, len(service.restaurant_ids))
-
-                try:
-                    distances, indices = service.model.kneighbors(
-                        [service.restaurant_matrix[idx]],
-                        n_neighbors=actual_neighbors
-                    )
-
-                    similarities = 1 - distances.flatten()
-
-                    for i, sim in zip(indices.flatten(), similarities):
-                        rec_id = service.restaurant_ids[i]
-                        if rec_id == restaurant_id:
-                            continue
-
-                        rec_rest = Restaurant.query.get(rec_id)
-                        base_rest = Restaurant.query.get(restaurant_id)
-
-                        if rec_rest and base_rest:
-                            # Relaxed category matching to get more recommendations
-                            if not any(r[0] == rec_id for r in all_recommendations):
-                                all_recommendations.append((rec_id, float(sim)))
-                except Exception as e:
-                    print(f"Error getting neighbors for restaurant {restaurant_id}: {e}")
-
-            if not all_recommendations:
+            top_recommendations = RestaurantRecommendationSystemService._top_neighbors(restaurant_ids, 10)
+
+            if not top_recommendations:
                 print("No recommendations found with collaborative filtering, using fallback")
                 return RestaurantRecommendationSystemService.get_fallback_recommendations()
 
-            all_recommendations.sort(key=lambda x: x[1], reverse=True)
-            top_recommendations = all_recommendations[:10]
-
             # Extract just restaurant IDs
             restaurant_ids_list = [rec_id for rec_id, _ in top_recommendations]
 
@@ -304,6 +447,41 @@ class RestaurantRecommendationSystemService:
             # Use fallback recommendations instead of error
             return RestaurantRecommendationSystemService.get_fallback_recommendations()
 
+    @staticmethod
+    def _top_neighbors(restaurant_ids, limit):
+        """
+        Best ``limit`` ``(restaurant_id, similarity)`` neighbors across all of ``restaurant_ids``.
+
+        Neighbors are looked up for every restaurant at once, a candidate reached from
+        several restaurants keeps its highest similarity, and existence of the candidates
+        is checked with a single ``IN`` query.
+        """
+        similarities = get_item_similarities('restaurant')
+        base_ids, candidate_ids, scores = similarities.neighbors_of(restaurant_ids)
+        if len(candidate_ids) == 0:
+            return []
+
+        # Best score first, so np.unique's first occurrence is each candidate's maximum
+        order = np.argsort(-scores, kind='stable')
+        base_ids, candidate_ids, scores = base_ids[order], candidate_ids[order], scores[order]
+
+        lookup_ids = np.union1d(candidate_ids, base_ids).tolist()
+        existing = {
+            restaurant_id for restaurant_id, in db.session.query(Restaurant.id).filter(
+                Restaurant.id.in_(lookup_ids)
+            )
+        }
+        existing = np.fromiter(existing, dtype=np.int64, count=len(existing))
+        keep = np.isin(candidate_ids, existing) & np.isin(base_ids, existing)
+        candidate_ids, scores = candidate_ids[keep], scores[keep]
+
+        unique_ids, first = np.unique(candidate_ids, return_index=True)
+        return heapq.nlargest(
+            limit,
+            zip(unique_ids.tolist(), scores[first].astype(float).tolist()),
+            key=lambda recommendation: recommendation[1]
+        )
+
     @staticmethod
     def get_fallback_recommendations():
         """Provide fallback recommendations when personalized ones cannot be generated"""
@@ -1,13 +1,37 @@
-from src.services.notification_service import NotificationService
-from src.models import User, CustomerAddress, Restaurant
-import math
-from src.models import db
+from src.services.notification_outbox_service import enqueue_nearby_notification
+from src.models import db, Restaurant
+from src.utils.geo import haversine_km
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Users whose primary address is this close to a new restaurant hear about it
+NEARBY_RADIUS_KM = 5.0
 
-def notify_users_about_new_restaurant(restaurant_id: int, max_distance_km: float = 5.0):
+
+def queue_new_restaurant_notification(restaurant: Restaurant, max_distance_km: float = NEARBY_RADIUS_KM):
+    """
+    Queue the announcement of a new restaurant in the current transaction.
+
+    The users near the restaurant are looked up and notified by the notification
+    workers after the commit, so this costs one insert however many users live nearby.
+    The restaurant must be flushed so it has an id.
+    """
+    return enqueue_nearby_notification(
+        restaurant.latitude,
+        restaurant.longitude,
+        max_distance_km,
+        title="New Restaurant Opened Nearby!",
+        body=f"{restaurant.restaurantName} has just opened near your location. Check it out!",
+        data={
+            "type": "new_restaurant",
+            "restaurant_id": restaurant.id,
+            "screen": "RestaurantDetailScreen"
+        }
+    )
+
+
+def notify_users_about_new_restaurant(restaurant_id: int, max_distance_km: float = NEARBY_RADIUS_KM):
     """
     Notify users about a new restaurant based on their primary address proximity.
 
@@ -16,65 +40,22 @@ def notify_users_about_new_restaurant(restaurant_id: int, max_distance_km: float
         max_distance_km (float): Maximum distance in kilometers to consider a user as "nearby"
 
     Returns:
-        int: Number of users notified
+        int: Number of notifications queued; the notification workers send them to the
+        nearby users after the commit
     """
     try:
-        # Get the restaurant info
         restaurant = Restaurant.query.get(restaurant_id)
         if not restaurant:
             logger.error(f"Restaurant with ID {restaurant_id} not found")
             return 0
 
-        restaurant_lat = restaurant.latitude
-        restaurant_lng = restaurant.longitude
-        restaurant_name = restaurant.restaurantName
-
-        logger.info(f"Finding users near new restaurant: {restaurant_name} (ID: {restaurant_id})")
-
-        # Find users with primary addresses
-        primary_addresses = db.session.query(CustomerAddress, User).join(
-            User,
-            CustomerAddress.user_id == User.id
-        ).filter(
-            CustomerAddress.is_primary == True
-        ).all()
-
-        logger.info(f"Found {len(primary_addresses)} users with primary addresses")
-
-        notified_count = 0
-
-        # Check each user's distance from the restaurant
-        for address, user in primary_addresses:
-            # Calculate distance between restaurant and user address
-            distance = calculate_distance(
-                restaurant_lat, restaurant_lng,
-                address.latitude, address.longitude
-            )
-
-            # If user is nearby, send notification
-            if distance <= max_distance_km:
-                # Send notification to user
-                success = NotificationService.send_notification_to_user(
-                    user_id=user.id,
-                    title="New Restaurant Opened Nearby!",
-                    body=f"{restaurant_name} has just opened near your location. Check it out!",
-                    data={
-                        "type": "new_restaurant",
-                        "restaurant_id": restaurant.id,
-                        "screen": "RestaurantDetailScreen"
-                    }
-                )
-
-                if success:
-                    notified_count += 1
-                    logger.info(f"Notified user {user.id} about new restaurant {restaurant_id}")
-                else:
-                    logger.warning(f"Failed to notify user {user.id} about new restaurant {restaurant_id}")
-
-        logger.info(f"Notified {notified_count} users about new restaurant {restaurant_name}")
-        return notified_count
+        queue_new_restaurant_notification(restaurant, max_distance_km)
+        db.session.commit()
+        logger.info(f"Queued new restaurant announcement for {restaurant.restaurantName} (ID: {restaurant_id})")
+        return 1
 
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error notifying users about new restaurant: {str(e)}")
         return 0
 
@@ -90,21 +71,4 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     Returns:
         float: Distance in kilometers
     """
-    # Convert decimal degrees to radians
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-
-    # Haversine formula
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    # Earth radius in kilometers
-    radius = 6371
-
-    # Calculate distance
-    distance = radius * c
-    return distance
\ No newline at end of file
+    return haversine_km(float(lat1), float(lon1), float(lat2), float(lon2))
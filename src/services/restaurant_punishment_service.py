@@ -6,7 +6,8 @@ from src.models.restaurant_model import Restaurant
 from src.models.restaurant_punishment_model import RestaurantPunishment, RefundRecord
 from src.models.purchase_model import Purchase
 from src.models.purchase_report import PurchaseReport, ReportStatus
-from src.services.notification_service import NotificationService
+from src.services.notification_outbox_service import enqueue_notification
+from src.utils.punishment_cache import invalidate_punishment_status
 
 
 class RestaurantPunishmentService:
@@ -49,6 +50,7 @@ class RestaurantPunishmentService:
                         existing_punishment.end_date = existing_punishment.end_date + timedelta(days=duration_days)
                         existing_punishment.duration_days += duration_days
                         db.session.commit()
+                        invalidate_punishment_status(restaurant_id)
 
                         # Update report status if provided
                         if report_id:
@@ -107,14 +109,15 @@ class RestaurantPunishmentService:
                     report.resolved_by = support_user_id
                     report.punishment_id = punishment.id
 
-            db.session.commit()
-
-            NotificationService.send_notification_to_user(
+            enqueue_notification(
                 user_id=restaurant.owner_id,
                 title="Restaurant Punishment Issued",
                 body=f"Your restaurant has been {duration_type.lower().replace('_', ' ')} suspended."
             )
 
+            db.session.commit()
+            invalidate_punishment_status(restaurant_id)
+
             return {"success": True, "punishment_id": punishment.id}, 201
 
         except Exception as e:
@@ -137,14 +140,15 @@ class RestaurantPunishmentService:
             punishment.reverted_at = datetime.now(timezone.utc)
             punishment.reversion_reason = reversion_data.get('reason', 'No reason provided')
 
-            db.session.commit()
-
-            NotificationService.send_notification_to_user(
+            enqueue_notification(
                 user_id=punishment.restaurant.owner_id,
                 title="Restaurant Punishment Reverted",
                 body=f"The punishment for your restaurant has been reverted."
             )
 
+            db.session.commit()
+            invalidate_punishment_status(punishment.restaurant_id)
+
             return {"success": True, "message": "Punishment successfully reverted"}, 200
 
         except Exception as e:
@@ -168,15 +172,14 @@ class RestaurantPunishmentService:
             )
 
             db.session.add(refund)
-            db.session.commit()
-
-            print(f"MOCK: Refund email sent to user {purchase.user_id} for amount ${refund.amount}")
-
-            NotificationService.send_notification_to_user(
+            enqueue_notification(
                 user_id=purchase.user_id,
                 title="Refund Issued",
                 body=f"A refund of ${refund.amount} has been issued for your order."
             )
+            db.session.commit()
+
+            print(f"MOCK: Refund email sent to user {purchase.user_id} for amount ${refund.amount}")
 
             refund.processed = True
             db.session.commit()
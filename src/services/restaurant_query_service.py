@@ -0,0 +1,230 @@
+# services/restaurant_query_service.py
+import base64
+import binascii
+import bisect
+import json
+from collections import namedtuple
+from datetime import datetime, UTC
+
+from flask import current_app
+from sqlalchemy import func
+
+from src.models import db, Restaurant, Listing
+from src.services.geo_service import find_restaurants_near
+from src.utils.punishment_cache import active_restaurant_ids
+from src.utils.spatial_index import get_restaurant_index
+from src.utils.text_index import get_search_index
+
+ORDER_DISTANCE = 'distance'
+ORDER_RELEVANCE = 'relevance'
+
+DEFAULT_RADIUS_KM = 10
+MAX_LIMIT = 100
+# Candidates are filtered in SQL at most this many at a time, well below the 2100 parameter cap of SQL Server
+FILTER_CHUNK_SIZE = 500
+
+RestaurantQuery = namedtuple(
+    'RestaurantQuery',
+    ['text', 'latitude', 'longitude', 'radius_km', 'category', 'min_rating', 'pickup', 'delivery',
+     'flash_deals', 'in_stock', 'order', 'limit', 'cursor'],
+    defaults=[None, None, None, DEFAULT_RADIUS_KM, None, None, False, False, False, False, None, None, None]
+)
+
+RestaurantMatch = namedtuple('RestaurantMatch', ['restaurant', 'distance_km', 'score'])
+RestaurantPage = namedtuple('RestaurantPage', ['matches', 'next_cursor', 'plan'])
+
+# One ranked candidate; ``key`` sorts ascending (distance, or the negated relevance score)
+_Candidate = namedtuple('_Candidate', ['key', 'restaurant_id', 'distance_km', 'score'])
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _number(params, name, cast=float):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}")
+
+
+def parse_query(params):
+    """
+    Build a ``RestaurantQuery`` from request arguments or a JSON filters dict.
+
+    :raises ValueError: with a message for the client when a value is invalid
+    """
+    latitude = _number(params, 'latitude')
+    longitude = _number(params, 'longitude')
+    if (latitude is None) != (longitude is None):
+        raise ValueError("Both latitude and longitude are required for a location search")
+    radius = _number(params, 'radius')
+    limit = _number(params, 'limit', int)
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    text = (params.get('query') or params.get('text') or '').strip() or None
+    order = params.get('order') or params.get('sort')
+    if order not in (None, ORDER_DISTANCE, ORDER_RELEVANCE):
+        raise ValueError("order must be 'distance' or 'relevance'")
+    if order == ORDER_DISTANCE and latitude is None:
+        raise ValueError("Ordering by distance needs a location")
+    if order == ORDER_RELEVANCE and text is None:
+        raise ValueError("Ordering by relevance needs a search text")
+
+    return RestaurantQuery(
+        text=text,
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=DEFAULT_RADIUS_KM if radius is None else radius,
+        category=(params.get('category') or '').strip() or None,
+        min_rating=_number(params, 'min_rating'),
+        pickup=_flag(params.get('pickup')),
+        delivery=_flag(params.get('delivery')),
+        flash_deals=_flag(params.get('flash_deals')),
+        in_stock=_flag(params.get('in_stock')),
+        order=order,
+        limit=limit,
+        cursor=params.get('cursor') or None
+    )
+
+
+def encode_cursor(candidate):
+    raw = json.dumps([candidate.key, candidate.restaurant_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        key, restaurant_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(key), int(restaurant_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _use_spatial_index():
+    return current_app.config.get('SPATIAL_INDEX_ENABLED', True)
+
+
+def plan_query(query):
+    """
+    Pick the cheaper index to drive a query that has both a text and a location.
+
+    ``text`` scores the (few) text matches and checks their distance; ``geo`` takes the
+    restaurants in the circle and scores only those. Single-criterion queries use the
+    only index they have.
+    """
+    if query.text is None and query.latitude is None:
+        raise ValueError("Provide a search text or a location")
+    if query.latitude is None:
+        return 'text'
+    if query.text is None or not _use_spatial_index():
+        return 'geo'
+    text_matches = get_search_index().restaurants.estimate(query.text)
+    nearby = get_restaurant_index().estimate(query.latitude, query.longitude, query.radius_km)
+    return 'text' if text_matches <= nearby else 'geo'
+
+
+def _candidates(query, plan):
+    """Every restaurant matching the text and location, sorted by the query's order."""
+    text_index = get_search_index().restaurants
+    if plan == 'text':
+        scores = text_index.scores(query.text)
+        if query.latitude is None:
+            distances = {restaurant_id: None for restaurant_id in scores}
+        else:
+            distances = dict(get_restaurant_index().query_ids(
+                list(scores), query.latitude, query.longitude, query.radius_km
+            ))
+    else:
+        hits = find_restaurants_near(query.latitude, query.longitude, query.radius_km,
+                                     flash_deals_only=query.flash_deals)
+        distances = dict(hits)
+        scores = text_index.scores(query.text, candidates=distances) if query.text else None
+
+    order = query.order or (ORDER_RELEVANCE if query.text else ORDER_DISTANCE)
+    candidates = []
+    for restaurant_id, distance in distances.items():
+        score = scores.get(restaurant_id) if scores is not None else None
+        if scores is not None and score is None:
+            continue
+        key = distance if order == ORDER_DISTANCE else -score
+        candidates.append(_Candidate(key, restaurant_id, distance, score))
+    candidates.sort(key=lambda candidate: (candidate.key, candidate.restaurant_id))
+    return candidates
+
+
+def _filtered(query, restaurant_ids):
+    """Load the restaurants among ``restaurant_ids`` that pass the query's filters, keyed by id."""
+    restaurant_ids = active_restaurant_ids(restaurant_ids)
+    if not restaurant_ids:
+        return {}
+
+    sql = Restaurant.query.filter(Restaurant.id.in_(restaurant_ids))
+    if query.category:
+        sql = sql.filter(func.lower(Restaurant.category) == query.category.lower())
+    if query.min_rating is not None:
+        sql = sql.filter(Restaurant.rating >= query.min_rating)
+    if query.pickup:
+        sql = sql.filter(Restaurant.pickup == True)
+    if query.delivery:
+        sql = sql.filter(Restaurant.delivery == True)
+    if query.flash_deals:
+        sql = sql.filter(Restaurant.flash_deals_available == True)
+    if query.in_stock:
+        sql = sql.filter(db.session.query(Listing.id).filter(
+            Listing.restaurant_id == Restaurant.id,
+            Listing.count > 0,
+            Listing.expires_at > datetime.now(UTC)
+        ).exists())
+    return {restaurant.id: restaurant for restaurant in sql.all()}
+
+
+def stream_restaurants(query, plan=None):
+    """
+    Yield ``(candidate, restaurant)`` pairs in result order, starting after the cursor.
+
+    Candidates come from the in-memory indexes; the SQL filters run over them one chunk
+    at a time, so a page only costs as many queries as it takes to fill it.
+    """
+    candidates = _candidates(query, plan or plan_query(query))
+    start = 0
+    if query.cursor:
+        position = decode_cursor(query.cursor)
+        start = bisect.bisect_right([(c.key, c.restaurant_id) for c in candidates], position)
+
+    # Start with a chunk about the size of a page and double it while filters reject rows
+    chunk_size = min(max(2 * (query.limit or FILTER_CHUNK_SIZE), 50), FILTER_CHUNK_SIZE)
+    while start < len(candidates):
+        chunk = candidates[start:start + chunk_size]
+        start += len(chunk)
+        restaurants = _filtered(query, [candidate.restaurant_id for candidate in chunk])
+        for candidate in chunk:
+            restaurant = restaurants.get(candidate.restaurant_id)
+            if restaurant is not None:
+                yield candidate, restaurant
+        chunk_size = min(chunk_size * 2, FILTER_CHUNK_SIZE)
+
+
+def find_restaurants(query):
+    """
+    Run ``query`` and return a ``RestaurantPage``. Without a ``limit`` every match is
+    returned; otherwise ``next_cursor`` continues after the last match when there are more.
+    """
+    plan = plan_query(query)
+    matches = []
+    next_cursor = None
+    for candidate, restaurant in stream_restaurants(query, plan):
+        if query.limit is not None and len(matches) == query.limit:
+            next_cursor = encode_cursor(last)
+            break
+        matches.append(RestaurantMatch(restaurant, candidate.distance_km, candidate.score))
+        last = candidate
+    return RestaurantPage(matches, next_cursor, plan)
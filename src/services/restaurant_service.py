@@ -1,7 +1,10 @@
 # services/restaurant_service.py
-from math import radians, cos, sin, asin, sqrt
 from src.models import db, Restaurant
 from src.utils.cloud_storage import upload_file, delete_file, allowed_file
+from src.services.geo_service import find_restaurants_near
+from src.services.restaurant_notification_service import queue_new_restaurant_notification
+from src.utils.punishment_cache import active_restaurant_ids
+from src.services.restaurant_query_service import find_restaurants, parse_query
 
 
 def restaurant_to_dict(restaurant):
@@ -123,58 +126,11 @@ def create_restaurant_service(owner_id, form, files, url_for_func):
     )
 
     db.session.add(new_restaurant)
+    db.session.flush()
+    # Nearby users are looked up and notified by the notification workers after the commit
+    queue_new_restaurant_notification(new_restaurant)
     db.session.commit()
 
-    # New notification code
-    try:
-        # Find users with primary addresses
-        from src.models import CustomerAddress, User
-        from src.services.notification_service import NotificationService
-        import logging
-
-        # Find users with primary addresses
-        primary_addresses = db.session.query(CustomerAddress, User).join(
-            User,
-            CustomerAddress.user_id == User.id
-        ).filter(
-            CustomerAddress.is_primary == True
-        ).all()
-
-        for address, user in primary_addresses:
-            # Use your existing haversine calculation or just calculate distance directly
-            # This uses the one from your get_restaurants_proximity_service function
-            user_lat = float(address.latitude)
-            user_lon = float(address.longitude)
-            rest_lat = float(latitude)
-            rest_lon = float(longitude)
-
-            # Convert degrees to radians
-            from math import radians, cos, sin, asin, sqrt
-            user_lat, user_lon, rest_lat, rest_lon = map(radians, [user_lat, user_lon, rest_lat, rest_lon])
-            d_lat = rest_lat - user_lat
-            d_lon = rest_lon - user_lon
-            a = sin(d_lat / 2) ** 2 + cos(user_lat) * cos(rest_lat) * sin(d_lon / 2) ** 2
-            c = 2 * asin(sqrt(a))
-            earth_radius = 6371  # km
-            distance = c * earth_radius
-
-            # Only notify users within 5km
-            if distance <= 5.0:
-                NotificationService.send_notification_to_user(
-                    user_id=user.id,
-                    title="New Restaurant Opened Nearby!",
-                    body=f"{restaurant_name} has just opened near your location. Check it out!",
-                    data={
-                        "type": "new_restaurant",
-                        "restaurant_id": new_restaurant.id,
-                        "screen": "RestaurantDetailScreen"
-                    }
-                )
-    except Exception as e:
-        # Just log the error but don't disrupt the main flow
-        print(f"Error notifying users about new restaurant: {str(e)}")
-    # End of notification code
-
     return {
         "success": True,
         "message": "Restaurant added successfully!",
@@ -219,33 +175,38 @@ def get_restaurant_service(restaurant_id):
     return restaurant_data, 200
 
 
-def haversine(lon1, lat1, lon2, lat2):
-    """
-    Calculate the great circle distance in kilometers between two points
-    on the earth (specified in decimal degrees)
-    """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+def _fetch_restaurants_by_id(restaurant_ids, chunk_size=1000):
+    """Load restaurants for the given ids with as few IN (...) queries as possible."""
+    restaurants = {}
+    for start in range(0, len(restaurant_ids), chunk_size):
+        chunk = restaurant_ids[start:start + chunk_size]
+        for restaurant in Restaurant.query.filter(Restaurant.id.in_(chunk)).all():
+            restaurants[restaurant.id] = restaurant
+    return restaurants
 
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    r = 6371  # Radius of earth in kilometers
-    return c * r
 
+def _nearby_restaurant_dicts(user_lat, user_lon, radius, flash_deals_only=False):
+    """
+    Resolve restaurants around a point through the geo query layer and serialize them,
+    nearest first, with their ``distance_km``.
+    """
+    hits = find_restaurants_near(user_lat, user_lon, radius, flash_deals_only=flash_deals_only)
+    if not hits:
+        return []
 
+    # Punished restaurants are dropped before anything is loaded
+    active_ids = active_restaurant_ids([restaurant_id for restaurant_id, _ in hits])
+    restaurants = _fetch_restaurants_by_id(active_ids)
+    nearby = []
+    for restaurant_id, dist in hits:
+        restaurant = restaurants.get(restaurant_id)
+        if restaurant is None or (flash_deals_only and not restaurant.flash_deals_available):
+            continue
+        restaurant_dict = restaurant_to_dict(restaurant)
+        restaurant_dict["distance_km"] = round(dist, 2)
+        nearby.append(restaurant_dict)
+    return nearby
 
-def haversine(lat1, lon1, lat2, lon2):
-    # Convert degrees to radians
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    d_lat = lat2 - lat1
-    d_lon = lon2 - lon1
-    a = sin(d_lat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(d_lon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    earth_radius = 6371  # km
-    return c * earth_radius
 
 def get_restaurants_in_proximity(user_lat, user_lon, radius=10, filters=None):
     """
@@ -255,7 +216,8 @@ def get_restaurants_in_proximity(user_lat, user_lon, radius=10, filters=None):
     :param user_lon: User's longitude
     :param user_lat: User's latitude
     :param radius: Search radius in kilometers, defaults to 10
-    :param filters: Additional filters like category, rating, etc.
+    :param filters: Additional filters: query, category, min_rating, pickup, delivery,
+                    flash_deals, in_stock, plus order, limit and cursor for paging
     :return: Tuple (restaurants list, HTTP status code)
     """
 
@@ -263,23 +225,59 @@ def get_restaurants_in_proximity(user_lat, user_lon, radius=10, filters=None):
         user_lat = float(user_lat)
         user_lon = float(user_lon)
         radius = float(radius)
-    except ValueError:
+    except (TypeError, ValueError):
         return {"success": False, "message": "Invalid latitude, longitude, or radius format"}, 400
 
-    restaurants = Restaurant.query.all()
-    nearby = []
-    for restaurant in restaurants:
-        dist = haversine(user_lat, user_lon, float(restaurant.latitude), float(restaurant.longitude))
-        if dist <= radius and (restaurant.maxDeliveryDistance is None or dist <= restaurant.maxDeliveryDistance):
-            restaurant_dict = restaurant_to_dict(restaurant)
-            restaurant_dict["distance_km"] = round(dist, 2)
-            nearby.append(restaurant_dict)
+    if not filters:
+        nearby = _nearby_restaurant_dicts(user_lat, user_lon, radius)
+        if not nearby:
+            return {"message": "No restaurants found within the specified radius"}, 404
+        return {"restaurants": nearby}, 200
 
-    if not nearby:
+    try:
+        query = parse_query({**filters, "latitude": user_lat, "longitude": user_lon, "radius": radius})
+        page = find_restaurants(query)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}, 400
+
+    if not page.matches:
         return {"message": "No restaurants found within the specified radius"}, 404
 
-    nearby.sort(key=lambda x: x['distance_km'])
-    return {"restaurants": nearby}, 200
+    response = {"restaurants": [_match_to_dict(match) for match in page.matches]}
+    if query.limit is not None:
+        response["next_cursor"] = page.next_cursor
+    return response, 200
+
+
+def _match_to_dict(match):
+    restaurant_dict = restaurant_to_dict(match.restaurant)
+    if match.distance_km is not None:
+        restaurant_dict["distance_km"] = round(match.distance_km, 2)
+    if match.score is not None:
+        restaurant_dict["relevance"] = round(match.score, 4)
+    return restaurant_dict
+
+
+def discover_restaurants_service(params):
+    """
+    Search restaurants by any combination of text, location and filters.
+
+    :param params: Request arguments, see ``restaurant_query_service.parse_query``
+    :return: Tuple (response dict, HTTP status code)
+    """
+    try:
+        query = parse_query(params)
+        if query.limit is None:
+            query = query._replace(limit=20)
+        page = find_restaurants(query)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}, 400
+
+    return {
+        "success": True,
+        "restaurants": [_match_to_dict(match) for match in page.matches],
+        "next_cursor": page.next_cursor
+    }, 200
 
 
 def get_flash_deals_service(user_lat, user_lon, radius=30):
@@ -293,29 +291,11 @@ def get_flash_deals_service(user_lat, user_lon, radius=30):
     except ValueError:
         return {"success": False, "message": "Invalid latitude, longitude, or radius format"}, 400
 
-    def haversine(lat1, lon1, lat2, lon2):
-        # Convert degrees to radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        d_lat = lat2 - lat1
-        d_lon = lon2 - lon1
-        a = sin(d_lat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(d_lon / 2) ** 2
-        c = 2 * asin(sqrt(a))
-        earth_radius = 6371  # km
-        return c * earth_radius
-
-    restaurants = Restaurant.query.filter_by(flash_deals_available=True).all()
-    nearby = []
-    for restaurant in restaurants:
-        dist = haversine(user_lat, user_lon, float(restaurant.latitude), float(restaurant.longitude))
-        if dist <= radius and (restaurant.maxDeliveryDistance is None or dist <= restaurant.maxDeliveryDistance):
-            restaurant_dict = restaurant_to_dict(restaurant)
-            restaurant_dict["distance_km"] = round(dist, 2)
-            nearby.append(restaurant_dict)
+    nearby = _nearby_restaurant_dicts(user_lat, user_lon, radius, flash_deals_only=True)
 
     if not nearby:
         return {"message": "No flash deals available within the specified radius"}, 404
 
-    nearby.sort(key=lambda x: x['distance_km'])
     return {"restaurants": nearby}, 200
 
 
@@ -0,0 +1,199 @@
+# services/sales_rollup_service.py
+import logging
+from collections import namedtuple
+from datetime import date, datetime, UTC
+from decimal import Decimal
+
+from sqlalchemy import event, inspect, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db, Purchase, PurchaseStatus, SalesRollup, HourlySales
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAY = 'day'
+PERIOD_MONTH = 'month'
+# Purchases are streamed into the backfill this many rows at a time
+BACKFILL_CHUNK_SIZE = 1000
+# The rollup job rebuilds this many months, the current one included, to repair drift
+REPAIR_MONTHS = 2
+
+SalesTotals = namedtuple('SalesTotals', ['orders', 'units', 'revenue', 'regions'])
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _buckets(restaurant_id, purchased_at, district):
+    """The rows a sale counts in, as ``(model, key columns)`` pairs."""
+    day = purchased_at.date()
+    district = district or ''
+    return (
+        (SalesRollup, (('restaurant_id', restaurant_id), ('period', PERIOD_DAY), ('period_start', day),
+                       ('district', district))),
+        (SalesRollup, (('restaurant_id', restaurant_id), ('period', PERIOD_MONTH), ('period_start', month_start(day)),
+                       ('district', district))),
+        (HourlySales, (('restaurant_id', restaurant_id), ('hour_start', hour_start(purchased_at)))),
+    )
+
+
+def _apply(connection, model, key, orders, units, revenue):
+    """Add to one rollup row, creating it on first use."""
+    where = [getattr(model, column) == value for column, value in key]
+    increment = update(model).where(*where).values(
+        orders=model.orders + orders,
+        units=model.units + units,
+        revenue=model.revenue + revenue,
+        updated_at=datetime.now(UTC)
+    )
+    if connection.execute(increment).rowcount:
+        return
+    try:
+        # A savepoint, so losing the insert race to another worker keeps the transaction usable
+        with connection.begin_nested():
+            connection.execute(insert(model).values(
+                orders=orders, units=units, revenue=revenue, updated_at=datetime.now(UTC), **dict(key)
+            ))
+    except IntegrityError:
+        connection.execute(increment)
+
+
+def _record(connection, purchase, sign):
+    if purchase.restaurant_id is None or purchase.purchase_date is None:
+        return
+    revenue = Decimal(purchase.total_price) * sign
+    for model, key in _buckets(purchase.restaurant_id, purchase.purchase_date, purchase.delivery_district):
+        _apply(connection, model, key, sign, purchase.quantity * sign, revenue)
+
+
+def _was_completed(purchase):
+    history = inspect(purchase).attrs.status.history
+    if not history.has_changes():
+        return purchase.status == PurchaseStatus.COMPLETED
+    return PurchaseStatus.COMPLETED in (history.deleted or ())
+
+
+@event.listens_for(Purchase, 'after_insert')
+def _count_new_purchase(mapper, connection, target):
+    if target.status == PurchaseStatus.COMPLETED:
+        _record(connection, target, 1)
+
+
+@event.listens_for(Purchase, 'after_update')
+def _count_completed_purchase(mapper, connection, target):
+    # Rollups move with the purchase's transaction, so a rolled back completion is never counted
+    was_completed = _was_completed(target)
+    is_completed = target.status == PurchaseStatus.COMPLETED
+    if was_completed != is_completed:
+        _record(connection, target, 1 if is_completed else -1)
+
+
+@event.listens_for(Purchase, 'after_delete')
+def _uncount_deleted_purchase(mapper, connection, target):
+    if _was_completed(target):
+        _record(connection, target, -1)
+
+
+def backfill_sales_rollups(start=None, end=None):
+    """
+    Rebuild the rollups and hourly sales of the whole months from ``start`` up to ``end``
+    (dates; the whole history when omitted) from the completed purchases.
+
+    :return: Number of rows written
+    """
+    first = month_start(start) if start else None
+    stop = _add_months(month_start(end), 1) if end else None
+    first_moment = datetime.combine(first, datetime.min.time()) if first else None
+    stop_moment = datetime.combine(stop, datetime.min.time()) if stop else None
+
+    purchases = db.session.query(
+        Purchase.restaurant_id,
+        Purchase.purchase_date,
+        Purchase.delivery_district,
+        Purchase.quantity,
+        Purchase.total_price
+    ).filter(
+        Purchase.status == PurchaseStatus.COMPLETED,
+        Purchase.restaurant_id.isnot(None)
+    )
+    if first:
+        purchases = purchases.filter(Purchase.purchase_date >= first_moment)
+    if stop:
+        purchases = purchases.filter(Purchase.purchase_date < stop_moment)
+
+    totals = {}
+    for row in purchases.yield_per(BACKFILL_CHUNK_SIZE):
+        for bucket in _buckets(row.restaurant_id, row.purchase_date, row.delivery_district):
+            orders, units, revenue = totals.get(bucket, (0, 0, Decimal(0)))
+            totals[bucket] = (orders + 1, units + row.quantity, revenue + Decimal(row.total_price))
+
+    for model, column, low, high in ((SalesRollup, SalesRollup.period_start, first, stop),
+                                     (HourlySales, HourlySales.hour_start, first_moment, stop_moment)):
+        stale = delete(model)
+        if low:
+            stale = stale.where(column >= low)
+        if high:
+            stale = stale.where(column < high)
+        db.session.execute(stale.execution_options(synchronize_session=False))
+
+    now = datetime.now(UTC)
+    rows = {SalesRollup: [], HourlySales: []}
+    for (model, key), (orders, units, revenue) in totals.items():
+        rows[model].append({'orders': orders, 'units': units, 'revenue': revenue, 'updated_at': now, **dict(key)})
+    written = 0
+    for model, model_rows in rows.items():
+        for chunk_start in range(0, len(model_rows), BACKFILL_CHUNK_SIZE):
+            db.session.execute(insert(model), model_rows[chunk_start:chunk_start + BACKFILL_CHUNK_SIZE])
+        written += len(model_rows)
+    db.session.commit()
+    logger.info(f"Rebuilt {written} sales rollups")
+    return written
+
+
+def repair_recent_rollups(today=None):
+    """Rebuild the last ``REPAIR_MONTHS`` months, catching sales written around the ORM."""
+    today = today or datetime.now(UTC).date()
+    return backfill_sales_rollups(_add_months(month_start(today), 1 - REPAIR_MONTHS), today)
+
+
+def sales_totals(restaurant_ids, period_start, period=PERIOD_MONTH):
+    """
+    Sales of ``restaurant_ids`` in one period, read from the rollups with one grouped query.
+
+    :return: ``SalesTotals`` with orders, units, revenue and the orders per delivery district
+    """
+    if not restaurant_ids:
+        return SalesTotals(0, 0, Decimal(0), {})
+    rows = db.session.query(
+        SalesRollup.district,
+        func.sum(SalesRollup.orders),
+        func.sum(SalesRollup.units),
+        func.sum(SalesRollup.revenue)
+    ).filter(
+        SalesRollup.restaurant_id.in_(restaurant_ids),
+        SalesRollup.period == period,
+        SalesRollup.period_start == period_start
+    ).group_by(SalesRollup.district).all()
+
+    orders = units = 0
+    revenue = Decimal(0)
+    regions = {}
+    for district, district_orders, district_units, district_revenue in rows:
+        orders += district_orders or 0
+        units += district_units or 0
+        revenue += Decimal(district_revenue or 0)
+        if district and district_orders:
+            regions[district] = district_orders
+    if rows:
+        revenue = revenue.quantize(Decimal('0.01'))
+    return SalesTotals(orders, units, revenue, regions)
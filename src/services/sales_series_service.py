@@ -0,0 +1,183 @@
+# services/sales_series_service.py
+from collections import namedtuple
+from datetime import datetime, timedelta, UTC
+
+import numpy as np
+from sqlalchemy import func
+
+from src.models import db, SalesRollup, HourlySales
+from src.services.sales_rollup_service import PERIOD_DAY
+
+BUCKET_HOUR = 'hour'
+BUCKET_DAY = 'day'
+BUCKET_WEEK = 'week'
+BUCKET_MONTH = 'month'
+BUCKETS = (BUCKET_HOUR, BUCKET_DAY, BUCKET_WEEK, BUCKET_MONTH)
+
+# A series never has more points than this; 'auto' picks the finest bucket that fits
+MAX_POINTS = 2000
+DEFAULT_RANGE_DAYS = 30
+# Longest range a series may cover; MAX_POINTS months fit within it
+MAX_RANGE_DAYS = 366 * 100
+
+BUCKET_STEPS = {BUCKET_HOUR: timedelta(hours=1), BUCKET_DAY: timedelta(days=1), BUCKET_WEEK: timedelta(weeks=1)}
+
+SalesSeries = namedtuple('SalesSeries', ['bucket', 'starts', 'orders', 'units', 'revenue'])
+
+
+def _parse_moment(value, name):
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}; use an ISO 8601 date or datetime")
+    # Sales are bucketed in UTC, which the stored naive timestamps are in
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(UTC).replace(tzinfo=None)
+    return moment
+
+
+def bucket_count(start, end, bucket):
+    """
+    Number of buckets ``bucket_edges`` returns for the range, worked out without building
+    them, so oversized ranges are refused before any memory is spent on them.
+    """
+    if bucket == BUCKET_MONTH:
+        stop = (end.year, end.month) if end == datetime(end.year, end.month, 1) else \
+            (end.year + end.month // 12, end.month % 12 + 1)
+        return (stop[0] - start.year) * 12 + stop[1] - start.month
+    if bucket == BUCKET_HOUR:
+        origin = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        origin = datetime(start.year, start.month, start.day)
+        if bucket == BUCKET_WEEK:
+            origin -= timedelta(days=origin.weekday())
+    step = BUCKET_STEPS[bucket]
+    return -((origin - end) // step)
+
+
+def parse_range(params, now=None):
+    """
+    Read ``start``, ``end`` (exclusive) and ``bucket`` from request arguments.
+    Without a range the last ``DEFAULT_RANGE_DAYS`` days are used.
+
+    :raises ValueError: with a message for the client when a value is invalid, the range
+                        is longer than ``MAX_RANGE_DAYS`` or has more than ``MAX_POINTS``
+                        buckets
+    """
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    end = _parse_moment(params['end'], 'end') if params.get('end') else now
+    start = _parse_moment(params['start'], 'start') if params.get('start') \
+        else end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start >= end:
+        raise ValueError("start must be before end")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise ValueError(f"The range may cover at most {MAX_RANGE_DAYS} days")
+
+    bucket = params.get('bucket') or 'auto'
+    if bucket == 'auto':
+        bucket = next((b for b in BUCKETS if bucket_count(start, end, b) <= MAX_POINTS), None)
+        if bucket is None:
+            raise ValueError(f"The range has more than {MAX_POINTS} months; use a shorter range")
+    elif bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of auto, {', '.join(BUCKETS)}")
+    elif bucket_count(start, end, bucket) > MAX_POINTS:
+        raise ValueError(f"The range has more than {MAX_POINTS} {bucket} buckets; use a larger bucket")
+    return start, end, bucket
+
+
+def bucket_edges(start, end, bucket):
+    """
+    Bucket boundaries covering ``start`` to ``end`` as ``datetime64[s]``: the first edge
+    is ``start`` rounded down to its bucket (weeks start on Monday) and the last one is
+    ``end`` rounded up.
+    """
+    first = np.datetime64(start, 's')
+    last = np.datetime64(end, 's')
+    if bucket == BUCKET_MONTH:
+        months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + np.timedelta64(2, 'M'))
+        edges = months.astype('datetime64[s]')
+    else:
+        if bucket == BUCKET_HOUR:
+            origin, step = first.astype('datetime64[h]'), np.timedelta64(1, 'h')
+        else:
+            origin = first.astype('datetime64[D]')
+            step = np.timedelta64(1, 'D')
+            if bucket == BUCKET_WEEK:
+                # datetime64 day 0 (1970-01-01) was a Thursday
+                origin -= (origin.astype(np.int64) + 3) % 7
+                step = np.timedelta64(7, 'D')
+        edges = np.arange(origin, last + step, step).astype('datetime64[s]')
+    # Drop edges past the first one at or after ``end``
+    return edges[:np.searchsorted(edges, last, side='left') + 1]
+
+
+def _stored_points(restaurant_ids, low, high, bucket):
+    """
+    Sales summed over the restaurants per stored bucket: hours for hourly series, days
+    otherwise. One grouped range query over an index.
+    """
+    if bucket == BUCKET_HOUR:
+        moment = HourlySales.hour_start
+        query = db.session.query(
+            moment, func.sum(HourlySales.orders), func.sum(HourlySales.units), func.sum(HourlySales.revenue)
+        ).filter(
+            HourlySales.restaurant_id.in_(restaurant_ids),
+            moment >= low,
+            moment < high
+        )
+    else:
+        moment = SalesRollup.period_start
+        query = db.session.query(
+            moment, func.sum(SalesRollup.orders), func.sum(SalesRollup.units), func.sum(SalesRollup.revenue)
+        ).filter(
+            SalesRollup.restaurant_id.in_(restaurant_ids),
+            SalesRollup.period == PERIOD_DAY,
+            moment >= low.date(),
+            moment < high.date()
+        )
+    return query.group_by(moment).all()
+
+
+def sales_series(restaurant_ids, start, end, bucket):
+    """
+    Orders, units and revenue of ``restaurant_ids`` per ``bucket`` from ``start`` to ``end``.
+
+    Hourly series read the hourly sales and coarser ones the daily rollups, so the cost
+    depends on the length of the range, not on the number of orders. The stored points
+    are then summed into the requested buckets with NumPy; empty buckets are zero.
+
+    :return: ``SalesSeries`` of NumPy arrays, one entry per bucket
+    """
+    edges = bucket_edges(start, end, bucket)
+    size = len(edges) - 1
+    rows = _stored_points(restaurant_ids, edges[0].astype(datetime), edges[-1].astype(datetime), bucket) \
+        if restaurant_ids else []
+
+    moments = np.array([row[0] for row in rows], dtype='datetime64[s]')
+    positions = np.searchsorted(edges, moments, side='right') - 1
+
+    def total(column, dtype):
+        weights = np.fromiter((float(row[column] or 0) for row in rows), dtype=np.float64, count=len(rows))
+        return np.bincount(positions, weights=weights, minlength=size)[:size].astype(dtype)
+
+    return SalesSeries(bucket, edges[:-1], total(1, np.int64), total(2, np.int64), np.round(total(3, np.float64), 2))
+
+
+def series_to_dict(series):
+    return {
+        "bucket": series.bucket,
+        "points": [
+            {
+                "start": str(start),
+                "orders": int(orders),
+                "units": int(units),
+                "revenue": float(revenue)
+            }
+            for start, orders, units, revenue in zip(series.starts, series.orders, series.units, series.revenue)
+        ],
+        "totals": {
+            "orders": int(series.orders.sum()),
+            "units": int(series.units.sum()),
+            "revenue": round(float(series.revenue.sum()), 2)
+        }
+    }
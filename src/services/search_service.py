@@ -1,16 +1,53 @@
 # services/search_service.py
 
-from src.models import Restaurant, Listing
+from datetime import datetime, UTC
 
+import numpy as np
 
-def search_restaurants(query):
+from src.models import db, Restaurant, Listing
+from src.models.listing_model import freshness_arrays
+from src.utils.text_index import get_search_index
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# Listing search ranks at most this many available listings, the best text matches first,
+# so a one-letter query over a huge catalog costs about the same as a precise one
+MAX_LISTING_CANDIDATES = 5000
+LISTING_CHUNK_SIZE = 500
+LISTING_RANK_WEIGHTS = {'text': 0.4, 'freshness': 0.3, 'discount': 0.2, 'stock': 0.1}
+
+
+def page_bounds(page, per_page):
+    """``page`` and ``per_page`` clamped the way the searches apply them: page from 1, size 1..MAX_PER_PAGE."""
+    page = max(int(page or 1), 1)
+    per_page = min(max(int(per_page or DEFAULT_PER_PAGE), 1), MAX_PER_PAGE)
+    return page, per_page
+
+
+def _offset_limit(page, per_page):
+    page, per_page = page_bounds(page, per_page)
+    return (page - 1) * per_page, per_page
+
+
+def _load_in_order(model, hits):
+    """Load the rows of ``hits`` with one primary key query, keeping the ranking order."""
+    ids = [doc_id for doc_id, _ in hits]
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+    return [rows[doc_id] for doc_id in ids if doc_id in rows]
+
+
+def search_restaurants(query, page=1, per_page=DEFAULT_PER_PAGE):
     """
-    Search for restaurants whose name matches the query (case-insensitive).
-    Returns a list of matching restaurants.
+    Search restaurants by name, category and description through the text index.
+    Matches whole words and word prefixes, ignoring case and Turkish diacritics.
+    Returns one page of matching restaurants, best match first.
     """
-    results = Restaurant.query.filter(
-        Restaurant.restaurantName.ilike(f"%{query}%")
-    ).all()
+    offset, limit = _offset_limit(page, per_page)
+    result = get_search_index().restaurants.search(query, limit=limit, offset=offset)
+    results = _load_in_order(Restaurant, result.hits)
 
     data = [
         {
@@ -26,26 +63,113 @@ def search_restaurants(query):
     return data
 
 
-def search_listings(query, restaurant_id):
+def _available_listing_rows(text_scores, now):
     """
-    Search for listings (within a specific restaurant) whose title matches the query.
-    Returns a list of matching listings.
+    Ranking columns of in-stock, unexpired listings among the text matches. The matches
+    are checked in SQL a chunk at a time, best text score first, until
+    ``MAX_LISTING_CANDIDATES`` available ones are found, so sold-out and expired listings
+    never use up the cap.
     """
-    results = Listing.query.filter(
-        Listing.restaurant_id == restaurant_id,
-        Listing.title.ilike(f"%{query}%")
-    ).all()
+    ids = np.fromiter(text_scores, dtype=np.int64, count=len(text_scores))
+    scores = np.fromiter(text_scores.values(), dtype=np.float64, count=len(text_scores))
+    ranked_ids = ids[np.lexsort((ids, -scores))].tolist()
 
-    data = [
-        {
-            "id": listing.id,
-            "restaurant_id": listing.restaurant_id,
-            "title": listing.title,
-            "description": listing.description,
-            "image_url": listing.image_url,
-            "price": float(listing.price),
-            "count": listing.count,
-        }
-        for listing in results
+    rows = []
+    for start in range(0, len(ranked_ids), LISTING_CHUNK_SIZE):
+        chunk = ranked_ids[start:start + LISTING_CHUNK_SIZE]
+        rows.extend(db.session.query(
+            Listing.id,
+            Listing.count,
+            Listing.original_price,
+            Listing.pick_up_price,
+            Listing.created_at,
+            Listing.expires_at
+        ).filter(
+            Listing.id.in_(chunk),
+            Listing.count > 0,
+            Listing.expires_at > now
+        ).all())
+        if len(rows) >= MAX_LISTING_CANDIDATES:
+            break
+    return rows
+
+
+def rank_listings(text_scores, rows, now=None):
+    """
+    Combined ranking score of each row, in row order.
+
+    The text score (relative to the best match), the freshness, the discount of the
+    pick-up price and the remaining stock (on a log scale, relative to the largest) are
+    each scaled to 0..1 and mixed with ``LISTING_RANK_WEIGHTS``.
+    """
+    text = np.fromiter((text_scores[row.id] for row in rows), dtype=np.float64, count=len(rows))
+    counts = np.fromiter((row.count for row in rows), dtype=np.float64, count=len(rows))
+    original = np.fromiter((float(row.original_price) for row in rows), dtype=np.float64, count=len(rows))
+    pick_up = np.fromiter(
+        (float(row.original_price if row.pick_up_price is None else row.pick_up_price) for row in rows),
+        dtype=np.float64, count=len(rows)
+    )
+    freshness = freshness_arrays([row.created_at for row in rows], [row.expires_at for row in rows], now)
+
+    discount = np.zeros_like(original)
+    np.divide(original - pick_up, original, out=discount, where=original > 0)
+    stock = np.log1p(counts) / np.log1p(counts.max())
+
+    weights = LISTING_RANK_WEIGHTS
+    return (
+        weights['text'] * text / text.max()
+        + weights['freshness'] * freshness.fresh_score / 100.0
+        + weights['discount'] * np.clip(discount, 0.0, 1.0)
+        + weights['stock'] * stock
+    ), freshness
+
+
+def _listing_to_dict(listing, score, freshness, position):
+    original_price = float(listing.original_price)
+    pick_up_price = float(listing.pick_up_price) if listing.pick_up_price is not None else None
+    return {
+        "id": listing.id,
+        "restaurant_id": listing.restaurant_id,
+        "title": listing.title,
+        "description": listing.description,
+        "image_url": listing.image_url,
+        "original_price": original_price,
+        "pick_up_price": pick_up_price,
+        "delivery_price": float(listing.delivery_price) if listing.delivery_price is not None else None,
+        "discount": round(1 - pick_up_price / original_price, 4) if pick_up_price is not None and original_price else 0.0,
+        "count": listing.count,
+        "fresh_score": round(float(freshness.fresh_score[position]), 2),
+        "consume_within": int(freshness.consume_within[position]),
+        "consume_within_type": str(freshness.consume_within_type[position]),
+        "score": round(float(score), 4),
+    }
+
+
+def search_listings(query, restaurant_id=None, page=1, per_page=DEFAULT_PER_PAGE):
+    """
+    Search listings by title and description, within one restaurant or across all of them.
+
+    Candidates come from the text index; expired and sold-out listings are dropped in SQL
+    and up to ``MAX_LISTING_CANDIDATES`` available matches ranked with ``rank_listings``.
+    Returns one page, best first.
+    """
+    offset, limit = _offset_limit(page, per_page)
+    now = datetime.now(UTC)
+    text_scores = get_search_index().listings.scores(query, group=restaurant_id)
+    rows = _available_listing_rows(text_scores, now) if text_scores else []
+    if not rows:
+        return []
+
+    scores, freshness = rank_listings(text_scores, rows, now)
+    ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    page_positions = np.lexsort((ids, -scores))[offset:offset + limit].tolist()
+    listings = {
+        listing.id: listing
+        for listing in Listing.query.filter(Listing.id.in_([int(ids[position]) for position in page_positions])).all()
+    }
+
+    return [
+        _listing_to_dict(listings[rows[position].id], scores[position], freshness, position)
+        for position in page_positions
+        if rows[position].id in listings
     ]
-    return data
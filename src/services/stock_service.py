@@ -0,0 +1,193 @@
+# services/stock_service.py
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from sqlalchemy import update, delete, select
+
+from src.models import db, Listing, Restaurant, StockHold
+
+logger = logging.getLogger(__name__)
+
+RELEASE_BATCH_SIZE = 500
+
+Hold = namedtuple('Hold', ['id', 'quantity'])
+
+
+def hold_seconds():
+    """Lifetime of cart holds from ``STOCK_HOLD_SECONDS``; 0 (the default) turns holds off."""
+    return int(current_app.config.get('STOCK_HOLD_SECONDS', 0) or 0)
+
+
+def take_stock(listing_id, quantity):
+    """
+    Take ``quantity`` units of a listing with a single conditional UPDATE.
+
+    The database checks and decrements the count in one statement, so concurrent buyers
+    can neither oversell nor overwrite each other's decrement, and only the listing's row
+    is locked. Returns False when there is not enough stock. The caller commits.
+    """
+    result = db.session.execute(
+        update(Listing)
+        .where(Listing.id == listing_id, Listing.count >= quantity)
+        .values(count=Listing.count - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def return_stock(listing_id, quantity):
+    """Put ``quantity`` units back, e.g. for a rejected order or a released hold."""
+    db.session.execute(
+        update(Listing)
+        .where(Listing.id == listing_id)
+        .values(count=Listing.count + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def user_holds(user_id):
+    """The user's holds as ``{listing_id: Hold}``; no query when holds are turned off."""
+    if not hold_seconds():
+        return {}
+    rows = db.session.query(StockHold.id, StockHold.listing_id, StockHold.quantity).filter(
+        StockHold.user_id == user_id
+    ).all()
+    return {row.listing_id: Hold(row.id, row.quantity) for row in rows}
+
+
+def _drop_hold(hold):
+    """Delete a hold unless it changed meanwhile; returns whether this call removed it."""
+    result = db.session.execute(
+        delete(StockHold)
+        .where(StockHold.id == hold.id, StockHold.quantity == hold.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def hold_stock(user_id, listing_id, quantity, now=None):
+    """
+    Set the user's hold on a listing to ``quantity`` units, taking or returning the
+    difference and restarting its timer. A quantity of 0 releases the hold.
+
+    Returns False when there is not enough stock; the caller must then roll back.
+    The caller commits otherwise.
+    """
+    now = now or datetime.now(UTC)
+    expires_at = now + timedelta(seconds=hold_seconds())
+
+    # The release job may drop the hold between the read and the write; retry on a miss
+    for _ in range(3):
+        row = db.session.query(StockHold.id, StockHold.quantity).filter(
+            StockHold.user_id == user_id, StockHold.listing_id == listing_id
+        ).first()
+        held = row.quantity if row else 0
+
+        if row and quantity:
+            changed = db.session.execute(
+                update(StockHold)
+                .where(StockHold.id == row.id, StockHold.quantity == held)
+                .values(quantity=quantity, expires_at=expires_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+        elif row:
+            changed = _drop_hold(Hold(row.id, held))
+        else:
+            changed = True
+            if quantity:
+                db.session.add(StockHold(user_id=user_id, listing_id=listing_id, quantity=quantity, expires_at=expires_at))
+                db.session.flush()
+        if not changed:
+            continue
+
+        if quantity > held:
+            return take_stock(listing_id, quantity - held)
+        if quantity < held:
+            return_stock(listing_id, held - quantity)
+        return True
+    return False
+
+
+def release_holds(user_id, listing_ids=None):
+    """Give back the units of the user's holds (all of them, or those on ``listing_ids``)."""
+    for listing_id, hold in user_holds(user_id).items():
+        if listing_ids is not None and listing_id not in listing_ids:
+            continue
+        if _drop_hold(hold):
+            return_stock(listing_id, hold.quantity)
+
+
+def claim_stock(quantities, holds=None):
+    """
+    Take the stock of a checkout: ``quantities`` maps listing ids to units.
+
+    Units the user holds are used first and only the rest is taken from the listing.
+    Listings are locked in id order, so checkouts of overlapping carts cannot deadlock.
+    Returns the id of the first listing without enough stock, or None. The caller
+    commits, or rolls back on a shortage.
+    """
+    holds = holds or {}
+    for listing_id in sorted(quantities):
+        needed = quantities[listing_id]
+        hold = holds.get(listing_id)
+        held = hold.quantity if hold and _drop_hold(hold) else 0
+
+        if needed > held and not take_stock(listing_id, needed - held):
+            return listing_id
+        if held > needed:
+            return_stock(listing_id, held - needed)
+    return None
+
+
+def update_sold_out_counters(listings):
+    """
+    Lower each restaurant's active listing counter for the given listings this checkout
+    sold out. Call after ``claim_stock``, before committing.
+
+    A listing counts as sold out once its count is 0 and no cart holds units of it any
+    more: with holds on the count can reach 0 long before checkout, and only the checkout
+    that claims the last held or free units takes the listing off. A concurrent checkout
+    still sees the other's hold, so a listing is never counted twice.
+    """
+    if not listings:
+        return
+    columns = [Listing.id, Listing.count]
+    if hold_seconds():
+        columns.append(
+            select(StockHold.id).where(StockHold.listing_id == Listing.id).exists().label('held')
+        )
+    rows = db.session.query(*columns).filter(
+        Listing.id.in_([listing.id for listing in listings])
+    ).all()
+    sold_out_ids = {row.id for row in rows if row.count == 0 and not getattr(row, 'held', False)}
+    sold_out = {}
+    for listing in listings:
+        if listing.id in sold_out_ids:
+            sold_out[listing.restaurant_id] = sold_out.get(listing.restaurant_id, 0) + 1
+    for restaurant_id, count in sold_out.items():
+        db.session.execute(
+            update(Restaurant)
+            .where(Restaurant.id == restaurant_id, Restaurant.listings >= count)
+            .values(listings=Restaurant.listings - count)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def release_expired_holds(now=None, limit=RELEASE_BATCH_SIZE):
+    """Give back the units of expired holds and delete them; returns how many were released."""
+    now = now or datetime.now(UTC)
+    rows = db.session.query(StockHold.id, StockHold.listing_id, StockHold.quantity).filter(
+        StockHold.expires_at <= now
+    ).order_by(StockHold.expires_at).limit(limit).all()
+
+    released = 0
+    for row in rows:
+        if _drop_hold(Hold(row.id, row.quantity)):
+            return_stock(row.listing_id, row.quantity)
+            released += 1
+    db.session.commit()
+    if released:
+        logger.info(f"Released {released} expired stock holds")
+    return released
@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app
+from py_vapid import Vapid
+from pywebpush import WebPusher
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Signed VAPID headers are valid for 12 hours; they are renewed an hour before that
+VAPID_TOKEN_SECONDS = 12 * 3600
+VAPID_RENEW_SECONDS = 3600
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+SENT = 'sent'
+GONE = 'gone'
+FAILED = 'failed'
+
+
+class WebPushEngine:
+    """
+    Delivers web push messages with pooled connections and a cached VAPID key.
+
+    The private key is parsed once and the signed VAPID headers are reused per push
+    service origin until shortly before they expire. Each origin (FCM, Mozilla, Apple...)
+    gets its own keep-alive ``requests.Session``, and ``send_many`` encrypts and posts
+    the messages from a thread pool. Subscriptions answered with 404 or 410 no longer
+    exist and are reported as ``GONE``.
+    """
+
+    def __init__(self, vapid_private_key, subject="mailto:contact@freshdeal.com", max_workers=8,
+                 timeout=10, ttl=DEFAULT_TTL_SECONDS):
+        self.subject = subject
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ttl = ttl
+        self._vapid = self._load_vapid(vapid_private_key) if vapid_private_key else None
+        self._vapid_headers = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-push")
+
+    @staticmethod
+    def _load_vapid(private_key):
+        # Accept a full PEM as well as the bare base64 body written by generate_vapid_keys.py
+        if private_key.lstrip().startswith("-----BEGIN"):
+            return Vapid.from_pem(private_key.encode())
+        return Vapid.from_string(private_key=private_key)
+
+    @staticmethod
+    def origin(endpoint):
+        url = urlparse(endpoint)
+        return f"{url.scheme}://{url.netloc}"
+
+    def session(self, origin):
+        session = self._sessions.get(origin)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(origin)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                    session.mount(origin, adapter)
+                    self._sessions[origin] = session
+        return session
+
+    def vapid_headers(self, origin):
+        if self._vapid is None:
+            raise ValueError("VAPID_PRIVATE_KEY is not configured")
+        now = time.time()
+        cached = self._vapid_headers.get(origin)
+        if cached is None or cached[0] - now < VAPID_RENEW_SECONDS:
+            expires_at = int(now) + VAPID_TOKEN_SECONDS
+            headers = self._vapid.sign({"sub": self.subject, "aud": origin, "exp": expires_at})
+            cached = (expires_at, headers)
+            self._vapid_headers[origin] = cached
+        return dict(cached[1])
+
+    def send(self, subscription_info, data):
+        """
+        Encrypt ``data`` for one subscription and post it.
+
+        :return: ``SENT``, ``GONE`` when the subscription no longer exists, or ``FAILED``
+        """
+        try:
+            origin = self.origin(subscription_info["endpoint"])
+            response = WebPusher(subscription_info, requests_session=self.session(origin)).send(
+                data,
+                self.vapid_headers(origin),
+                ttl=self.ttl,
+                timeout=self.timeout
+            )
+        except Exception as e:
+            logger.error(f"Error sending web push notification: {str(e)}")
+            return FAILED
+
+        if response.status_code in (404, 410):
+            logger.info(f"Web push subscription is no longer valid ({response.status_code})")
+            return GONE
+        if response.status_code > 202:
+            logger.error(f"Web push failed with status {response.status_code}: {response.text}")
+            return FAILED
+        return SENT
+
+    def send_many(self, subscriptions, data):
+        """Send ``data`` to every subscription concurrently; results are in input order."""
+        if len(subscriptions) <= 1:
+            return [self.send(subscription, data) for subscription in subscriptions]
+        return list(self._executor.map(lambda subscription: self.send(subscription, data), subscriptions))
+
+
+def get_web_push_engine():
+    """Return the web push engine of the current app, creating it on first use."""
+    engine = current_app.extensions.get('web_push_engine')
+    if engine is None:
+        engine = WebPushEngine(
+            current_app.config.get('VAPID_PRIVATE_KEY') or os.environ.get('VAPID_PRIVATE_KEY'),
+            max_workers=current_app.config.get('WEB_PUSH_WORKERS', 8)
+        )
+        current_app.extensions['web_push_engine'] = engine
+    return engine
@@ -1,11 +1,10 @@
 import json
 import logging
 from typing import Dict, Any, List, Optional, Union
-import requests
-from pywebpush import webpush, WebPushException
 from datetime import datetime, UTC
 
 from src.models import db, UserDevice
+from src.services.web_push_engine import get_web_push_engine, SENT, GONE
 
 logger = logging.getLogger(__name__)
 
@@ -56,8 +55,7 @@ class WebPushNotificationService:
             return False, str(e)
 
     @staticmethod
-    def send_web_push_notification(
-            subscription_info: Dict[str, Any],
+    def build_payload(
             title: str,
             body: str,
             icon: str = None,
@@ -67,50 +65,60 @@ class WebPushNotificationService:
             actions: List[Dict[str, str]] = None,
             tag: str = None,
             require_interaction: bool = False
-    ) -> bool:
-        try:
-            import os
-            vapid_claims = {
-                "sub": "mailto:contact@freshdeal.com",
-            }
-
-            payload_data = {
-                "notification": {
-                    "title": title,
-                    "body": body,
-                    "icon": icon,
-                    "badge": badge,
-                    "image": image,
-                    "data": data or {},
-                    "requireInteraction": require_interaction
-                }
+    ) -> str:
+        payload_data = {
+            "notification": {
+                "title": title,
+                "body": body,
+                "icon": icon,
+                "badge": badge,
+                "image": image,
+                "data": data or {},
+                "requireInteraction": require_interaction
             }
+        }
 
-            if actions:
-                payload_data["notification"]["actions"] = actions
+        if actions:
+            payload_data["notification"]["actions"] = actions
 
-            if tag:
-                payload_data["notification"]["tag"] = tag
+        if tag:
+            payload_data["notification"]["tag"] = tag
 
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(payload_data),
-                vapid_private_key=os.environ.get('VAPID_PRIVATE_KEY'),
-                vapid_claims=vapid_claims
-            )
+        return json.dumps(payload_data)
 
-            logger.info("Web push notification sent successfully")
-            return True
+    @staticmethod
+    def send_web_push_notification(
+            subscription_info: Dict[str, Any],
+            title: str,
+            body: str,
+            **kwargs
+    ) -> bool:
+        try:
+            payload = WebPushNotificationService.build_payload(title, body, **kwargs)
+            result = get_web_push_engine().send(subscription_info, payload)
+            if result == GONE:
+                WebPushNotificationService.deactivate_subscriptions([json.dumps(subscription_info)])
+            elif result == SENT:
+                logger.info("Web push notification sent successfully")
+            return result == SENT
 
-        except WebPushException as e:
-            logger.error(f"WebPushException: {str(e)}")
-            if e.response and e.response.status_code == 410:
-                logger.info("Subscription is no longer valid")
-            return False
         except Exception as e:
             logger.error(f"Error sending web push notification: {str(e)}")
             return False
 
+    @staticmethod
+    def deactivate_subscriptions(web_push_tokens: List[str]) -> int:
+        """Deactivate the devices of subscriptions the push service reported as gone."""
+        if not web_push_tokens:
+            return 0
+        count = UserDevice.query.filter(UserDevice.web_push_token.in_(web_push_tokens)).update({
+            UserDevice.is_active: False,
+            UserDevice.last_used: datetime.now(UTC)
+        }, synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Deactivated {count} expired web push subscriptions")
+        return count
+
     @staticmethod
     def send_notification_to_user_web(
             user_id: int,
@@ -131,30 +139,22 @@ class WebPushNotificationService:
                 logger.warning(f"No active web devices found for user {user_id}")
                 return False
 
-            success_count = 0
-
+            tokens, subscriptions = [], []
             for device in web_devices:
+                token = device.web_push_token or device.push_token
                 try:
-                    if device.web_push_token:
-                        subscription_info = json.loads(device.web_push_token)
-                    else:
-                        subscription_info = json.loads(device.push_token)
-
-                    success = WebPushNotificationService.send_web_push_notification(
-                        subscription_info=subscription_info,
-                        title=title,
-                        body=body,
-                        icon=icon,
-                        data=data,
-                        **kwargs
-                    )
-
-                    if success:
-                        success_count += 1
-
+                    subscriptions.append(json.loads(token))
+                    tokens.append(token)
                 except json.JSONDecodeError:
                     logger.error(f"Invalid subscription info for device {device.id}")
-                    continue
+
+            payload = WebPushNotificationService.build_payload(title, body, icon=icon, data=data, **kwargs)
+            results = get_web_push_engine().send_many(subscriptions, payload)
+
+            WebPushNotificationService.deactivate_subscriptions(
+                [token for token, result in zip(tokens, results) if result == GONE]
+            )
+            success_count = results.count(SENT)
 
             logger.info(
                 f"Successfully sent web notifications to {success_count}/{len(web_devices)} devices for user {user_id}")
@@ -162,4 +162,4 @@ class WebPushNotificationService:
 
         except Exception as e:
             logger.error(f"Error sending web notification to user {user_id}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,260 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db, ExpiringEntry
+
+logger = logging.getLogger(__name__)
+
+# allowed: whether the request may proceed; remaining: whole tokens left;
+# retry_after: seconds until a token is available; reset_after: seconds until the bucket is full
+BucketState = namedtuple('BucketState', ['allowed', 'remaining', 'retry_after', 'reset_after'])
+
+
+def refill_bucket(tokens, updated_at, capacity, refill_per_second, now, cost=1):
+    """
+    Token bucket step: top ``tokens`` up for the time since ``updated_at`` and take
+    ``cost`` if there is enough. Returns the new token count and the ``BucketState``.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_per_second)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    retry_after = 0.0 if allowed else (cost - tokens) / refill_per_second
+    reset_after = (capacity - tokens) / refill_per_second
+    return tokens, BucketState(allowed, int(tokens), retry_after, reset_after)
+
+
+class ExpiringStore(ABC):
+    """
+    Key-value store whose entries expire, plus token-bucket counters.
+
+    A bucket only needs its token count and the time it was last updated, so a check
+    is O(1) and the entry can expire once the bucket would be full again.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key, value, ttl_seconds):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def consume(self, key, capacity, refill_per_second, cost=1, now=None):
+        """Take ``cost`` tokens from the bucket ``key``; returns a ``BucketState``."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def sweep(self, now=None):
+        """Drop expired entries; returns how many were removed."""
+        raise NotImplementedError
+
+
+class MemoryStore(ExpiringStore):
+    """
+    In-process store with TTL and LRU eviction. Values (e.g. verification codes) and
+    token buckets are kept apart, bounded by ``max_entries`` and ``max_buckets``, so a
+    flood of clients filling buckets cannot evict pending codes. The least recently used
+    entry of a full side is dropped. Not shared between processes.
+    """
+
+    def __init__(self, max_entries=100000, max_buckets=None):
+        self.max_entries = max_entries
+        self.max_buckets = max_entries if max_buckets is None else max_buckets
+        self._entries = OrderedDict()  # key -> [value, expires_at]
+        self._buckets = OrderedDict()  # key -> [(tokens, updated_at), expires_at]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._buckets)
+
+    @staticmethod
+    def _live(entries, key, now):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _put(entries, max_entries, key, value, expires_at):
+        entries[key] = [value, expires_at]
+        entries.move_to_end(key)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(self._entries, key, time.time())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._put(self._entries, self.max_entries, key, value, time.time() + ttl_seconds)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._buckets.pop(key, None)
+
+    def consume(self, key, capacity, refill_per_second, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._live(self._buckets, key, now)
+            tokens, updated_at = entry[0] if entry else (capacity, now)
+            tokens, state = refill_bucket(tokens, updated_at, capacity, refill_per_second, now, cost)
+            self._put(self._buckets, self.max_buckets, key, (tokens, now), now + max(state.reset_after, 1.0))
+            return state
+
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            for entries in (self._entries, self._buckets):
+                expired = [key for key, (_, expires_at) in entries.items() if expires_at <= now]
+                for key in expired:
+                    del entries[key]
+                removed += len(expired)
+        return removed
+
+
+class SqlStore(ExpiringStore):
+    """
+    Store backed by the ``expiring_entries`` table, shared by every worker.
+
+    Each operation runs in its own short transaction on the engine, never touching the
+    caller's session. Buckets are updated with compare-and-set on ``updated_at``, so
+    concurrent requests from different workers cannot both spend the same token.
+    """
+
+    MAX_RETRIES = 5
+
+    def __init__(self):
+        self.table = ExpiringEntry.__table__
+
+    def get(self, key):
+        with db.engine.begin() as connection:
+            row = connection.execute(
+                select(self.table.c.value).where(self.table.c.key == key, self.table.c.expires_at > time.time())
+            ).first()
+        return json.loads(row.value) if row and row.value is not None else None
+
+    def set(self, key, value, ttl_seconds):
+        values = {"value": json.dumps(value), "tokens": None, "updated_at": None,
+                  "expires_at": time.time() + ttl_seconds}
+        for _ in range(self.MAX_RETRIES):
+            try:
+                with db.engine.begin() as connection:
+                    updated = connection.execute(
+                        update(self.table).where(self.table.c.key == key).values(**values)
+                    ).rowcount
+                    if not updated:
+                        connection.execute(insert(self.table).values(key=key, **values))
+                return
+            except IntegrityError:
+                continue
+        raise RuntimeError(f"Could not store {key} after {self.MAX_RETRIES} attempts")
+
+    def delete(self, key):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.key == key))
+
+    def consume(self, key, capacity, refill_per_second, cost=1, now=None):
+        for _ in range(self.MAX_RETRIES):
+            current = time.time() if now is None else now
+            try:
+                with db.engine.begin() as connection:
+                    row = connection.execute(
+                        select(self.table.c.tokens, self.table.c.updated_at, self.table.c.expires_at)
+                        .where(self.table.c.key == key)
+                    ).first()
+                    fresh = row is None or row.tokens is None or row.expires_at <= current
+                    tokens, updated_at = (capacity, current) if fresh else (row.tokens, row.updated_at)
+                    tokens, state = refill_bucket(tokens, updated_at, capacity, refill_per_second, current, cost)
+                    values = {"value": None, "tokens": tokens, "updated_at": current,
+                              "expires_at": current + max(state.reset_after, 1.0)}
+
+                    if row is None:
+                        connection.execute(insert(self.table).values(key=key, **values))
+                        return state
+                    condition = self.table.c.key == key
+                    if row.updated_at is None:
+                        condition &= self.table.c.updated_at.is_(None)
+                    else:
+                        condition &= self.table.c.updated_at == row.updated_at
+                    if connection.execute(update(self.table).where(condition).values(**values)).rowcount:
+                        return state
+            except IntegrityError:
+                pass
+        # Heavy contention on one key: refuse rather than let requests through unmetered
+        return BucketState(False, 0, 1.0, 1.0)
+
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at <= now)).rowcount
+
+
+class _Sweeper(threading.Thread):
+    def __init__(self, app, store, interval_seconds):
+        super().__init__(name="expiring-store-sweeper", daemon=True)
+        self.app = app
+        self.store = store
+        self.interval_seconds = interval_seconds
+
+    def run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                with self.app.app_context():
+                    removed = self.store.sweep()
+                if removed:
+                    logger.info(f"Swept {removed} expired entries")
+            except Exception as e:
+                logger.error(f"Error sweeping expired entries: {str(e)}")
+
+
+def create_store(kind, max_entries=100000, max_buckets=None):
+    if kind == 'memory':
+        return MemoryStore(max_entries=max_entries, max_buckets=max_buckets)
+    if kind == 'sql':
+        return SqlStore()
+    raise ValueError(f"EXPIRING_STORE must be 'memory' or 'sql', got {kind!r}")
+
+
+def get_expiring_store():
+    """
+    Return the expiring store of the current app, creating it on first use.
+
+    ``EXPIRING_STORE`` selects ``memory`` (per process) or ``sql`` (shared by all
+    workers). Apps that leave it unset, like the tests and scripts, get ``memory``;
+    app.py sets ``sql`` unless the ``EXPIRING_STORE`` environment variable says otherwise.
+    A memory store holds at most ``EXPIRING_STORE_MAX_ENTRIES`` values and
+    ``EXPIRING_STORE_MAX_BUCKETS`` buckets. Outside of tests a daemon thread sweeps
+    expired entries every ``EXPIRING_STORE_SWEEP_SECONDS``.
+    """
+    store = current_app.extensions.get('expiring_store')
+    if store is None:
+        config = current_app.config
+        store = create_store(config.get('EXPIRING_STORE', 'memory'), config.get('EXPIRING_STORE_MAX_ENTRIES', 100000),
+                             config.get('EXPIRING_STORE_MAX_BUCKETS'))
+        current_app.extensions['expiring_store'] = store
+        if not config.get('TESTING'):
+            _Sweeper(current_app._get_current_object(), store, config.get('EXPIRING_STORE_SWEEP_SECONDS', 60)).start()
+    return store
@@ -0,0 +1,104 @@
+from math import radians, cos, sin, asin, sqrt, pi
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+# Length of one degree of latitude on the sphere haversine_km uses, so boxes and distances agree
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * pi / 180
+# Boxes are widened by this fraction so points right on the circle survive float rounding
+BOX_PADDING = 1e-9
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in kilometers between two points given in decimal degrees.
+    """
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    d_lat = lat2 - lat1
+    d_lon = lon2 - lon1
+    a = sin(d_lat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(d_lon / 2) ** 2
+    return 2 * asin(sqrt(a)) * EARTH_RADIUS_KM
+
+
+def to_float_array(values):
+    """Convert an iterable of numbers (including ``Decimal`` column values) to a float64 array."""
+    if isinstance(values, np.ndarray) and values.dtype == np.float64:
+        return values
+    return np.fromiter((float(value) for value in values), dtype=np.float64)
+
+
+def haversine_distances_km(lat, lon, lats, lons):
+    """
+    Distances in kilometers from one point to many points.
+
+    :param lat: Latitude of the origin in decimal degrees
+    :param lon: Longitude of the origin in decimal degrees
+    :param lats: float64 array of latitudes
+    :param lons: float64 array of longitudes
+    :return: float64 array with one distance per point
+    """
+    lat_rad = np.radians(lat)
+    lats_rad = np.radians(lats)
+    d_lat = lats_rad - lat_rad
+    d_lon = np.radians(lons) - np.radians(lon)
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat_rad) * np.cos(lats_rad) * np.sin(d_lon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+
+def pairwise_haversine_km(lats_a, lons_a, lats_b, lons_b):
+    """
+    Distance matrix in kilometers between two sets of points.
+
+    :return: float64 array of shape ``(len(lats_a), len(lats_b))``
+    """
+    lats_a = np.radians(lats_a)[:, np.newaxis]
+    lons_a = np.radians(lons_a)[:, np.newaxis]
+    lats_b = np.radians(lats_b)[np.newaxis, :]
+    lons_b = np.radians(lons_b)[np.newaxis, :]
+    a = np.sin((lats_b - lats_a) / 2) ** 2 + np.cos(lats_a) * np.cos(lats_b) * np.sin((lons_b - lons_a) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Smallest lat/lon box containing every point within ``radius_km`` of ``(lat, lon)``.
+
+    Returns ``(min_lat, max_lat, min_lon, max_lon)``. Longitudes are not wrapped, so a
+    box crossing the antimeridian has ``min_lon < -180`` or ``max_lon > 180``. When the
+    box reaches a pole every longitude qualifies and ``(-180, 180)`` is returned.
+    """
+    lat_delta = radius_km * (1 + BOX_PADDING) / KM_PER_DEGREE_LAT
+    min_lat = max(lat - lat_delta, -90.0)
+    max_lat = min(lat + lat_delta, 90.0)
+
+    edge_cos = cos(radians(min(abs(lat) + lat_delta, 90.0)))
+    if edge_cos <= 1e-6:
+        return min_lat, max_lat, -180.0, 180.0
+
+    lon_delta = radius_km * (1 + BOX_PADDING) / (KM_PER_DEGREE_LAT * edge_cos)
+    if lon_delta >= 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - lon_delta, lon + lon_delta
+
+
+def within_radius(lat, lon, radius_km, ids, lats, lons, max_distances=None):
+    """
+    Vectorized radius filter.
+
+    Returns ``(ids, distances)`` arrays for the points within ``radius_km`` of the origin,
+    sorted nearest first. When ``max_distances`` is given, points whose own maximum
+    distance is shorter than their distance to the origin are dropped as well.
+    """
+    ids = np.asarray(ids)
+    if len(ids) == 0:
+        return ids, np.empty(0, dtype=np.float64)
+
+    distances = haversine_distances_km(lat, lon, lats, lons)
+    mask = distances <= radius_km
+    if max_distances is not None:
+        mask &= distances <= max_distances
+
+    ids = ids[mask]
+    distances = distances[mask]
+    order = np.argsort(distances, kind='stable')
+    return ids[order], distances[order]
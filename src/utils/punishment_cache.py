@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+
+from src.models import db, RestaurantPunishment
+
+
+def _end_timestamp(punishment_type, end_date):
+    if punishment_type == "PERMANENT" or end_date is None:
+        return math.inf
+    # SQLite hands back naive datetimes; punishment dates are stored in UTC
+    if end_date.tzinfo is None:
+        end_date = end_date.replace(tzinfo=UTC)
+    return end_date.timestamp()
+
+
+class PunishmentStatusCache:
+    """
+    In-process map of restaurant id to the end of its current punishment.
+
+    Only punished restaurants have an entry, so the whole map is loaded with one query.
+    Storing the end time (``inf`` for permanent punishments) lets a temporary punishment
+    lapse on its own without another query. Entries are refreshed after ``ttl_seconds``
+    to pick up changes made by other processes, and per restaurant whenever a punishment
+    is issued or reverted here.
+    """
+
+    def __init__(self, ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        self._ends = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _punishment_rows(self, restaurant_id=None):
+        query = db.session.query(
+            RestaurantPunishment.restaurant_id,
+            RestaurantPunishment.punishment_type,
+            RestaurantPunishment.end_date
+        ).filter(
+            RestaurantPunishment.is_active == True,
+            RestaurantPunishment.is_reverted == False,
+            (
+                (RestaurantPunishment.punishment_type == "PERMANENT") |
+                (
+                    (RestaurantPunishment.punishment_type == "TEMPORARY") &
+                    (RestaurantPunishment.end_date > datetime.now(UTC))
+                )
+            )
+        )
+        if restaurant_id is not None:
+            query = query.filter(RestaurantPunishment.restaurant_id == restaurant_id)
+        return query.all()
+
+    @staticmethod
+    def _merge(ends, rows):
+        for restaurant_id, punishment_type, end_date in rows:
+            ends[restaurant_id] = max(ends.get(restaurant_id, 0.0), _end_timestamp(punishment_type, end_date))
+        return ends
+
+    def reload(self):
+        ends = self._merge({}, self._punishment_rows())
+        with self._lock:
+            self._ends = ends
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self, restaurant_id=None):
+        """Re-read the punishments of one restaurant, or of every restaurant when no id is given."""
+        if restaurant_id is None or self._loaded_at is None:
+            self.reload()
+            return
+        entry = self._merge({}, self._punishment_rows(restaurant_id))
+        with self._lock:
+            self._ends.pop(restaurant_id, None)
+            self._ends.update(entry)
+
+    def _current_ends(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            self.reload()
+        return self._ends
+
+    def punishment_end(self, restaurant_id):
+        """Timestamp the restaurant's punishment ends at (``inf`` if permanent), or None."""
+        end = self._current_ends().get(restaurant_id)
+        if end is None or end <= time.time():
+            return None
+        return end
+
+    def is_active(self, restaurant_id):
+        return self.punishment_end(restaurant_id) is None
+
+    def active_restaurant_ids(self, restaurant_ids):
+        """The ids among ``restaurant_ids`` that are not under punishment, in their original order."""
+        ends = self._current_ends()
+        now = time.time()
+        return [restaurant_id for restaurant_id in restaurant_ids if ends.get(restaurant_id, 0.0) <= now]
+
+
+def get_punishment_cache():
+    """Return the punishment status cache bound to the current Flask app, creating it on first use."""
+    cache = current_app.extensions.get('punishment_status_cache')
+    if cache is None:
+        cache = PunishmentStatusCache(
+            ttl_seconds=current_app.config.get('PUNISHMENT_CACHE_TTL_SECONDS', 300)
+        )
+        current_app.extensions['punishment_status_cache'] = cache
+    return cache
+
+
+def active_restaurant_ids(restaurant_ids):
+    """Filter punished restaurants out of ``restaurant_ids`` in one step."""
+    return get_punishment_cache().active_restaurant_ids(restaurant_ids)
+
+
+def invalidate_punishment_status(restaurant_id=None):
+    get_punishment_cache().invalidate(restaurant_id)
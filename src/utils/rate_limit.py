@@ -0,0 +1,117 @@
+import logging
+import math
+
+from flask import current_app, jsonify, request, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+from src.utils.expiring_store import create_store
+
+logger = logging.getLogger(__name__)
+
+# (requests, per seconds) by blueprint name; None switches limiting off for a blueprint.
+# Override any of them with the RATE_LIMITS config dict, the rest use RATE_LIMIT_DEFAULT.
+DEFAULT_LIMITS = {
+    'restaurant': (60, 60),
+    'search': (30, 60),
+    'listings': (60, 60),
+    'recommendations': (20, 60),
+    'auth': (20, 60),
+    'static': None,
+}
+DEFAULT_LIMIT = (120, 60)
+
+
+def route_class():
+    """Name of the innermost blueprint of the request, e.g. ``search`` for ``api_v1.search``."""
+    if not request.blueprint:
+        return None
+    return request.blueprint.rsplit('.', 1)[-1]
+
+
+def client_identity():
+    """
+    ``user:<id>`` for requests with a valid access token, ``ip:<address>`` otherwise.
+
+    The address is ``request.remote_addr``, never ``X-Forwarded-For``, which any client
+    can set. Behind a reverse proxy set ``TRUSTED_PROXY_HOPS`` so app.py wraps the app in
+    werkzeug's ``ProxyFix`` and ``remote_addr`` is the client's own address.
+    """
+    if request.headers.get('Authorization'):
+        try:
+            verify_jwt_in_request(optional=True)
+            user_id = get_jwt_identity()
+            if user_id is not None:
+                return f"user:{user_id}"
+        except Exception:
+            # Invalid or expired tokens are rejected by the endpoint itself; meter them by address
+            pass
+    return f"ip:{request.remote_addr}"
+
+
+def limit_for(name):
+    limits = {**DEFAULT_LIMITS, **current_app.config.get('RATE_LIMITS', {})}
+    if name in limits:
+        return limits[name]
+    return current_app.config.get('RATE_LIMIT_DEFAULT', DEFAULT_LIMIT)
+
+
+def get_rate_limit_store():
+    """
+    Store holding the buckets, per process by default. Every request checks a bucket, so
+    a database round trip per request is opt-in: ``RATE_LIMIT_STORE = 'sql'`` shares the
+    buckets between workers through the ``expiring_entries`` table.
+    """
+    store = current_app.extensions.get('rate_limit_store')
+    if store is None:
+        config = current_app.config
+        store = create_store(config.get('RATE_LIMIT_STORE', 'memory'), config.get('RATE_LIMIT_MAX_ENTRIES', 100000))
+        current_app.extensions['rate_limit_store'] = store
+    return store
+
+
+def _check_rate_limit():
+    name = route_class()
+    limit = limit_for(name) if name else None
+    if not limit:
+        return None
+
+    capacity, per_seconds = limit
+    try:
+        state = get_rate_limit_store().consume(f"rate-limit:{name}:{client_identity()}", capacity, capacity / per_seconds)
+    except Exception as e:
+        # Fail open: a store outage must not take the API down with it
+        logger.error(f"Rate limit check failed: {str(e)}")
+        return None
+
+    g.rate_limit = (capacity, state)
+    if not state.allowed:
+        response = jsonify({"success": False, "message": "Too many requests. Try again later."})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(state.retry_after))
+        return response
+    return None
+
+
+def _add_rate_limit_headers(response):
+    rate_limit = g.pop('rate_limit', None)
+    if rate_limit:
+        capacity, state = rate_limit
+        response.headers['X-RateLimit-Limit'] = str(capacity)
+        response.headers['X-RateLimit-Remaining'] = str(state.remaining)
+        response.headers['X-RateLimit-Reset'] = str(math.ceil(state.reset_after))
+    return response
+
+
+def init_rate_limiter(app):
+    """
+    Apply token-bucket limits to every request, per client and blueprint.
+
+    Each (blueprint, user or IP) pair has a bucket of ``requests`` tokens refilled
+    evenly over ``per seconds``; a bucket is two numbers in the store, so a check is
+    O(1). Responses carry ``X-RateLimit-*`` headers and rejected requests get a 429
+    with ``Retry-After``. Set ``RATE_LIMIT_ENABLED`` to False to turn it off.
+    """
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    app.before_request(_check_rate_limit)
+    app.after_request(_add_rate_limit_headers)
@@ -0,0 +1,239 @@
+import math
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from src.models import db, Restaurant
+from src.utils.geo import bounding_box, within_radius
+
+IndexedRestaurant = namedtuple(
+    'IndexedRestaurant',
+    ['id', 'latitude', 'longitude', 'max_delivery_distance', 'flash_deals_available']
+)
+
+CellArrays = namedtuple('CellArrays', ['ids', 'lats', 'lons', 'max_distances', 'flash'])
+
+
+def _cell_arrays(entries):
+    return CellArrays(
+        ids=np.fromiter((entry.id for entry in entries), dtype=np.int64, count=len(entries)),
+        lats=np.fromiter((entry.latitude for entry in entries), dtype=np.float64, count=len(entries)),
+        lons=np.fromiter((entry.longitude for entry in entries), dtype=np.float64, count=len(entries)),
+        max_distances=np.fromiter(
+            (np.inf if entry.max_delivery_distance is None else entry.max_delivery_distance for entry in entries),
+            dtype=np.float64, count=len(entries)
+        ),
+        flash=np.fromiter((entry.flash_deals_available for entry in entries), dtype=bool, count=len(entries))
+    )
+
+
+class RestaurantSpatialIndex:
+    """
+    In-process grid index over restaurant coordinates.
+
+    Restaurants are bucketed into cells of ``cell_degrees`` x ``cell_degrees``. Each cell
+    keeps its coordinates as float64 arrays, so a radius query concatenates the cells
+    overlapping the query's bounding box and runs one vectorized haversine over them.
+    """
+
+    def __init__(self, cell_degrees=0.05, ttl_seconds=300):
+        self.cell_degrees = cell_degrees
+        self.ttl_seconds = ttl_seconds
+        self._lon_cells = int(math.ceil(360 / cell_degrees))
+        self._lock = threading.RLock()
+        self._members = {}
+        self._arrays = {}
+        self._entries = {}
+        self._built_at = None
+
+    def _cell_for(self, lat, lon):
+        lat_cell = int(math.floor(lat / self.cell_degrees))
+        lon_cell = int(math.floor(((lon + 180) % 360) / self.cell_degrees)) % self._lon_cells
+        return lat_cell, lon_cell
+
+    @property
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        return self.ttl_seconds is not None and time.monotonic() - self._built_at > self.ttl_seconds
+
+    def rebuild(self):
+        """Reload every restaurant coordinate with a single column-only query."""
+        rows = db.session.query(
+            Restaurant.id,
+            Restaurant.latitude,
+            Restaurant.longitude,
+            Restaurant.maxDeliveryDistance,
+            Restaurant.flash_deals_available
+        ).all()
+
+        members = {}
+        entries = {}
+        for row in rows:
+            entry = IndexedRestaurant(
+                id=row.id,
+                latitude=float(row.latitude),
+                longitude=float(row.longitude),
+                max_delivery_distance=row.maxDeliveryDistance,
+                flash_deals_available=bool(row.flash_deals_available)
+            )
+            entries[entry.id] = entry
+            members.setdefault(self._cell_for(entry.latitude, entry.longitude), {})[entry.id] = entry
+
+        with self._lock:
+            self._members = members
+            self._arrays = {}
+            self._entries = entries
+            self._built_at = time.monotonic()
+
+    def upsert(self, restaurant):
+        if restaurant.id is None or restaurant.latitude is None or restaurant.longitude is None:
+            return
+        entry = IndexedRestaurant(
+            id=restaurant.id,
+            latitude=float(restaurant.latitude),
+            longitude=float(restaurant.longitude),
+            max_delivery_distance=restaurant.maxDeliveryDistance,
+            flash_deals_available=bool(restaurant.flash_deals_available)
+        )
+        with self._lock:
+            self._discard(entry.id)
+            cell_key = self._cell_for(entry.latitude, entry.longitude)
+            self._entries[entry.id] = entry
+            self._members.setdefault(cell_key, {})[entry.id] = entry
+            self._arrays.pop(cell_key, None)
+
+    def remove(self, restaurant_id):
+        with self._lock:
+            self._discard(restaurant_id)
+
+    def _discard(self, restaurant_id):
+        previous = self._entries.pop(restaurant_id, None)
+        if previous is None:
+            return
+        cell_key = self._cell_for(previous.latitude, previous.longitude)
+        self._arrays.pop(cell_key, None)
+        cell = self._members.get(cell_key)
+        if cell is not None:
+            cell.pop(restaurant_id, None)
+            if not cell:
+                del self._members[cell_key]
+
+    def _cell(self, cell_key):
+        arrays = self._arrays.get(cell_key)
+        if arrays is None:
+            members = self._members.get(cell_key)
+            if not members:
+                return None
+            arrays = _cell_arrays(list(members.values()))
+            self._arrays[cell_key] = arrays
+        return arrays
+
+    def _candidate_cells(self, lat, lon, radius_km):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        min_lat_cell = int(math.floor(min_lat / self.cell_degrees))
+        max_lat_cell = int(math.floor(max_lat / self.cell_degrees))
+
+        if max_lon - min_lon >= 360:
+            lon_cells = range(self._lon_cells)
+        else:
+            first_lon_cell = int(math.floor((min_lon + 180) / self.cell_degrees))
+            last_lon_cell = int(math.floor((max_lon + 180) / self.cell_degrees))
+            lon_cells = {cell % self._lon_cells for cell in range(first_lon_cell, last_lon_cell + 1)}
+
+        for lat_cell in range(min_lat_cell, max_lat_cell + 1):
+            for lon_cell in lon_cells:
+                yield lat_cell, lon_cell
+
+    def query(self, lat, lon, radius_km, flash_deals_only=False):
+        """
+        Return ``(restaurant_id, distance_km)`` pairs within ``radius_km`` of the point,
+        sorted by distance. Restaurants whose ``maxDeliveryDistance`` is shorter than the
+        distance are excluded, matching the proximity search semantics.
+        """
+        if self.is_stale:
+            self.rebuild()
+
+        with self._lock:
+            cells = [self._cell(cell_key) for cell_key in self._candidate_cells(lat, lon, radius_km)]
+        cells = [cell for cell in cells if cell is not None]
+        if not cells:
+            return []
+
+        candidates = CellArrays(*(np.concatenate(column) for column in zip(*cells)))
+        if flash_deals_only:
+            candidates = CellArrays(*(column[candidates.flash] for column in candidates))
+
+        ids, distances = within_radius(
+            lat, lon, radius_km,
+            candidates.ids, candidates.lats, candidates.lons,
+            max_distances=candidates.max_distances
+        )
+        return list(zip(ids.tolist(), distances.tolist()))
+
+    def estimate(self, lat, lon, radius_km):
+        """Upper bound on the hits of ``query``: the restaurants in the overlapping cells."""
+        if self.is_stale:
+            self.rebuild()
+        with self._lock:
+            return sum(len(self._members.get(cell_key, ())) for cell_key in self._candidate_cells(lat, lon, radius_km))
+
+    def query_ids(self, restaurant_ids, lat, lon, radius_km):
+        """
+        Like ``query`` but only for ``restaurant_ids``, so a short list of candidates from
+        another index is checked without scanning every cell of the search circle.
+        """
+        if self.is_stale:
+            self.rebuild()
+        with self._lock:
+            entries = [self._entries[restaurant_id] for restaurant_id in restaurant_ids if restaurant_id in self._entries]
+        if not entries:
+            return []
+
+        candidates = _cell_arrays(entries)
+        ids, distances = within_radius(
+            lat, lon, radius_km,
+            candidates.ids, candidates.lats, candidates.lons,
+            max_distances=candidates.max_distances
+        )
+        return list(zip(ids.tolist(), distances.tolist()))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_restaurant_index():
+    """Return the spatial index bound to the current Flask app, creating it on first use."""
+    index = current_app.extensions.get('restaurant_spatial_index')
+    if index is None:
+        index = RestaurantSpatialIndex(
+            cell_degrees=current_app.config.get('SPATIAL_INDEX_CELL_DEGREES', 0.05),
+            ttl_seconds=current_app.config.get('SPATIAL_INDEX_TTL_SECONDS', 300)
+        )
+        current_app.extensions['restaurant_spatial_index'] = index
+    return index
+
+
+def _loaded_index():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('restaurant_spatial_index')
+
+
+@event.listens_for(Restaurant, 'after_insert')
+@event.listens_for(Restaurant, 'after_update')
+def _sync_restaurant(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.upsert(target)
+
+
+@event.listens_for(Restaurant, 'after_delete')
+def _remove_restaurant(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.remove(target.id)
@@ -0,0 +1,39 @@
+from sqlalchemy import Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class seconds_between(FunctionElement):
+    """
+    Portable ``end - start`` in seconds for two datetime expressions.
+
+    Compiles to ``DATEDIFF`` on SQL Server, ``TIMESTAMPDIFF`` on MySQL and ``julianday``
+    arithmetic on SQLite, so date math can stay inside set-based statements.
+    """
+    type = Float()
+    inherit_cache = True
+    name = 'seconds_between'
+
+
+@compiles(seconds_between)
+def _seconds_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)}))"
+
+
+@compiles(seconds_between, 'mssql')
+def _seconds_between_mssql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"CAST(DATEDIFF(second, {compiler.process(start, **kw)}, {compiler.process(end, **kw)}) AS FLOAT)"
+
+
+@compiles(seconds_between, 'mysql')
+def _seconds_between_mysql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"TIMESTAMPDIFF(SECOND, {compiler.process(start, **kw)}, {compiler.process(end, **kw)})"
+
+
+@compiles(seconds_between, 'sqlite')
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"((julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)})) * 86400.0)"
@@ -0,0 +1,293 @@
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+
+from src.models import db, Restaurant, Listing
+
+# Turkish dotted/dotless I must be handled before lower(), which would otherwise turn
+# 'I' into 'i' and 'İ' into 'i' plus a combining dot
+_TURKISH_CASE = str.maketrans({'İ': 'i', 'I': 'ı'})
+_TURKISH_FOLD = str.maketrans('çğıöşüâîû', 'cgiosuaiu')
+_WORD = re.compile(r'\w+')
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 20
+# A prefix hit ("piz" for "pizza") counts for this share of a whole-word hit
+PREFIX_WEIGHT = 0.5
+
+RESTAURANT_FIELDS = {'name': 3.0, 'category': 2.0, 'description': 1.0}
+LISTING_FIELDS = {'title': 3.0, 'description': 1.0}
+
+SearchResult = namedtuple('SearchResult', ['total', 'hits'])
+
+
+def normalize(text):
+    """Case-fold ``text`` the Turkish way and strip diacritics, so "Şiş Köfte" matches "sis kofte"."""
+    text = text.translate(_TURKISH_CASE).lower().translate(_TURKISH_FOLD)
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return _WORD.findall(normalize(text))
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index over a few weighted text fields.
+
+    Every token is indexed under itself and under its prefixes of ``MIN_PREFIX_LENGTH``
+    characters and up, so typeahead queries are a dictionary lookup per query word.
+    Documents must match every query word; they are ranked by field-weighted term
+    frequency times inverse document frequency.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._words = {}      # word -> {doc_id: weight}
+        self._prefixes = {}   # prefix -> {doc_id: weight}
+        self._documents = {}  # doc_id -> (group, words, prefixes)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def _weights(self, values):
+        words = {}
+        prefixes = {}
+        for field, weight in self.fields.items():
+            for token in tokenize(values.get(field)):
+                words[token] = words.get(token, 0.0) + weight
+                for length in range(MIN_PREFIX_LENGTH, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                    prefix = token[:length]
+                    prefixes[prefix] = max(prefixes.get(prefix, 0.0), weight)
+        return words, prefixes
+
+    def add(self, doc_id, values, group=None):
+        """Index (or re-index) ``doc_id``; ``values`` maps field names to text."""
+        words, prefixes = self._weights(values)
+        with self._lock:
+            self._discard(doc_id)
+            for word, weight in words.items():
+                self._words.setdefault(word, {})[doc_id] = weight
+            for prefix, weight in prefixes.items():
+                self._prefixes.setdefault(prefix, {})[doc_id] = weight
+            self._documents[doc_id] = (group, tuple(words), tuple(prefixes))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._discard(doc_id)
+
+    def _discard(self, doc_id):
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        _, words, prefixes = document
+        for postings, terms in ((self._words, words), (self._prefixes, prefixes)):
+            for term in terms:
+                docs = postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del postings[term]
+
+    def _postings(self, term):
+        """Documents containing ``term`` as a word or a word prefix, with their score for it."""
+        words = self._words.get(term, {})
+        # Terms longer than any indexed prefix can only match whole words
+        prefixes = self._prefixes.get(term, {}) if MIN_PREFIX_LENGTH <= len(term) <= MAX_PREFIX_LENGTH else {}
+        if not prefixes:
+            return dict(words)
+        scores = {doc_id: weight * PREFIX_WEIGHT for doc_id, weight in prefixes.items()}
+        for doc_id, weight in words.items():
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        return scores
+
+    def estimate(self, query):
+        """Upper bound on the number of matches of ``query``, read off the posting list sizes."""
+        terms = tokenize(query)
+        if not terms:
+            return 0
+        with self._lock:
+            return min(
+                len(self._prefixes.get(term, ())) if MIN_PREFIX_LENGTH <= len(term) <= MAX_PREFIX_LENGTH
+                else len(self._words.get(term, ()))
+                for term in terms
+            )
+
+    def scores(self, query, group=None, candidates=None):
+        """
+        Score of every document matching every word of ``query``.
+
+        :param group: Only return documents added with this group
+        :param candidates: Only return documents whose id is in this set
+        :return: dict of doc_id to score
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {}
+
+        with self._lock:
+            postings = sorted((self._postings(term) for term in terms), key=len)
+            total_documents = max(len(self._documents), 1)
+
+            scores = {}
+            for doc_id in postings[0]:
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                if group is not None and self._documents[doc_id][0] != group:
+                    continue
+                scores[doc_id] = 0.0
+            for term_postings in postings:
+                idf = math.log(1 + total_documents / len(term_postings)) if term_postings else 0.0
+                for doc_id in list(scores):
+                    weight = term_postings.get(doc_id)
+                    if weight is None:
+                        del scores[doc_id]
+                    else:
+                        scores[doc_id] += weight * idf
+        return scores
+
+    def search(self, query, group=None, limit=20, offset=0, candidates=None):
+        """
+        Ranked documents matching every word of ``query``; see ``scores`` for the filters.
+
+        :return: ``SearchResult`` with the total number of matches and the
+                 ``(doc_id, score)`` pairs of the requested page, best first
+        """
+        scores = self.scores(query, group=group, candidates=candidates)
+        top = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return SearchResult(len(scores), top[offset:])
+
+
+def _restaurant_values(restaurant):
+    return {
+        'name': restaurant.restaurantName,
+        'category': restaurant.category,
+        'description': restaurant.restaurantDescription
+    }
+
+
+def _listing_values(listing):
+    return {'title': listing.title, 'description': listing.description}
+
+
+class CatalogSearchIndex:
+    """
+    Text indexes over restaurants and listings (grouped by restaurant).
+
+    Built with two column-only queries, kept current by mapper events in this process
+    and rebuilt after ``ttl_seconds`` to pick up changes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds=600):
+        self.ttl_seconds = ttl_seconds
+        self.restaurants = InvertedIndex(RESTAURANT_FIELDS)
+        self.listings = InvertedIndex(LISTING_FIELDS)
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        return self.ttl_seconds is not None and time.monotonic() - self._built_at > self.ttl_seconds
+
+    def rebuild(self):
+        restaurants = InvertedIndex(RESTAURANT_FIELDS)
+        for row in db.session.query(
+                Restaurant.id, Restaurant.restaurantName, Restaurant.category, Restaurant.restaurantDescription
+        ):
+            restaurants.add(row.id, _restaurant_values(row))
+
+        listings = InvertedIndex(LISTING_FIELDS)
+        for row in db.session.query(Listing.id, Listing.restaurant_id, Listing.title, Listing.description):
+            listings.add(row.id, _listing_values(row), group=row.restaurant_id)
+
+        with self._lock:
+            self.restaurants = restaurants
+            self.listings = listings
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.is_stale:
+            self.rebuild()
+        return self
+
+
+def get_search_index():
+    """Return the search index bound to the current Flask app, building it when stale."""
+    index = current_app.extensions.get('catalog_search_index')
+    if index is None:
+        index = CatalogSearchIndex(ttl_seconds=current_app.config.get('SEARCH_INDEX_TTL_SECONDS', 600))
+        current_app.extensions['catalog_search_index'] = index
+    return index.ensure_fresh()
+
+
+def _loaded_index():
+    if not has_app_context():
+        return None
+    index = current_app.extensions.get('catalog_search_index')
+    if index is None or index._built_at is None:
+        return None
+    return index
+
+
+def _text_changed(target, *attributes):
+    state = inspect(target)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+@event.listens_for(Restaurant, 'after_insert')
+def _index_new_restaurant(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.restaurants.add(target.id, _restaurant_values(target))
+
+
+@event.listens_for(Restaurant, 'after_update')
+def _reindex_restaurant(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None and _text_changed(target, 'restaurantName', 'category', 'restaurantDescription'):
+        index.restaurants.add(target.id, _restaurant_values(target))
+
+
+@event.listens_for(Restaurant, 'after_delete')
+def _unindex_restaurant(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.restaurants.remove(target.id)
+
+
+@event.listens_for(Listing, 'after_insert')
+def _index_new_listing(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.listings.add(target.id, _listing_values(target), group=target.restaurant_id)
+
+
+@event.listens_for(Listing, 'after_update')
+def _reindex_listing(mapper, connection, target):
+    # Stock and freshness updates are frequent and leave the text alone
+    index = _loaded_index()
+    if index is not None and _text_changed(target, 'title', 'description', 'restaurant_id'):
+        index.listings.add(target.id, _listing_values(target), group=target.restaurant_id)
+
+
+@event.listens_for(Listing, 'after_delete')
+def _unindex_listing(mapper, connection, target):
+    index = _loaded_index()
+    if index is not None:
+        index.listings.remove(target.id)
@@ -77,17 +77,6 @@ class TestListingModel(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.create_listing(consume_within=2)
 
-    def test_decrease_stock(self):
-        listing = self.create_listing(count=4)
-        db.session.add(listing)
-        db.session.commit()
-        result = listing.decrease_stock(3)
-        self.assertTrue(result)
-        self.assertEqual(listing.count, 1)
-        result = listing.decrease_stock(2)
-        self.assertFalse(result)
-        self.assertEqual(listing.count, 1)
-
     def test_is_expired(self):
         listing = self.create_listing()
         listing.expires_at = datetime.now(UTC) - timedelta(hours=1)
@@ -102,5 +91,41 @@ class TestListingModel(unittest.TestCase):
         self.assertTrue(success)
         self.assertIsNone(Listing.query.get(listing_id))
 
+    def test_freshness_is_computed_from_timestamps(self):
+        now = datetime.now(UTC)
+        listing = self.create_listing(consume_within=48)
+        listing.created_at = now - timedelta(hours=40)
+        listing.expires_at = now + timedelta(hours=8)
+
+        freshness = listing.freshness(now)
+
+        self.assertAlmostEqual(freshness.fresh_score, 100 * 8 / 48)
+        self.assertEqual(freshness.consume_within, 8)
+        self.assertEqual(freshness.consume_within_type, 'HOURS')
+        self.assertEqual(freshness.update_count, 20)
+        self.assertEqual(listing.to_dict()["consume_within_type"], 'HOURS')
+
+    def test_freshness_sql_expression_matches_python(self):
+        now = datetime.now(UTC)
+        for hours_left in (8, 30, 100):
+            listing = self.create_listing(consume_within=120)
+            listing.created_at = now - timedelta(hours=120 - hours_left)
+            listing.expires_at = now + timedelta(hours=hours_left)
+            db.session.add(listing)
+        db.session.commit()
+
+        rows = db.session.query(
+            Listing.id,
+            Listing.current_fresh_score,
+            Listing.current_consume_within,
+            Listing.current_consume_within_type
+        ).all()
+
+        for listing_id, fresh_score, consume_within, consume_within_type in rows:
+            expected = db.session.get(Listing, listing_id).freshness()
+            self.assertAlmostEqual(fresh_score, expected.fresh_score, places=2)
+            self.assertEqual(int(consume_within), expected.consume_within)
+            self.assertEqual(consume_within_type, expected.consume_within_type)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,9 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from datetime import datetime, UTC
 from decimal import Decimal
 from flask import Flask
-from src.models import db, Restaurant, Purchase, PurchaseStatus, RestaurantComment
+from src.models import db, User, Restaurant, Purchase, PurchaseStatus, RestaurantComment, CommentBadge
 from src.services.analytics_service import RestaurantAnalyticsService
 
 
@@ -19,6 +19,28 @@ class TestRestaurantAnalyticsService(unittest.TestCase):
         self.app_context.push()
         db.create_all()
 
+    def add_sale_and_comment(self):
+        db.session.add(User(name="Test User", email="user@test.com", phone_number="+905550000001", password="x"))
+        db.session.add(Restaurant(owner_id=1, restaurantName="Test Restaurant", category="Bakery",
+                                  latitude=Decimal('41'), longitude=Decimal('29'), rating=Decimal('4.5'),
+                                  ratingCount=10))
+        db.session.flush()
+        purchase = Purchase(user_id=1, restaurant_id=1, quantity=2, total_price=Decimal('25.00'),
+                            status=PurchaseStatus.COMPLETED, delivery_district="Test District",
+                            purchase_date=datetime(2025, 5, 10, 12, 0))
+        # Completed last month, so it must not count
+        db.session.add(Purchase(user_id=1, restaurant_id=1, quantity=7, total_price=Decimal('70.00'),
+                                status=PurchaseStatus.COMPLETED, delivery_district="Test District",
+                                purchase_date=datetime(2025, 4, 30, 23, 0)))
+        db.session.add(purchase)
+        db.session.flush()
+        comment = RestaurantComment(restaurant_id=1, user_id=1, purchase_id=purchase.id, comment="Great food!",
+                                    rating=Decimal('4.5'), timestamp=datetime(2025, 5, 15, 11, 19, 48))
+        db.session.add(comment)
+        db.session.flush()
+        db.session.add(CommentBadge(comment_id=comment.id, badge_name="fresh", is_positive=True))
+        db.session.commit()
+
     def tearDown(self):
         db.session.remove()
         db.drop_all()
@@ -37,34 +59,10 @@ class TestRestaurantAnalyticsService(unittest.TestCase):
     def test_get_owner_analytics_with_data(self):
         test_date = datetime(2025, 5, 15, 11, 19, 48, tzinfo=UTC)
 
-        with patch('src.services.analytics_service.Restaurant.query') as mock_restaurant_query, \
-                patch('src.services.analytics_service.Purchase.query') as mock_purchase_query, \
-                patch('src.services.analytics_service.RestaurantComment.query') as mock_comment_query, \
-                patch('src.services.analytics_service.datetime') as mock_datetime:
-            mock_datetime.utcnow.return_value = test_date
-
-            mock_restaurant = MagicMock()
-            mock_restaurant.id = 1
-            mock_restaurant.restaurantName = "Test Restaurant"
-            mock_restaurant.rating = 4.5
-            mock_restaurant.ratingCount = 10
-
-            mock_restaurant_query.filter_by.return_value.all.return_value = [mock_restaurant]
+        self.add_sale_and_comment()
 
-            mock_purchase = MagicMock()
-            mock_purchase.quantity = 2
-            mock_purchase.total_price = "25.00"
-            mock_purchase.delivery_district = "Test District"
-
-            mock_purchase_query.filter.return_value.all.return_value = [mock_purchase]
-
-            mock_comment = MagicMock()
-            mock_comment.user.name = "Test User"
-            mock_comment.rating = 4.5
-            mock_comment.comment = "Great food!"
-            mock_comment.timestamp = "2025-05-15T11:19:48+00:00"
-
-            mock_comment_query.filter_by.return_value.order_by.return_value.all.return_value = [mock_comment]
+        with patch('src.services.analytics_service.datetime') as mock_datetime:
+            mock_datetime.utcnow.return_value = test_date
 
             response, status = RestaurantAnalyticsService.get_owner_analytics(1)
 
@@ -89,35 +87,10 @@ class TestRestaurantAnalyticsService(unittest.TestCase):
     def test_get_restaurant_analytics_with_data(self):
         test_date = datetime(2025, 5, 15, 11, 19, 48, tzinfo=UTC)
 
-        with patch('src.services.analytics_service.Restaurant.query') as mock_restaurant_query, \
-                patch('src.services.analytics_service.Purchase.query') as mock_purchase_query, \
-                patch('src.services.analytics_service.RestaurantComment.query') as mock_comment_query, \
-                patch('src.services.analytics_service.datetime') as mock_datetime:
-            mock_datetime.utcnow.return_value = test_date
-
-            mock_restaurant = MagicMock()
-            mock_restaurant.id = 1
-            mock_restaurant.restaurantName = "Test Restaurant"
-            mock_restaurant.rating = 4.5
-            mock_restaurant.ratingCount = 10
-
-            mock_restaurant_query.get.return_value = mock_restaurant
-
-            mock_purchase = MagicMock()
-            mock_purchase.quantity = 2
-            mock_purchase.total_price = "25.00"
-            mock_purchase.delivery_district = "Test District"
+        self.add_sale_and_comment()
 
-            mock_purchase_query.filter.return_value.all.return_value = [mock_purchase]
-
-            mock_comment = MagicMock()
-            mock_comment.user.name = "Test User"
-            mock_comment.rating = 4.5
-            mock_comment.comment = "Great food!"
-            mock_comment.timestamp = "2025-05-15T11:19:48+00:00"
-            mock_comment.badges = []
-
-            mock_comment_query.filter_by.return_value.order_by.return_value.all.return_value = [mock_comment]
+        with patch('src.services.analytics_service.datetime') as mock_datetime:
+            mock_datetime.utcnow.return_value = test_date
 
             response, status = RestaurantAnalyticsService.get_restaurant_analytics(1)
 
@@ -129,6 +102,8 @@ class TestRestaurantAnalyticsService(unittest.TestCase):
             self.assertEqual(response['data']['regional_distribution']["Test District"], 1)
             self.assertEqual(response['data']['restaurant_stats']["average_rating"], 4.5)
             self.assertEqual(response['data']['restaurant_stats']["recent_comments"][0]["user_name"], "Test User")
+            self.assertEqual(response['data']['restaurant_stats']["recent_comments"][0]["badges"],
+                             [{"name": "fresh", "is_positive": True}])
 
 
 if __name__ == '__main__':
@@ -2,7 +2,8 @@
 
 import unittest
 from decimal import Decimal
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import event, text
 from flask import Flask
 from werkzeug.security import generate_password_hash
 from src.models import db, User, Restaurant, Listing, UserCart
@@ -219,4 +220,86 @@ class TestCartService(unittest.TestCase):
 
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
+
+class TestCartDataLayer(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['CART_CACHE_SECONDS'] = 60
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add(User(name="Customer", email="customer@test.com", phone_number="+1234567890",
+                            password="x"))
+        for name in ("Restaurant 1", "Restaurant 2"):
+            db.session.add(Restaurant(owner_id=1, restaurantName=name, category="Bakery",
+                                      latitude=Decimal('41'), longitude=Decimal('29')))
+        for restaurant_id, title in ((1, "Simit"), (1, "Pogaca"), (2, "Baklava")):
+            db.session.add(Listing(restaurant_id=restaurant_id, title=title, original_price=Decimal('10'),
+                                   count=5, consume_within=12, expires_at=datetime.now(UTC) + timedelta(hours=12)))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_statements(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        return statements
+
+    def test_adding_again_increments_the_same_row(self):
+        self.assertEqual(add_to_cart_service(1, 1, 2)[1], 201)
+        self.assertEqual(add_to_cart_service(1, 1, 3)[1], 201)
+
+        self.assertEqual([(item.listing_id, item.count) for item in UserCart.query.all()], [(1, 5)])
+        response, status = add_to_cart_service(1, 1, 1)
+        self.assertEqual(status, 400)
+        self.assertIn("Requested: 6, Available: 5", response["message"])
+        self.assertIn("different restaurant", add_to_cart_service(1, 3, 1)[0]["message"])
+
+    def test_operations_take_two_round_trips(self):
+        add_to_cart_service(1, 1, 1)
+        statements = self.count_statements()
+
+        add_to_cart_service(1, 2, 1)
+        update_cart_item_service(1, 2, 3)
+        remove_from_cart_service(1, 2)
+        reset_cart_service(1)
+
+        queries = [s for s in statements if s.lstrip().split()[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')]
+        # add: state + upsert, update: state + upsert, remove: delete, reset: delete
+        self.assertEqual(len(queries), 6, queries)
+
+    def test_cart_snapshot_is_cached_until_a_write(self):
+        add_to_cart_service(1, 1, 2)
+        cart, _ = get_cart_items_service(1)
+        self.assertEqual([(item["title"], item["count"]) for item in cart], [("Simit", 2)])
+
+        statements = self.count_statements()
+        self.assertEqual(get_cart_items_service(1)[0], cart)
+        self.assertEqual(statements, [])
+
+        update_cart_item_service(1, 1, 4)
+        cart, _ = get_cart_items_service(1)
+        self.assertEqual(cart[0]["count"], 4)
+
+    def test_existing_table_gets_deduplicated_and_indexed(self):
+        db.session.execute(text(f"DROP INDEX {UserCart.UNIQUE_INDEX}"))
+        for count in (1, 2, 3):
+            db.session.add(UserCart(user_id=1, restaurant_id=1, listing_id=1, count=count))
+        db.session.add(UserCart(user_id=1, restaurant_id=1, listing_id=2, count=1))
+        db.session.commit()
+
+        self.assertEqual(UserCart.ensure_unique_index(), 2)
+        self.assertEqual(sorted((item.listing_id, item.count) for item in UserCart.query.all()), [(1, 6), (2, 1)])
+        self.assertIsNone(UserCart.ensure_unique_index())
+
+        update_cart_item_service(1, 1, 4)
+        self.assertEqual(sorted((item.listing_id, item.count) for item in UserCart.query.all()), [(1, 4), (2, 1)])
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from src.services.communication import email_service
+from src.services.communication.email_service import (
+    AzureEmailTransport,
+    EmailQueue,
+    InMemoryEmailTransport,
+    build_email,
+    logo_attachment
+)
+
+
+class TestEmailService(unittest.TestCase):
+    def test_logo_is_encoded_once(self):
+        logo_attachment.cache_clear()
+        with patch('builtins.open', wraps=open) as mock_open:
+            first = build_email("a@example.com", "Subject", "123456")
+            second = build_email("b@example.com", "Subject", "654321")
+
+        self.assertEqual(mock_open.call_count, 1)
+        self.assertIs(first["attachments"][0], second["attachments"][0])
+        self.assertIn("654321", second["content"]["html"])
+
+    def test_queue_sends_everything_in_batches(self):
+        transport = InMemoryEmailTransport()
+        queue = EmailQueue(transport, batch_size=20)
+        for index in range(45):
+            queue.submit(build_email(f"user{index}@example.com", "Subject", "123456"))
+
+        self.assertTrue(queue.flush(timeout=5))
+        queue.stop()
+        self.assertEqual(len(transport.sent), 45)
+        self.assertGreaterEqual(transport.batches, 3)
+        self.assertEqual(queue.sent, 45)
+
+    def test_failed_messages_are_retried(self):
+        transport = InMemoryEmailTransport(fail_every=3)
+        queue = EmailQueue(transport, batch_size=5, retry_base_seconds=0.01)
+        for index in range(10):
+            queue.submit(build_email(f"user{index}@example.com", "Subject", "123456"))
+
+        self.assertTrue(queue.flush(timeout=5))
+        queue.stop()
+        self.assertEqual(len({message["recipients"]["to"][0]["address"] for message in transport.sent}), 10)
+        self.assertEqual(queue.failed, 0)
+
+    def test_queue_gives_up_after_max_attempts(self):
+        transport = InMemoryEmailTransport(fail_every=1)
+        queue = EmailQueue(transport, max_attempts=3, retry_base_seconds=0.01)
+        queue.submit(build_email("a@example.com", "Subject", "123456"))
+
+        self.assertTrue(queue.flush(timeout=5))
+        queue.stop()
+        self.assertEqual((queue.sent, queue.failed), (0, 1))
+        self.assertEqual(transport.batches, 3)
+
+    @patch('src.services.communication.email_service.EmailClient')
+    def test_azure_batch_overlaps_round_trips(self, mock_client_class):
+        calls = []
+        client = mock_client_class.from_connection_string.return_value
+
+        def begin_send(message):
+            calls.append(("send", message["recipients"]["to"][0]["address"]))
+            poller = MagicMock()
+            poller.result.side_effect = lambda: calls.append(("result",)) or {"id": "1"}
+            return poller
+
+        client.begin_send.side_effect = begin_send
+        transport = AzureEmailTransport("endpoint=https://example.com/;accesskey=key")
+
+        errors = transport.send_batch([build_email(f"{name}@example.com", "Subject", "1") for name in "abc"])
+
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual([call[0] for call in calls], ["send"] * 3 + ["result"] * 3)
+        mock_client_class.from_connection_string.assert_called_once()
+
+    def test_missing_connection_string_fails_unless_memory_is_chosen(self):
+        with patch.dict('os.environ', {"EMAIL_TRANSPORT": "", "EMAIL_CONNECTION_STRING": ""}):
+            with self.assertRaises(ValueError):
+                email_service.create_transport()
+        with patch.dict('os.environ', {"EMAIL_TRANSPORT": "memory", "EMAIL_CONNECTION_STRING": ""}):
+            self.assertIsInstance(email_service.create_transport(), InMemoryEmailTransport)
+
+    def test_send_email_only_queues(self):
+        queue = MagicMock()
+        with patch.object(email_service, 'get_email_queue', return_value=queue):
+            email_service.send_email("a@example.com", "Subject", "123456")
+
+        queue.submit.assert_called_once()
+        self.assertEqual(queue.submit.call_args.args[0]["recipients"]["to"][0]["address"], "a@example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
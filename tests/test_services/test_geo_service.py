@@ -0,0 +1,88 @@
+import unittest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+from src.models import db, Restaurant, User, CustomerAddress
+from src.services.geo_service import find_restaurants_near, find_primary_addresses_near
+from src.utils.geo import bounding_box, haversine_km
+
+
+class TestGeoService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['SPATIAL_INDEX_ENABLED'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.users = []
+        for i in range(3):
+            user = User(
+                name=f"User {i}",
+                email=f"user{i}@test.com",
+                phone_number=f"+123456789{i}",
+                password=generate_password_hash("password"),
+                role="customer",
+                email_verified=True
+            )
+            db.session.add(user)
+            self.users.append(user)
+        db.session.commit()
+
+        self.near = Restaurant(
+            owner_id=self.users[0].id, restaurantName="Near", longitude=29.025, latitude=40.990,
+            category="Test", workingDays="Monday", workingHoursStart="09:00", workingHoursEnd="18:00",
+            flash_deals_available=True
+        )
+        self.far = Restaurant(
+            owner_id=self.users[0].id, restaurantName="Far", longitude=32.866, latitude=39.925,
+            category="Test", workingDays="Monday", workingHoursStart="09:00", workingHoursEnd="18:00"
+        )
+        db.session.add_all([self.near, self.far])
+
+        addresses = [
+            (self.users[0].id, 40.991, 29.026, True),
+            (self.users[1].id, 40.991, 29.026, False),
+            (self.users[2].id, 39.925, 32.866, True),
+        ]
+        for user_id, lat, lon, is_primary in addresses:
+            db.session.add(CustomerAddress(
+                user_id=user_id, title="Home", latitude=lat, longitude=lon, is_primary=is_primary
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_bounding_box_contains_search_circle(self):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(41.0, 29.0, 10)
+
+        self.assertGreaterEqual(haversine_km(41.0, 29.0, max_lat, 29.0), 10)
+        self.assertGreaterEqual(haversine_km(41.0, 29.0, min_lat, 29.0), 10)
+        self.assertLess(haversine_km(41.0, 29.0, max_lat, 29.0), 10.001)
+        self.assertGreaterEqual(haversine_km(41.0, 29.0, 41.0, max_lon), 10)
+        self.assertLess(min_lon, 29.0)
+
+    def test_bounding_box_at_pole_covers_all_longitudes(self):
+        self.assertEqual(bounding_box(89.99, 0, 50)[2:], (-180.0, 180.0))
+
+    def test_find_restaurants_near_with_sql_prefilter(self):
+        hits = find_restaurants_near(40.991, 29.026, 10)
+        self.assertEqual([restaurant_id for restaurant_id, _ in hits], [self.near.id])
+
+        hits = find_restaurants_near(39.9, 32.8, 30, flash_deals_only=True)
+        self.assertEqual(hits, [])
+
+    def test_find_primary_addresses_near(self):
+        hits = find_primary_addresses_near(40.990, 29.025, 5)
+
+        self.assertEqual([user_id for user_id, _ in hits], [self.users[0].id])
+
+
+if __name__ == '__main__':
+    unittest.main()
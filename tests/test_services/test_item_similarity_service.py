@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from flask import Flask
+from src.models import db, Purchase, Listing, Restaurant, PurchaseStatus, ItemSimilarity
+from src.services.item_similarity_service import ItemSimilarityStore, changed_rows, get_similarity_store
+from src.services.recommendation_system_service import (
+    RecommendationSystemService,
+    RestaurantRecommendationSystemService,
+    get_model_cache,
+    record_completed_purchase,
+    refresh_item_similarities
+)
+
+
+class TestItemSimilarityService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for restaurant_id in (1, 2):
+            db.session.add(Restaurant(
+                id=restaurant_id, owner_id=1, restaurantName=f"Restaurant {restaurant_id}",
+                category="Test", longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+            ))
+        for listing_id in range(1, 7):
+            db.session.add(Listing(
+                id=listing_id, restaurant_id=1 if listing_id <= 3 else 2, title=f"Listing {listing_id}",
+                original_price=Decimal('20.00'), consume_within=12,
+                expires_at=datetime.now(UTC) + timedelta(hours=12)
+            ))
+        # Listings 1-3 share buyers; listings 4-5 share buyers; listing 6 is bought alone
+        for user_id, listing_id in [(1, 1), (1, 2), (2, 1), (2, 2), (2, 3), (3, 4), (3, 5), (4, 6)]:
+            self.add_purchase(user_id, listing_id)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_purchase(self, user_id, listing_id, quantity=1):
+        purchase = Purchase(
+            user_id=user_id, listing_id=listing_id, restaurant_id=1 if listing_id <= 3 else 2,
+            quantity=quantity, total_price=Decimal('10.00'), status=PurchaseStatus.COMPLETED
+        )
+        db.session.add(purchase)
+        return purchase
+
+    def test_refresh_stores_top_k_in_table_and_memory(self):
+        refresh_item_similarities()
+        store = get_similarity_store('listing')
+
+        self.assertEqual([item_id for item_id, _ in store.similar(1)], [2, 3])
+        self.assertEqual(store.similar(6), [])
+        stored = ItemSimilarity.query.filter_by(kind='listing', item_id=1).order_by(ItemSimilarity.rank).all()
+        self.assertEqual([row.similar_item_id for row in stored], [2, 3])
+
+    def test_persisted_rows_are_loaded_by_a_fresh_store(self):
+        refresh_item_similarities()
+        expected = get_similarity_store('listing').similar(4)
+
+        loaded = ItemSimilarityStore('listing', 10)
+
+        self.assertEqual([item_id for item_id, _ in loaded.similar(4)], [item_id for item_id, _ in expected])
+        self.assertAlmostEqual(loaded.similar(4)[0][1], expected[0][1], places=5)
+
+    def test_partial_refresh_only_recomputes_affected_items(self):
+        refresh_item_similarities()
+        cache = get_model_cache('listing')
+        before = cache.get()
+
+        purchase = self.add_purchase(3, 6)
+        db.session.commit()
+        record_completed_purchase(purchase)
+        after = cache.get()
+
+        rows = changed_rows(before, after)
+        affected = sorted(after.item_ids[row] for row in rows)
+        # Listing 6 changed; 4 and 5 share user 3 with it. Listings 1-3 are untouched.
+        self.assertEqual(affected, [4, 5, 6])
+        self.assertEqual(get_similarity_store('listing').refresh(after), 3)
+        self.assertIn(6, [item_id for item_id, _ in get_similarity_store('listing').similar(4)])
+        self.assertEqual(ItemSimilarity.query.filter_by(kind='listing', item_id=6).count(), 2)
+
+    def test_refresh_without_changes_is_a_no_op(self):
+        refresh_item_similarities()
+        snapshot = get_model_cache('listing').get()
+
+        self.assertEqual(get_similarity_store('listing').refresh(snapshot), 0)
+
+    def test_listing_recommendations_read_precomputed_neighbors(self):
+        response, status = RecommendationSystemService.get_recommendations_for_listing(4)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response["data"], [5])
+        self.assertGreater(ItemSimilarity.query.count(), 0)
+
+    def test_user_recommendations_aggregate_neighbors_of_all_restaurants(self):
+        db.session.add(Restaurant(
+            id=3, owner_id=1, restaurantName="Restaurant 3",
+            category="Test", longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+        ))
+        db.session.add(Listing(
+            id=7, restaurant_id=3, title="Listing 7", original_price=Decimal('20.00'), consume_within=12,
+            expires_at=datetime.now(UTC) + timedelta(hours=12)
+        ))
+        for user_id, listing_id in [(1, 4), (1, 7), (5, 7)]:
+            self.add_purchase(user_id, listing_id)
+        db.session.commit()
+
+        response, status = RestaurantRecommendationSystemService.get_recommendations_by_user(2)
+
+        self.assertEqual(status, 200)
+        # Restaurant 3 shares half its buyers with restaurant 1, restaurant 2 only a third
+        self.assertEqual(response["data"], [3, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
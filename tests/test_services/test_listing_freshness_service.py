@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from flask import Flask
+from src.models import db, Restaurant, Listing, Purchase, PurchaseStatus, UserCart
+from src.services.listing_freshness_service import expire_listings, update_all_listings
+
+
+class TestListingFreshnessService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.now = datetime.now(UTC)
+        db.session.add(Restaurant(
+            id=1, owner_id=1, restaurantName="Test Restaurant", category="Test",
+            longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+        ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_listing(self, hours_left, lifetime_hours=48, fresh_score=100.0):
+        listing = Listing(
+            restaurant_id=1, title="Listing", original_price=Decimal('20.00'), count=3,
+            consume_within=lifetime_hours, consume_within_type='HOURS',
+            created_at=self.now - timedelta(hours=lifetime_hours - hours_left),
+            expires_at=self.now + timedelta(hours=hours_left),
+            fresh_score=fresh_score, update_count=0
+        )
+        db.session.add(listing)
+        db.session.commit()
+        return listing.id
+
+    def add_purchase(self, listing_id, status):
+        purchase = Purchase(
+            user_id=1, listing_id=listing_id, restaurant_id=1, quantity=1,
+            total_price=Decimal('10.00'), status=status
+        )
+        db.session.add(purchase)
+        db.session.commit()
+        return purchase.id
+
+    def test_expire_removes_listings_and_rejects_pending_purchases(self):
+        expiring_id = self.add_listing(5)
+        live_id = self.add_listing(20)
+        pending_id = self.add_purchase(expiring_id, PurchaseStatus.PENDING)
+        accepted_id = self.add_purchase(expiring_id, PurchaseStatus.ACCEPTED)
+        db.session.add(UserCart(user_id=1, listing_id=expiring_id, restaurant_id=1, count=1))
+        db.session.commit()
+
+        expired, rejected = expire_listings(self.now, chunk_size=1)
+        db.session.expire_all()
+
+        self.assertEqual((expired, rejected), (1, 1))
+        self.assertIsNone(db.session.get(Listing, expiring_id))
+        self.assertIsNotNone(db.session.get(Listing, live_id))
+        self.assertEqual(db.session.get(Purchase, pending_id).status, PurchaseStatus.REJECTED)
+        self.assertEqual(db.session.get(Purchase, accepted_id).status, PurchaseStatus.ACCEPTED)
+        self.assertIsNone(db.session.get(Purchase, pending_id).listing_id)
+        self.assertEqual(UserCart.query.count(), 0)
+
+    def test_update_all_listings_reports_metrics(self):
+        self.add_listing(5)
+        self.add_listing(20)
+        self.add_listing(-1)
+
+        metrics = update_all_listings(self.now)
+
+        self.assertEqual(metrics["expired_listings"], 1)
+        self.assertEqual(Listing.query.count(), 2)
+        self.assertIn("total_ms", metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import json
+import unittest
+from datetime import datetime, timedelta, UTC
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from decimal import Decimal
+from src.models import db, UserDevice, NotificationOutbox, Restaurant, CustomerAddress
+from src.services import notification_outbox_service as outbox
+from src.services.restaurant_punishment_service import RestaurantPunishmentService
+
+
+def expo_response(status_code=200, tickets=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = ""
+    response.json.return_value = {"data": tickets}
+    return response
+
+
+def ok_tickets(*args, **kwargs):
+    return expo_response(tickets=[{"status": "ok", "id": f"ticket-{i}"} for i in range(len(kwargs['json']))])
+
+
+class TestNotificationOutboxService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.session = MagicMock()
+        patcher = patch.object(outbox, '_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_device(self, user_id, token):
+        db.session.add(UserDevice(user_id=user_id, push_token=token, device_type='ios', platform='17', is_active=True))
+
+    def test_notification_is_committed_with_the_caller_transaction(self):
+        outbox.enqueue_notification(1, "Kept", "Body")
+        db.session.commit()
+        outbox.enqueue_notification(1, "Dropped", "Body")
+        db.session.rollback()
+
+        self.assertEqual([row.title for row in NotificationOutbox.query.all()], ["Kept"])
+        self.session.post.assert_not_called()
+
+    def test_punishment_queues_notification_without_push_io(self):
+        db.session.add(Restaurant(id=1, owner_id=7, restaurantName="Test", category="Test",
+                                  longitude=28.979530, latitude=41.015137))
+        db.session.commit()
+
+        with patch('requests.post') as mock_post:
+            _, status = RestaurantPunishmentService.issue_punishment(1, {'duration_type': 'THREE_DAYS', 'reason': 'x'}, 1)
+
+        self.assertEqual(status, 201)
+        mock_post.assert_not_called()
+        row = NotificationOutbox.query.one()
+        self.assertEqual((row.user_id, row.status), (7, NotificationOutbox.PENDING))
+
+    def test_batch_is_sent_in_chunks_of_one_hundred(self):
+        for user_id in range(1, 151):
+            self.add_device(user_id, f"token-{user_id}")
+            outbox.enqueue_notification(user_id, "Title", "Body", {"type": "test"})
+        db.session.commit()
+        self.session.post.side_effect = ok_tickets
+
+        processed = outbox.dispatch_pending('worker', batch_size=200)
+
+        self.assertEqual(processed, 150)
+        sizes = [len(call.kwargs['json']) for call in self.session.post.call_args_list]
+        self.assertEqual(sizes, [100, 50])
+        self.assertEqual(self.session.post.call_args_list[0].kwargs['json'][0]['to'], "ExponentPushToken[token-1]")
+        statuses = {row.status for row in NotificationOutbox.query.all()}
+        self.assertEqual(statuses, {NotificationOutbox.SENT})
+
+    def test_server_errors_are_retried_with_backoff(self):
+        self.add_device(1, "token-1")
+        outbox.enqueue_notification(1, "Title", "Body")
+        db.session.commit()
+        self.session.post.return_value = expo_response(status_code=503)
+        now = datetime.now(UTC)
+
+        outbox.dispatch_pending('worker', now=now)
+        row = NotificationOutbox.query.one()
+        self.assertEqual((row.status, row.attempts), (NotificationOutbox.PENDING, 1))
+        self.assertEqual(row.next_attempt_at.replace(tzinfo=UTC), now + timedelta(seconds=outbox.RETRY_BASE_SECONDS))
+        # Not due yet
+        self.assertEqual(outbox.dispatch_pending('worker', now=now), 0)
+
+        for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+            now += timedelta(seconds=outbox.RETRY_MAX_SECONDS)
+            outbox.dispatch_pending('worker', now=now)
+        db.session.refresh(row)
+        self.assertEqual((row.status, row.attempts), (NotificationOutbox.FAILED, outbox.MAX_ATTEMPTS))
+
+    def test_claimed_rows_are_not_taken_by_another_worker(self):
+        outbox.enqueue_notification(1, "Title", "Body")
+        db.session.commit()
+
+        self.assertEqual(len(outbox.claim_batch('worker-1')), 1)
+        self.assertEqual(outbox.claim_batch('worker-2'), [])
+        later = datetime.now(UTC) + timedelta(seconds=outbox.CLAIM_SECONDS + 1)
+        self.assertEqual(len(outbox.claim_batch('worker-2', now=later)), 1)
+
+    def test_dead_tokens_are_deactivated_from_tickets_and_receipts(self):
+        self.add_device(1, "dead-on-send")
+        self.add_device(1, "dead-later")
+        outbox.enqueue_notification(1, "Title", "Body")
+        db.session.commit()
+        self.session.post.return_value = expo_response(tickets=[
+            {"status": "error", "message": "gone", "details": {"error": "DeviceNotRegistered"}},
+            {"status": "ok", "id": "ticket-1"},
+        ])
+
+        outbox.dispatch_pending('worker')
+        row = NotificationOutbox.query.one()
+        self.assertEqual(json.loads(row.tickets), {"ticket-1": "dead-later"})
+        self.assertFalse(UserDevice.query.filter_by(push_token="dead-on-send").one().is_active)
+
+        self.session.post.reset_mock()
+        self.session.post.return_value = MagicMock(status_code=200, json=MagicMock(return_value={"data": {
+            "ticket-1": {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+        }}))
+        # Receipts are only fetched once Expo has had time to produce them
+        self.assertEqual(outbox.check_receipts(), 0)
+        later = datetime.now(UTC) + timedelta(minutes=outbox.RECEIPT_DELAY_MINUTES + 1)
+        self.assertEqual(outbox.check_receipts(now=later), 1)
+
+        self.assertEqual(self.session.post.call_args.kwargs['json'], {"ids": ["ticket-1"]})
+        self.assertFalse(UserDevice.query.filter_by(push_token="dead-later").one().is_active)
+        self.assertTrue(db.session.get(NotificationOutbox, row.id).receipts_checked)
+
+    def add_nearby_users(self, count):
+        for user_id in range(1, count + 1):
+            db.session.add(CustomerAddress(user_id=user_id, title="Home", latitude=Decimal('41.015200'),
+                                           longitude=Decimal('28.979600'), is_primary=True))
+            self.add_device(user_id, f"token-{user_id}")
+        # Far outside the 5 km radius
+        db.session.add(CustomerAddress(user_id=999, title="Home", latitude=Decimal('39.925533'),
+                                       longitude=Decimal('32.866287'), is_primary=True))
+        self.add_device(999, "token-far")
+
+    def test_nearby_announcement_fans_out_in_multi_recipient_chunks(self):
+        self.add_nearby_users(250)
+        outbox.enqueue_nearby_notification(41.015137, 28.979530, 5.0, "New", "Body", {"restaurant_id": 1})
+        db.session.commit()
+        self.session.post.side_effect = lambda *args, **kwargs: expo_response(
+            tickets=[{"status": "ok", "id": token} for token in kwargs['json'][0]['to']]
+        )
+
+        outbox.dispatch_pending('worker')
+
+        requests_sent = [call.kwargs['json'] for call in self.session.post.call_args_list]
+        self.assertEqual([len(body) for body in requests_sent], [1, 1, 1])
+        self.assertEqual([len(body[0]['to']) for body in requests_sent], [100, 100, 50])
+        recipients = {token for body in requests_sent for token in body[0]['to']}
+        self.assertNotIn("ExponentPushToken[token-far]", recipients)
+        self.assertEqual(len(recipients), 250)
+        self.assertEqual(NotificationOutbox.query.one().status, NotificationOutbox.SENT)
+
+    def test_retry_skips_tokens_that_already_got_a_ticket(self):
+        self.add_nearby_users(150)
+        outbox.enqueue_nearby_notification(41.015137, 28.979530, 5.0, "New", "Body")
+        db.session.commit()
+        self.session.post.side_effect = [
+            expo_response(tickets=[{"status": "ok", "id": f"ticket-{i}"} for i in range(100)]),
+            expo_response(status_code=502),
+        ]
+        now = datetime.now(UTC)
+
+        outbox.dispatch_pending('worker', now=now)
+        row = NotificationOutbox.query.one()
+        self.assertEqual(row.status, NotificationOutbox.PENDING)
+        self.assertEqual(len(json.loads(row.tickets)), 100)
+
+        self.session.post.reset_mock(side_effect=True)
+        self.session.post.side_effect = lambda *args, **kwargs: expo_response(
+            tickets=[{"status": "ok", "id": token} for token in kwargs['json'][0]['to']]
+        )
+        outbox.dispatch_pending('worker', now=now + timedelta(seconds=outbox.RETRY_BASE_SECONDS))
+
+        self.assertEqual(len(self.session.post.call_args.kwargs['json'][0]['to']), 50)
+        db.session.refresh(row)
+        self.assertEqual(row.status, NotificationOutbox.SENT)
+        self.assertEqual(len(json.loads(row.tickets)), 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,14 @@
 
 import unittest
 from decimal import Decimal
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
+from unittest.mock import patch
 from flask import Flask
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash
 from werkzeug.datastructures import FileStorage, MultiDict
 from io import BytesIO
-from src.models import db, User, Restaurant, Listing, UserCart, Purchase
+from src.models import db, User, Restaurant, Listing, UserCart, Purchase, CustomerAddress
 from src.models.purchase_model import PurchaseStatus
 from src.services.purchase_service import (
     create_purchase_order_service,
@@ -326,5 +328,111 @@ class TestPurchaseService(unittest.TestCase):
         self.assertEqual(response["pagination"]["total_orders"], 2)
 
 
+class TestCheckoutPipeline(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add(CustomerAddress(
+            user_id=1, title="Home", street="Main Street", district="Kadikoy", province="Istanbul",
+            country="Turkey", latitude=Decimal('40.99'), longitude=Decimal('29.02'), is_primary=True
+        ))
+        self.restaurants = []
+        for restaurant_id in (1, 2):
+            restaurant = Restaurant(
+                id=restaurant_id, owner_id=10 + restaurant_id, restaurantName=f"Restaurant {restaurant_id}",
+                category="Test", longitude=Decimal('29.02'), latitude=Decimal('40.99'),
+                listings=3, flash_deals_available=True
+            )
+            db.session.add(restaurant)
+            self.restaurants.append(restaurant)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_to_cart(self, restaurant_id, stock, quantity, price='10'):
+        listing = Listing(
+            restaurant_id=restaurant_id, title=f"Item {stock}/{quantity}", original_price=Decimal(price),
+            pick_up_price=Decimal(price), count=stock, consume_within=12,
+            expires_at=datetime.now(UTC) + timedelta(hours=12)
+        )
+        db.session.add(listing)
+        db.session.flush()
+        db.session.add(UserCart(user_id=1, listing_id=listing.id, restaurant_id=restaurant_id, count=quantity))
+        db.session.commit()
+        return listing.id
+
+    def count_statements(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        return statements
+
+    def test_checkout_takes_stock_and_clears_the_cart(self):
+        sold_out = self.add_to_cart(1, stock=2, quantity=2)
+        partial = self.add_to_cart(2, stock=5, quantity=1)
+
+        with patch.object(db.session, 'commit', wraps=db.session.commit) as mock_commit:
+            response, status = create_purchase_order_service(1, {})
+
+        self.assertEqual(status, 201)
+        self.assertEqual(mock_commit.call_count, 1)
+        self.assertEqual([p["listing_id"] for p in response["purchases"]], [sold_out, partial])
+        self.assertEqual(response["purchases"][0]["total_price"], "20.00")
+        self.assertEqual((db.session.get(Listing, sold_out).count, db.session.get(Listing, partial).count), (0, 4))
+        self.assertEqual([db.session.get(Restaurant, i).listings for i in (1, 2)], [2, 3])
+        self.assertEqual(UserCart.query.count(), 0)
+        self.assertEqual(Purchase.query.count(), 2)
+
+    def test_statement_count_does_not_grow_per_lookup(self):
+        for index in range(6):
+            self.add_to_cart(1 + index % 2, stock=10, quantity=1)
+        statements = self.count_statements()
+
+        response, status = create_purchase_order_service(1, {"flashdealsactivated": 1})
+
+        self.assertEqual(status, 201)
+        self.assertEqual(len(response["purchases"]), 6)
+        selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+        # Cart join, address and the remaining stock of the bought listings
+        self.assertEqual(len(selects), 3)
+        self.assertEqual(db.session.get(Restaurant, 1).flash_deals_count, 1)
+
+    def test_concurrent_sale_of_the_last_items_is_rejected(self):
+        listing_id = self.add_to_cart(1, stock=3, quantity=2)
+        # Another checkout takes stock after this cart was loaded but before the update
+        original = db.session.execute
+
+        def execute(statement, *args, **kwargs):
+            if getattr(statement, 'is_update', False) and statement.table.name == 'listings':
+                original(Listing.__table__.update().where(Listing.id == listing_id).values(count=1))
+            return original(statement, *args, **kwargs)
+
+        with patch.object(db.session, 'execute', side_effect=execute):
+            response, status = create_purchase_order_service(1, {})
+
+        self.assertEqual(status, 400)
+        self.assertIn("Not enough stock", response["message"])
+        self.assertEqual(Purchase.query.count(), 0)
+        self.assertEqual(UserCart.query.count(), 1)
+
+    def test_insufficient_stock_is_rejected_before_writing(self):
+        self.add_to_cart(1, stock=1, quantity=2)
+
+        response, status = create_purchase_order_service(1, {})
+
+        self.assertEqual(status, 400)
+        self.assertIn("Only 1 left in stock", response["message"])
+        self.assertEqual(Purchase.query.count(), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from flask import Flask
+from scipy import sparse
+from src.models import db, Purchase, Listing, Restaurant, PurchaseStatus
+from src.services.recommendation_system_service import (
+    RecommendationSystemService,
+    get_model_cache,
+    record_completed_purchase
+)
+
+
+class TestRecommendationModelCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for restaurant_id in (1, 2):
+            db.session.add(Restaurant(
+                id=restaurant_id, owner_id=1, restaurantName=f"Restaurant {restaurant_id}",
+                category="Test", longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+            ))
+        for listing_id in range(1, 5):
+            db.session.add(Listing(
+                id=listing_id, restaurant_id=1 if listing_id <= 2 else 2, title=f"Listing {listing_id}",
+                original_price=Decimal('20.00'), consume_within=12,
+                expires_at=datetime.now(UTC) + timedelta(hours=12)
+            ))
+        # Users 1 and 2 buy listings 1 and 2 together; user 3 buys listings 3 and 4
+        for user_id, listing_id in [(1, 1), (1, 2), (2, 1), (2, 2), (3, 3), (3, 4)]:
+            self.add_purchase(user_id, listing_id)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_purchase(self, user_id, listing_id, quantity=1):
+        purchase = Purchase(
+            user_id=user_id, listing_id=listing_id, restaurant_id=1 if listing_id <= 2 else 2,
+            quantity=quantity, total_price=Decimal('10.00'), status=PurchaseStatus.COMPLETED
+        )
+        db.session.add(purchase)
+        return purchase
+
+    def test_model_is_built_once_and_reused(self):
+        cache = get_model_cache('listing')
+        first = cache.get()
+        second = cache.get()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.version, 1)
+        self.assertEqual(sorted(first.item_ids), [1, 2, 3, 4])
+
+    def test_recorded_purchase_produces_new_version(self):
+        cache = get_model_cache('listing')
+        before = cache.get()
+
+        purchase = self.add_purchase(4, 4, quantity=3)
+        db.session.commit()
+        record_completed_purchase(purchase)
+        after = cache.get()
+
+        self.assertGreater(after.version, before.version)
+        self.assertIn(4, after.user_index)
+        self.assertEqual(after.matrix[after.item_index[4], after.user_index[4]], 3)
+        # The previous snapshot is left untouched for readers still holding it
+        self.assertNotIn(4, before.user_index)
+
+    def test_rebuild_matches_incremental_state(self):
+        cache = get_model_cache('listing')
+        cache.get()
+        purchase = self.add_purchase(1, 3)
+        db.session.commit()
+        record_completed_purchase(purchase)
+        incremental = cache.get()
+
+        rebuilt = cache.rebuild()
+
+        self.assertEqual(
+            incremental.matrix[incremental.item_index[3], incremental.user_index[1]],
+            rebuilt.matrix[rebuilt.item_index[3], rebuilt.user_index[1]]
+        )
+
+    def test_matrix_is_sparse_and_similarity_is_cosine(self):
+        snapshot = get_model_cache('listing').get()
+
+        self.assertTrue(sparse.issparse(snapshot.matrix))
+        self.assertEqual(snapshot.matrix.nnz, 6)
+        similar = snapshot.similar_items(3, k=10)
+        self.assertEqual([item_id for item_id, _ in similar], [4])
+        self.assertAlmostEqual(similar[0][1], 1.0)
+
+    def test_listing_recommendations_use_cached_model(self):
+        response, status = RecommendationSystemService.get_recommendations_for_listing(1)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response["data"][0], 2)
+        self.assertEqual(get_model_cache('listing').version, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ from unittest.mock import patch, MagicMock
 from decimal import Decimal
 from flask import Flask
 from datetime import datetime, UTC
-from src.models import db, User, CustomerAddress, Restaurant
+from src.models import db, User, CustomerAddress, Restaurant, NotificationOutbox
 from src.services.restaurant_notification_service import notify_users_about_new_restaurant, calculate_distance
 
 
@@ -54,12 +54,14 @@ class TestRestaurantNotificationService(unittest.TestCase):
         db.drop_all()
         self.app_context.pop()
 
-    @patch('src.services.notification_service.NotificationService.send_notification_to_user')
-    def test_notify_users_about_new_restaurant(self, mock_send_notification):
-        mock_send_notification.return_value = True
+    @patch('requests.post')
+    def test_notify_users_about_new_restaurant(self, mock_post):
         result = notify_users_about_new_restaurant(1)
         self.assertEqual(result, 1)
-        mock_send_notification.assert_called_once()
+        mock_post.assert_not_called()
+        notification = NotificationOutbox.query.one()
+        self.assertEqual(notification.channel, NotificationOutbox.CHANNEL_NEARBY)
+        self.assertEqual(notification.payload_data["restaurant_id"], 1)
 
     def test_notify_users_nonexistent_restaurant(self):
         result = notify_users_about_new_restaurant(999)
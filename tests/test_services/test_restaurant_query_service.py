@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from unittest.mock import patch
+from flask import Flask
+from src.models import db, Restaurant, Listing
+from src.services import restaurant_query_service
+from src.services.restaurant_query_service import parse_query, find_restaurants, plan_query
+from src.services.restaurant_service import get_restaurants_in_proximity, discover_restaurants_service
+
+
+class TestRestaurantQueryService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Three restaurants in Kadikoy/Besiktas (within 10 km of the origin) and one in Ankara
+        self.kadikoy = self.add_restaurant("Kadıköy Pizza", 40.990, 29.025, "Italian", "4.5", pickup=True)
+        self.moda = self.add_restaurant("Moda Köfte", 40.985, 29.030, "Turkish", "3.9", delivery=True)
+        self.besiktas = self.add_restaurant("Beşiktaş Pizza", 41.043, 29.007, "Italian", "4.8", pickup=True)
+        self.ankara = self.add_restaurant("Ankara Pizza", 39.925, 32.866, "Italian", "5.0", pickup=True)
+
+        db.session.add(Listing(
+            restaurant_id=self.besiktas.id, title="Margherita", original_price=Decimal('10'), count=3,
+            consume_within=12, expires_at=datetime.now(UTC) + timedelta(hours=12)
+        ))
+        db.session.add(Listing(
+            restaurant_id=self.kadikoy.id, title="Old slice", original_price=Decimal('10'), count=3,
+            consume_within=12, expires_at=datetime.now(UTC) - timedelta(hours=1)
+        ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_restaurant(self, name, lat, lon, category, rating, **kwargs):
+        restaurant = Restaurant(
+            owner_id=1, restaurantName=name, category=category, rating=Decimal(rating),
+            latitude=Decimal(str(lat)), longitude=Decimal(str(lon)), **kwargs
+        )
+        db.session.add(restaurant)
+        db.session.commit()
+        return restaurant
+
+    def names(self, page):
+        return [match.restaurant.restaurantName for match in page.matches]
+
+    def test_proximity_filters_are_applied(self):
+        response, status = get_restaurants_in_proximity(40.991, 29.026, 10, filters={"category": "italian"})
+        self.assertEqual(status, 200)
+        self.assertEqual([r["restaurantName"] for r in response["restaurants"]], ["Kadıköy Pizza", "Beşiktaş Pizza"])
+
+        response, _ = get_restaurants_in_proximity(40.991, 29.026, 10, filters={"min_rating": 4.6})
+        self.assertEqual([r["restaurantName"] for r in response["restaurants"]], ["Beşiktaş Pizza"])
+
+        response, _ = get_restaurants_in_proximity(40.991, 29.026, 10, filters={"delivery": True})
+        self.assertEqual([r["restaurantName"] for r in response["restaurants"]], ["Moda Köfte"])
+
+        response, _ = get_restaurants_in_proximity(40.991, 29.026, 10, filters={"in_stock": True})
+        self.assertEqual([r["restaurantName"] for r in response["restaurants"]], ["Beşiktaş Pizza"])
+
+        _, status = get_restaurants_in_proximity(40.991, 29.026, 10, filters={"min_rating": "high"})
+        self.assertEqual(status, 400)
+
+    def test_both_plans_return_the_same_results(self):
+        query = parse_query({"query": "pizza", "latitude": 40.991, "longitude": 29.026, "order": "distance"})
+        results = {}
+        for plan in ('text', 'geo'):
+            with patch.object(restaurant_query_service, 'plan_query', return_value=plan):
+                results[plan] = self.names(find_restaurants(query))
+
+        self.assertEqual(results['text'], ["Kadıköy Pizza", "Beşiktaş Pizza"])
+        self.assertEqual(results['geo'], results['text'])
+
+    def test_planner_drives_with_the_smaller_index(self):
+        # Only one restaurant mentions köfte while three are nearby
+        self.assertEqual(plan_query(parse_query({"query": "kofte", "latitude": 40.991, "longitude": 29.026})), 'text')
+        # A 1 km circle holds fewer restaurants than the three that mention pizza
+        self.assertEqual(plan_query(parse_query({"query": "pizza", "latitude": 40.991, "longitude": 29.026,
+                                                 "radius": 1})), 'geo')
+        self.assertEqual(plan_query(parse_query({"query": "pizza"})), 'text')
+
+    def test_cursor_pagination(self):
+        seen = []
+        cursor = None
+        while True:
+            response, status = discover_restaurants_service({"query": "pizza", "limit": "1", "cursor": cursor})
+            self.assertEqual(status, 200)
+            seen.extend(r["restaurantName"] for r in response["restaurants"])
+            cursor = response["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(seen), ["Ankara Pizza", "Beşiktaş Pizza", "Kadıköy Pizza"])
+        self.assertEqual(len(seen), 3)
+
+    def test_invalid_queries(self):
+        for params in ({}, {"latitude": "41"}, {"query": "pizza", "order": "distance"}, {"query": "x", "cursor": "??"}):
+            _, status = discover_restaurants_service(params)
+            self.assertEqual(status, 400, params)
+
+
+if __name__ == '__main__':
+    unittest.main()
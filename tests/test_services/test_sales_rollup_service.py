@@ -0,0 +1,136 @@
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Flask
+from sqlalchemy import event
+from src.models import db, User, Restaurant, Purchase, PurchaseStatus, SalesRollup, HourlySales
+from src.services.sales_rollup_service import backfill_sales_rollups, sales_totals
+from src.services.analytics_service import RestaurantAnalyticsService
+from src.schedulers.analytics_scheduler import run_rollup_job
+
+
+class TestSalesRollupService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add(User(name="Customer", email="customer@test.com", phone_number="+905550000001", password="x"))
+        for name in ("Simitci", "Firin"):
+            db.session.add(Restaurant(owner_id=1, restaurantName=name, category="Bakery",
+                                      latitude=Decimal('41'), longitude=Decimal('29')))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_purchase(self, restaurant_id, quantity, price, day, district=None, status=PurchaseStatus.ACCEPTED):
+        purchase = Purchase(user_id=1, restaurant_id=restaurant_id, quantity=quantity, total_price=Decimal(price),
+                            status=status, delivery_district=district, purchase_date=day)
+        db.session.add(purchase)
+        db.session.commit()
+        return purchase
+
+    def rollups(self):
+        rows = [
+            (row.restaurant_id, row.period, str(row.period_start), row.district, row.orders, row.units,
+             Decimal(row.revenue).quantize(Decimal('0.01')))
+            for row in SalesRollup.query.all()
+        ] + [
+            (row.restaurant_id, 'hour', str(row.hour_start), '', row.orders, row.units,
+             Decimal(row.revenue).quantize(Decimal('0.01')))
+            for row in HourlySales.query.all()
+        ]
+        return sorted(rows)
+
+    def test_completing_a_purchase_updates_day_and_month(self):
+        purchase = self.add_purchase(1, 2, '25.00', datetime(2025, 5, 10, 12), district="Kadikoy")
+        self.assertEqual(SalesRollup.query.count(), 0)
+
+        purchase.update_status(PurchaseStatus.COMPLETED)
+        db.session.commit()
+        second = self.add_purchase(1, 1, '10.50', datetime(2025, 5, 11, 9))
+        second.update_status(PurchaseStatus.COMPLETED)
+        db.session.commit()
+
+        totals = sales_totals([1], date(2025, 5, 1))
+        self.assertEqual((totals.orders, totals.units, totals.revenue), (2, 3, Decimal('35.50')))
+        self.assertEqual(totals.regions, {"Kadikoy": 1})
+        self.assertEqual(sales_totals([1], date(2025, 5, 10), period='day').units, 2)
+        self.assertEqual(sales_totals([2], date(2025, 5, 1)).orders, 0)
+
+    def test_rolled_back_completion_is_not_counted(self):
+        purchase = self.add_purchase(1, 2, '25.00', datetime(2025, 5, 10, 12))
+        purchase.update_status(PurchaseStatus.COMPLETED)
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual(SalesRollup.query.count(), 0)
+
+    def test_backfill_matches_the_incremental_rollups(self):
+        for restaurant_id, quantity, price, day, district in (
+                (1, 2, '25.00', datetime(2025, 4, 30, 23), "Kadikoy"),
+                (1, 1, '10.00', datetime(2025, 5, 1, 0, 30), "Kadikoy"),
+                (1, 3, '30.00', datetime(2025, 5, 1, 18), None),
+                (2, 5, '55.55', datetime(2025, 5, 20, 8), "Besiktas")):
+            self.add_purchase(restaurant_id, quantity, price, day, district, status=PurchaseStatus.COMPLETED)
+        self.add_purchase(1, 9, '90.00', datetime(2025, 5, 2), status=PurchaseStatus.REJECTED)
+        incremental = self.rollups()
+
+        SalesRollup.query.delete()
+        HourlySales.query.delete()
+        db.session.commit()
+        self.assertEqual(backfill_sales_rollups(), len(incremental))
+        self.assertEqual(self.rollups(), incremental)
+
+        # Rebuilding May alone leaves April alone
+        SalesRollup.query.filter(SalesRollup.period_start >= date(2025, 5, 1)).delete()
+        HourlySales.query.filter(HourlySales.hour_start >= datetime(2025, 5, 1)).delete()
+        db.session.commit()
+        backfill_sales_rollups(date(2025, 5, 15), date(2025, 5, 31))
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_first_rollup_job_backfills_the_whole_history(self):
+        self.add_purchase(1, 2, '25.00', datetime(2019, 3, 10, 12), status=PurchaseStatus.COMPLETED)
+        SalesRollup.query.delete()
+        HourlySales.query.delete()
+        db.session.commit()
+
+        run_rollup_job()
+        self.assertEqual(sales_totals([1], date(2019, 3, 1)).units, 2)
+
+        # Once rollups exist only the recent months are rebuilt
+        SalesRollup.query.filter(SalesRollup.period == 'day').delete()
+        db.session.commit()
+        run_rollup_job()
+        self.assertEqual(sales_totals([1], date(2019, 3, 10), period='day').orders, 0)
+
+    def test_dashboard_cost_does_not_grow_with_orders(self):
+        def dashboard_statements():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            RestaurantAnalyticsService.get_owner_analytics(1)
+            event.remove(db.engine, 'before_cursor_execute', listener)
+            return len(statements)
+
+        today = datetime.utcnow()
+        self.add_purchase(1, 1, '10.00', today, status=PurchaseStatus.COMPLETED)
+        few = dashboard_statements()
+        for _ in range(20):
+            self.add_purchase(2, 1, '10.00', today, district="Moda", status=PurchaseStatus.COMPLETED)
+
+        self.assertEqual(dashboard_statements(), few)
+        self.assertEqual(RestaurantAnalyticsService.get_owner_analytics(1)[0]["data"]["monthly_stats"]
+                         ["total_products_sold"], 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
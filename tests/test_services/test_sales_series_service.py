@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from flask import Flask
+from src.models import db, User, Restaurant, Purchase, PurchaseStatus
+from src.services.sales_series_service import parse_range, bucket_edges, bucket_count, sales_series, MAX_POINTS
+from src.services.analytics_service import RestaurantAnalyticsService
+
+
+class TestSalesSeriesRange(unittest.TestCase):
+    def test_week_buckets_start_on_monday(self):
+        # 2025-05-07 is a Wednesday
+        edges = bucket_edges(datetime(2025, 5, 7, 15), datetime(2025, 5, 20), 'week')
+        self.assertEqual([str(edge) for edge in edges],
+                         ['2025-05-05T00:00:00', '2025-05-12T00:00:00', '2025-05-19T00:00:00',
+                          '2025-05-26T00:00:00'])
+
+    def test_month_buckets_round_the_range_out(self):
+        edges = bucket_edges(datetime(2025, 1, 15), datetime(2025, 3, 1), 'month')
+        self.assertEqual([str(edge) for edge in edges],
+                         ['2025-01-01T00:00:00', '2025-02-01T00:00:00', '2025-03-01T00:00:00'])
+
+    def test_auto_bucket_keeps_the_series_small(self):
+        now = datetime(2025, 6, 1)
+        self.assertEqual(parse_range({}, now), (datetime(2025, 5, 2), now, 'hour'))
+        _, _, bucket = parse_range({'start': '2024-06-01', 'end': '2025-06-01'}, now)
+        self.assertEqual(bucket, 'day')
+
+    def test_invalid_ranges_are_rejected(self):
+        now = datetime(2025, 6, 1)
+        for params in ({'start': 'yesterday'},
+                       {'start': '2025-06-02', 'end': '2025-06-01'},
+                       {'bucket': 'minute'},
+                       {'start': '2024-01-01', 'end': '2025-06-01', 'bucket': 'hour'}):
+            with self.assertRaises(ValueError, msg=params):
+                parse_range(params, now)
+        self.assertEqual(len(bucket_edges(datetime(2025, 1, 1), datetime(2025, 3, 25, 8), 'hour')) - 1, MAX_POINTS)
+
+    def test_huge_ranges_are_refused_without_building_buckets(self):
+        now = datetime(2025, 6, 1)
+        for bucket in ('auto', 'month'):
+            with self.assertRaises(ValueError):
+                parse_range({'start': '0001-01-01', 'end': '9999-12-31', 'bucket': bucket}, now)
+        _, _, bucket = parse_range({'start': '1950-01-01', 'end': '2025-06-01'}, now)
+        self.assertEqual(bucket, 'month')
+
+    def test_bucket_count_matches_the_edges(self):
+        start, end = datetime(2025, 1, 15, 10, 30), datetime(2025, 7, 1)
+        for bucket in ('hour', 'day', 'week', 'month'):
+            self.assertEqual(bucket_count(start, end, bucket), len(bucket_edges(start, end, bucket)) - 1, bucket)
+
+
+class TestSalesSeriesService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for index in (1, 2):
+            db.session.add(User(name=f"Owner {index}", email=f"owner{index}@test.com",
+                                phone_number=f"+90555000000{index}", password="x", role="owner"))
+        for owner_id, name in ((1, "Simitci"), (1, "Firin"), (2, "Pastane")):
+            db.session.add(Restaurant(owner_id=owner_id, restaurantName=name, category="Bakery",
+                                      latitude=Decimal('41'), longitude=Decimal('29')))
+        db.session.commit()
+
+        for restaurant_id, quantity, price, moment in (
+                (1, 2, '20.00', datetime(2025, 5, 5, 9, 15)),
+                (1, 1, '10.00', datetime(2025, 5, 5, 9, 45)),
+                (2, 3, '30.00', datetime(2025, 5, 5, 18)),
+                (2, 1, '12.50', datetime(2025, 5, 7, 8)),
+                (3, 5, '99.00', datetime(2025, 5, 5, 10))):
+            db.session.add(Purchase(user_id=1, restaurant_id=restaurant_id, quantity=quantity,
+                                    total_price=Decimal(price), status=PurchaseStatus.COMPLETED,
+                                    purchase_date=moment))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_hourly_and_daily_series_agree(self):
+        start, end = datetime(2025, 5, 5), datetime(2025, 5, 8)
+        hourly = sales_series([1, 2], start, end, 'hour')
+        daily = sales_series([1, 2], start, end, 'day')
+
+        self.assertEqual(len(hourly.orders), 72)
+        self.assertEqual(hourly.orders[9], 2)
+        self.assertEqual(daily.orders.tolist(), [3, 0, 1])
+        self.assertEqual(daily.units.tolist(), [6, 0, 1])
+        self.assertEqual(daily.revenue.tolist(), [60.0, 0.0, 12.5])
+        self.assertEqual((hourly.orders.sum(), hourly.units.sum(), hourly.revenue.sum()),
+                         (daily.orders.sum(), daily.units.sum(), daily.revenue.sum()))
+
+    def test_owner_series_covers_only_owned_restaurants(self):
+        response, status = RestaurantAnalyticsService.get_sales_timeseries(
+            1, {'start': '2025-05-01', 'end': '2025-06-01', 'bucket': 'week'})
+
+        self.assertEqual(status, 200)
+        data = response['data']
+        self.assertEqual(data['restaurant_ids'], [1, 2])
+        self.assertEqual([point['start'] for point in data['points']][:2],
+                         ['2025-04-28T00:00:00', '2025-05-05T00:00:00'])
+        self.assertEqual(data['totals'], {'orders': 4, 'units': 7, 'revenue': 72.5})
+
+        response, status = RestaurantAnalyticsService.get_sales_timeseries(
+            1, {'start': '2025-05-01', 'end': '2025-06-01', 'restaurant_id': '2'})
+        self.assertEqual((status, response['data']['bucket'], response['data']['totals']['orders']), (200, 'hour', 2))
+
+    def test_other_restaurants_and_bad_ranges_are_refused(self):
+        _, status = RestaurantAnalyticsService.get_sales_timeseries(1, {'restaurant_id': '3'})
+        self.assertEqual(status, 403)
+        _, status = RestaurantAnalyticsService.get_sales_timeseries(1, {'restaurant_id': 'abc'})
+        self.assertEqual(status, 400)
+        response, status = RestaurantAnalyticsService.get_sales_timeseries(1, {'bucket': 'minute'})
+        self.assertEqual(status, 400)
+        self.assertIn('bucket', response['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
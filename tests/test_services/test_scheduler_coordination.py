@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from flask import Flask
+from src.models import db, SchedulerLease
+from src.schedulers.coordination import acquire_lease, release_lease, run_exclusive, job_metrics
+
+
+class TestSchedulerCoordination(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_only_one_owner_holds_the_lease(self):
+        self.assertTrue(acquire_lease('job', 60, owner='worker-1'))
+        self.assertFalse(acquire_lease('job', 60, owner='worker-2'))
+        # The holder can renew its own lease
+        self.assertTrue(acquire_lease('job', 60, owner='worker-1'))
+
+    def test_expired_lease_can_be_taken_over(self):
+        past = datetime.now(UTC) - timedelta(minutes=5)
+        self.assertTrue(acquire_lease('job', 60, owner='worker-1', now=past))
+
+        self.assertTrue(acquire_lease('job', 60, owner='worker-2'))
+        self.assertEqual(db.session.get(SchedulerLease, 'job').owner, 'worker-2')
+
+    def test_released_lease_is_free(self):
+        acquire_lease('job', 60, owner='worker-1')
+        release_lease('job', owner='worker-1')
+
+        self.assertTrue(acquire_lease('job', 60, owner='worker-2'))
+
+    def test_job_runs_once_per_lease_and_records_metrics(self):
+        runs = []
+
+        def job():
+            runs.append(1)
+            return 42
+
+        self.assertTrue(run_exclusive('job', job, 60, owner='worker-1'))
+        self.assertFalse(run_exclusive('job', job, 60, owner='worker-2'))
+
+        self.assertEqual(len(runs), 1)
+        metrics = job_metrics()[0]
+        self.assertEqual(metrics["run_count"], 1)
+        self.assertEqual(metrics["last_row_count"], 42)
+        self.assertEqual(metrics["last_status"], 'SUCCESS')
+        self.assertIsNotNone(metrics["last_duration_ms"])
+
+    def test_failed_job_releases_the_lease(self):
+        def job():
+            raise RuntimeError("boom")
+
+        self.assertTrue(run_exclusive('job', job, 60, owner='worker-1'))
+
+        self.assertEqual(job_metrics()[0]["last_status"], 'FAILED')
+        self.assertTrue(acquire_lease('job', 60, owner='worker-2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
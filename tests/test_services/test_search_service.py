@@ -1,9 +1,11 @@
 import unittest
+from datetime import datetime, timedelta, UTC
 from decimal import Decimal
+from unittest.mock import patch
 from flask import Flask
 from werkzeug.security import generate_password_hash
 from src.models import db, Restaurant, Listing, User
-from src.services.search_service import search_restaurants, search_listings
+from src.services.search_service import search_restaurants, search_listings, page_bounds
 
 
 class TestSearchService(unittest.TestCase):
@@ -201,5 +203,87 @@ class TestSearchService(unittest.TestCase):
         self.assertEqual(len(results), 0)
 
 
+class TestListingSearchRanking(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for restaurant_id in (1, 2):
+            db.session.add(Restaurant(
+                id=restaurant_id, owner_id=1, restaurantName=f"Restaurant {restaurant_id}", category="Test",
+                longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_listing(self, title, restaurant_id=1, count=5, pick_up_price='10', hours_left=24, hours_old=0):
+        now = datetime.now(UTC)
+        listing = Listing(
+            restaurant_id=restaurant_id, title=title, original_price=Decimal('10'),
+            pick_up_price=Decimal(pick_up_price), count=count, consume_within=hours_left,
+            created_at=now - timedelta(hours=hours_old), expires_at=now + timedelta(hours=hours_left)
+        )
+        db.session.add(listing)
+        db.session.commit()
+        return listing
+
+    def test_expired_and_sold_out_listings_are_excluded(self):
+        self.add_listing("Pizza Margherita")
+        self.add_listing("Pizza Sold Out", count=0)
+        self.add_listing("Pizza Expired", hours_left=-1, hours_old=10)
+
+        results = search_listings("pizza", 1)
+
+        self.assertEqual([listing["title"] for listing in results], ["Pizza Margherita"])
+        self.assertEqual(results[0]["original_price"], 10.0)
+        self.assertNotIn("price", results[0])
+
+    def test_ranking_prefers_discounted_fresh_listings(self):
+        self.add_listing("Pizza Old", pick_up_price='10', hours_left=2, hours_old=22)
+        self.add_listing("Pizza Deal", pick_up_price='5')
+        self.add_listing("Pizza Full Price", pick_up_price='10')
+
+        results = search_listings("pizza", 1)
+
+        self.assertEqual([listing["title"] for listing in results], ["Pizza Deal", "Pizza Full Price", "Pizza Old"])
+        self.assertEqual(results[0]["discount"], 0.5)
+
+    def test_sold_out_matches_do_not_use_up_the_candidate_cap(self):
+        # The sold-out listing has the best text match, the deal the weakest
+        self.add_listing("Pizza Pizza Pizza", count=0)
+        self.add_listing("Pizza Pizza", pick_up_price='10', hours_left=2, hours_old=22)
+        self.add_listing("Pizza", pick_up_price='3', restaurant_id=2)
+        self.assertEqual([listing["title"] for listing in search_listings("pizza")], ["Pizza", "Pizza Pizza"])
+
+        with patch('src.services.search_service.MAX_LISTING_CANDIDATES', 1), \
+                patch('src.services.search_service.LISTING_CHUNK_SIZE', 1):
+            self.assertEqual([listing["title"] for listing in search_listings("pizza")], ["Pizza Pizza"])
+
+    def test_page_bounds_are_clamped(self):
+        self.assertEqual(page_bounds(-3, 1000), (1, 100))
+        self.assertEqual(page_bounds(None, None), (1, 20))
+
+    def test_search_across_restaurants_with_pages(self):
+        for index in range(5):
+            self.add_listing(f"Salad {index}", restaurant_id=1 + index % 2)
+
+        self.assertEqual(len(search_listings("salad")), 5)
+        self.assertEqual(len(search_listings("salad", 2)), 2)
+        first = search_listings("salad", page=1, per_page=3)
+        second = search_listings("salad", page=2, per_page=3)
+        self.assertEqual(len(first) + len(second), 5)
+        self.assertFalse({listing["id"] for listing in first} & {listing["id"] for listing in second})
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
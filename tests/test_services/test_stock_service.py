@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from unittest.mock import patch, Mock
+from flask import Flask
+from src.models import db, User, Restaurant, Listing, StockHold, UserCart
+from src.services.cart_service import add_to_cart_service, update_cart_item_service, reset_cart_service
+from src.services.purchase_service import create_purchase_order_service
+from src.services.listing_freshness_service import expire_listings
+from src.services.stock_service import take_stock, return_stock, hold_stock, release_expired_holds
+from src.scripts.stock_stress_benchmark import create_benchmark_app, run_benchmark
+
+
+class TestStockService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['STOCK_HOLD_SECONDS'] = 600
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for index in (1, 2):
+            db.session.add(User(name=f"User {index}", email=f"user{index}@test.com",
+                                phone_number=f"+90555000000{index}", password="x"))
+        db.session.add(Restaurant(owner_id=1, restaurantName="Flash", category="Bakery", listings=1,
+                                  latitude=Decimal('41'), longitude=Decimal('29')))
+        db.session.add(Listing(restaurant_id=1, title="Simit", original_price=Decimal('10'), count=5,
+                               consume_within=12, expires_at=datetime.now(UTC) + timedelta(hours=12)))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def stock(self):
+        return db.session.query(Listing.count).filter(Listing.id == 1).scalar()
+
+    def test_take_stock_is_conditional(self):
+        self.assertTrue(take_stock(1, 5))
+        self.assertFalse(take_stock(1, 1))
+        return_stock(1, 2)
+        db.session.commit()
+        self.assertEqual(self.stock(), 2)
+
+    def test_holds_follow_the_cart(self):
+        self.assertEqual(add_to_cart_service(1, 1, 3)[1], 201)
+        self.assertEqual(self.stock(), 2)
+
+        # The other user only sees what is not held
+        response, status = add_to_cart_service(2, 1, 3)
+        self.assertEqual(status, 400)
+        self.assertIn("Available: 2", response["message"])
+
+        self.assertEqual(update_cart_item_service(1, 1, 4)[1], 200)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(StockHold.query.one().quantity, 4)
+
+        reset_cart_service(1)
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(StockHold.query.count(), 0)
+
+    def test_checkout_claims_the_held_units(self):
+        db.session.add(UserCart(user_id=1, listing_id=1, restaurant_id=1, count=5))
+        self.assertTrue(hold_stock(1, 1, 5))
+        db.session.commit()
+        self.assertEqual(self.stock(), 0)
+
+        with patch('src.services.purchase_service.CustomerAddress') as address:
+            address.query.filter_by.return_value.first.return_value = Mock(
+                street="Street", apartmentNo=None, doorNo=None, neighborhood=None,
+                title="Home", district="Kadikoy", province="Istanbul", country="Turkey"
+            )
+            response, status = create_purchase_order_service(1, {})
+
+        self.assertEqual(status, 201, response)
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(StockHold.query.count(), 0)
+        self.assertEqual(db.session.get(Restaurant, 1).listings, 0)
+
+    def checkout(self, user_id):
+        with patch('src.services.purchase_service.CustomerAddress') as address:
+            address.query.filter_by.return_value.first.return_value = Mock(
+                street="Street", apartmentNo=None, doorNo=None, neighborhood=None,
+                title="Home", district="Kadikoy", province="Istanbul", country="Turkey"
+            )
+            return create_purchase_order_service(user_id, {})
+
+    def test_sold_out_listing_is_counted_once_with_holds(self):
+        db.session.get(Restaurant, 1).listings = 3
+        db.session.get(Listing, 1).count = 4
+        db.session.commit()
+        for user_id in (1, 2):
+            self.assertEqual(add_to_cart_service(user_id, 1, 2)[1], 201)
+        self.assertEqual(self.stock(), 0)
+
+        # The first buyer leaves units held by the other cart, so the listing is still on
+        self.assertEqual(self.checkout(1)[1], 201)
+        self.assertEqual(db.session.get(Restaurant, 1).listings, 3)
+
+        self.assertEqual(self.checkout(2)[1], 201)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Restaurant, 1).listings, 2)
+
+    def test_removed_listings_drop_their_holds(self):
+        db.session.add(Listing(restaurant_id=1, title="Pogaca", original_price=Decimal('10'), count=5,
+                               consume_within=12, expires_at=datetime.now(UTC) + timedelta(hours=2)))
+        db.session.commit()
+        self.assertTrue(hold_stock(1, 1, 2))
+        self.assertTrue(hold_stock(2, 2, 1))
+        db.session.commit()
+
+        self.assertEqual(expire_listings(), (1, 0))
+        self.assertEqual([hold.listing_id for hold in StockHold.query.all()], [1])
+
+        self.assertEqual(Listing.delete_listing(1), (True, "Listing deleted successfully"))
+        self.assertEqual(StockHold.query.count(), 0)
+
+    def test_expired_holds_are_released(self):
+        self.assertTrue(hold_stock(1, 1, 2, now=datetime.now(UTC) - timedelta(hours=1)))
+        self.assertTrue(hold_stock(2, 1, 1))
+        db.session.commit()
+        self.assertEqual(self.stock(), 2)
+
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual([hold.user_id for hold in StockHold.query.all()], [2])
+
+
+class TestStockStress(unittest.TestCase):
+    def test_concurrent_buyers_never_oversell(self):
+        with tempfile.TemporaryDirectory() as directory:
+            app = create_benchmark_app(f"sqlite:///{os.path.join(directory, 'stress.db')}", hold_seconds=600)
+            for use_holds in (False, True):
+                result = run_benchmark(app, buyers=60, stock=25, use_holds=use_holds)
+                self.assertFalse(result['oversold'], result)
+                self.assertEqual(result['sold_units'], 25, result)
+                self.assertEqual(result['rejected'], 35, result)
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
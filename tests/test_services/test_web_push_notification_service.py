@@ -0,0 +1,118 @@
+import base64
+import json
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from flask import Flask
+from src.models import db, UserDevice
+from src.services.web_push_engine import WebPushEngine, get_web_push_engine, SENT
+from src.services.web_push_notification_service import WebPushNotificationService
+
+
+def b64url(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def vapid_private_key():
+    pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    return pem.decode()
+
+
+def subscription(endpoint):
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        encoding=serialization.Encoding.X962,
+        format=serialization.PublicFormat.UncompressedPoint
+    )
+    return {"endpoint": endpoint, "keys": {"p256dh": b64url(public_key), "auth": b64url(os.urandom(16))}}
+
+
+class TestWebPushNotificationService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['VAPID_PRIVATE_KEY'] = vapid_private_key()
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_web_device(self, user_id, endpoint):
+        device = UserDevice(user_id=user_id, push_token=f"web_{endpoint}", device_type="web",
+                            web_push_token=json.dumps(subscription(endpoint)), is_active=True)
+        db.session.add(device)
+        db.session.commit()
+        return device
+
+    def mock_sessions(self, engine, status_by_endpoint):
+        sessions = {}
+
+        def session(origin):
+            if origin not in sessions:
+                mock_session = MagicMock()
+                mock_session.post.side_effect = lambda endpoint, **kwargs: MagicMock(
+                    status_code=status_by_endpoint[endpoint], text=""
+                )
+                sessions[origin] = mock_session
+            return sessions[origin]
+
+        return patch.object(engine, 'session', side_effect=session), sessions
+
+    def test_vapid_headers_are_signed_once_per_origin(self):
+        engine = WebPushEngine(vapid_private_key())
+        with patch.object(engine._vapid, 'sign', wraps=engine._vapid.sign) as sign:
+            first = engine.vapid_headers("https://fcm.googleapis.com")
+            second = engine.vapid_headers("https://fcm.googleapis.com")
+            engine.vapid_headers("https://updates.push.services.mozilla.com")
+
+        self.assertEqual(first, second)
+        self.assertEqual(sign.call_count, 2)
+
+    def test_sessions_are_shared_per_origin(self):
+        engine = WebPushEngine(vapid_private_key())
+        self.assertIs(engine.session("https://fcm.googleapis.com"), engine.session("https://fcm.googleapis.com"))
+        self.assertIsNot(engine.session("https://fcm.googleapis.com"),
+                         engine.session("https://updates.push.services.mozilla.com"))
+
+    def test_user_devices_are_sent_concurrently_and_gone_ones_deactivated(self):
+        endpoints = {
+            "https://fcm.googleapis.com/fcm/send/a": 201,
+            "https://fcm.googleapis.com/fcm/send/b": 410,
+            "https://updates.push.services.mozilla.com/wpush/v2/c": 404,
+        }
+        devices = [self.add_web_device(1, endpoint) for endpoint in endpoints]
+        engine = get_web_push_engine()
+        patcher, sessions = self.mock_sessions(engine, endpoints)
+
+        with patcher:
+            success = WebPushNotificationService.send_notification_to_user_web(1, "Title", "Body", {"type": "test"})
+
+        self.assertTrue(success)
+        self.assertEqual(set(sessions), {"https://fcm.googleapis.com", "https://updates.push.services.mozilla.com"})
+        self.assertEqual(sessions["https://fcm.googleapis.com"].post.call_count, 2)
+        headers = sessions["https://fcm.googleapis.com"].post.call_args.kwargs['headers']
+        self.assertTrue(headers['Authorization'].startswith('vapid'))
+        self.assertEqual([db.session.get(UserDevice, device.id).is_active for device in devices], [True, False, False])
+
+    def test_engine_is_created_once_per_app(self):
+        self.assertIs(get_web_push_engine(), get_web_push_engine())
+        with patch('src.services.web_push_engine.WebPusher') as pusher:
+            pusher.return_value.send.return_value = MagicMock(status_code=201)
+            result = get_web_push_engine().send(subscription("https://fcm.googleapis.com/fcm/send/a"), "{}")
+        self.assertEqual(result, SENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from flask import Flask
+from src.models import db, ExpiringEntry
+from src.services.communication import auth_code_generator
+from src.utils.expiring_store import ExpiringStore, MemoryStore, SqlStore, get_expiring_store
+
+
+class TestMemoryStore(unittest.TestCase):
+    def test_incomplete_store_cannot_be_created(self):
+        class NoBuckets(ExpiringStore):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            NoBuckets()
+
+    def test_entries_expire_and_are_swept(self):
+        store = MemoryStore()
+        store.set("a", "1", ttl_seconds=-1)
+        store.set("b", "2", ttl_seconds=60)
+
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("b"), "2")
+        self.assertEqual(store.sweep(now=10 ** 12), 1)
+        self.assertEqual(len(store), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        store = MemoryStore(max_entries=2)
+        store.set("a", 1, 60)
+        store.set("b", 2, 60)
+        store.get("a")
+        store.set("c", 3, 60)
+
+        self.assertEqual((store.get("a"), store.get("b"), store.get("c")), (1, None, 3))
+
+    def test_buckets_do_not_evict_values(self):
+        store = MemoryStore(max_entries=2, max_buckets=2)
+        store.set("verification:a@example.com", "123456", 60)
+        for index in range(10):
+            store.consume(f"auth-rate:ip:10.0.0.{index}", capacity=3, refill_per_second=0.1)
+
+        self.assertEqual(store.get("verification:a@example.com"), "123456")
+        self.assertEqual(len(store), 3)
+
+    def test_token_bucket_refills_over_time(self):
+        store = MemoryStore()
+        results = [store.consume("ip", capacity=3, refill_per_second=0.1, now=100).allowed for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+        blocked = store.consume("ip", capacity=3, refill_per_second=0.1, now=105)
+        self.assertFalse(blocked.allowed)
+        self.assertAlmostEqual(blocked.retry_after, 5)
+        self.assertTrue(store.consume("ip", capacity=3, refill_per_second=0.1, now=110).allowed)
+
+
+class TestSqlStore(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['EXPIRING_STORE'] = 'sql'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_state_is_shared_between_store_instances(self):
+        # Two instances stand in for two workers reading the same table
+        first, second = SqlStore(), SqlStore()
+        first.set("code", "123456", 60)
+        self.assertEqual(second.get("code"), "123456")
+
+        self.assertTrue(first.consume("ip", 2, 0.01, now=100).allowed)
+        self.assertTrue(second.consume("ip", 2, 0.01, now=100).allowed)
+        self.assertFalse(first.consume("ip", 2, 0.01, now=100).allowed)
+
+        second.delete("code")
+        self.assertIsNone(first.get("code"))
+
+    def test_sweep_removes_expired_rows(self):
+        store = SqlStore()
+        store.set("old", "x", -1)
+        store.set("new", "y", 60)
+
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual([entry.key for entry in ExpiringEntry.query.all()], ["new"])
+
+    def test_verification_codes_use_the_configured_store(self):
+        self.assertIsInstance(get_expiring_store(), SqlStore)
+        auth_code_generator.store_verification_code("a@example.com", "123456")
+
+        self.assertEqual(auth_code_generator.verify_code("a@example.com", "000000"), (False, "Code does not match"))
+        self.assertEqual(auth_code_generator.verify_code("a@example.com", "123456"), (True, ""))
+        self.assertIsNone(auth_code_generator.get_stored_code("a@example.com"))
+
+    def test_ip_rate_limit(self):
+        results = [auth_code_generator.check_rate_limit_ip("10.0.0.1")[0]
+                   for _ in range(auth_code_generator.REQUEST_LIMIT + 1)]
+
+        self.assertEqual(results, [True] * auth_code_generator.REQUEST_LIMIT + [False])
+        self.assertTrue(auth_code_generator.check_rate_limit_ip("10.0.0.2")[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
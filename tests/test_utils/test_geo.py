@@ -0,0 +1,58 @@
+import unittest
+from decimal import Decimal
+import numpy as np
+from src.utils.geo import (
+    haversine_km,
+    haversine_distances_km,
+    pairwise_haversine_km,
+    to_float_array,
+    within_radius
+)
+
+
+class TestGeo(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.lats = rng.uniform(36.0, 42.0, 200)
+        self.lons = rng.uniform(26.0, 45.0, 200)
+
+    def test_vectorized_distances_match_scalar(self):
+        distances = haversine_distances_km(41.0, 29.0, self.lats, self.lons)
+        expected = [haversine_km(41.0, 29.0, lat, lon) for lat, lon in zip(self.lats, self.lons)]
+
+        np.testing.assert_allclose(distances, expected, rtol=1e-9)
+
+    def test_pairwise_distances_shape_and_values(self):
+        matrix = pairwise_haversine_km(self.lats[:3], self.lons[:3], self.lats, self.lons)
+
+        self.assertEqual(matrix.shape, (3, 200))
+        np.testing.assert_allclose(matrix[1], haversine_distances_km(self.lats[1], self.lons[1], self.lats, self.lons))
+        np.testing.assert_allclose(np.diag(matrix[:, :3]), 0, atol=1e-9)
+
+    def test_to_float_array_accepts_decimals(self):
+        values = to_float_array([Decimal('41.015137'), Decimal('28.979530')])
+
+        self.assertEqual(values.dtype, np.float64)
+        np.testing.assert_allclose(values, [41.015137, 28.979530])
+
+    def test_within_radius_sorts_and_filters(self):
+        ids, distances = within_radius(
+            41.0, 29.0, 10,
+            [1, 2, 3],
+            np.array([41.05, 41.0, 41.5]),
+            np.array([29.0, 29.01, 29.0]),
+            max_distances=np.array([np.inf, np.inf, np.inf])
+        )
+
+        self.assertEqual(ids.tolist(), [2, 1])
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_within_radius_empty_input(self):
+        ids, distances = within_radius(41.0, 29.0, 10, [], np.empty(0), np.empty(0))
+
+        self.assertEqual(len(ids), 0)
+        self.assertEqual(len(distances), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
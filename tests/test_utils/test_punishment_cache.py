@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from unittest.mock import patch
+from flask import Flask
+from src.models import db, Restaurant, RestaurantPunishment
+from src.utils.punishment_cache import get_punishment_cache, active_restaurant_ids, invalidate_punishment_status
+
+
+class TestPunishmentCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        for restaurant_id in (1, 2, 3):
+            db.session.add(Restaurant(
+                id=restaurant_id, owner_id=1, restaurantName=f"Restaurant {restaurant_id}",
+                category="Test", longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def punish(self, restaurant_id, end_date=None):
+        punishment = RestaurantPunishment(
+            restaurant_id=restaurant_id, reason="Test",
+            punishment_type='PERMANENT' if end_date is None else 'TEMPORARY',
+            start_date=datetime.now(UTC), end_date=end_date, created_by=1, is_active=True
+        )
+        db.session.add(punishment)
+        db.session.commit()
+        return punishment
+
+    def test_bulk_filter_drops_punished_restaurants(self):
+        self.punish(1)
+        self.punish(2, end_date=datetime.now(UTC) + timedelta(days=3))
+
+        self.assertEqual(active_restaurant_ids([3, 2, 1]), [3])
+        self.assertFalse(db.session.get(Restaurant, 1).is_active)
+        self.assertTrue(db.session.get(Restaurant, 3).can_accept_orders())
+
+    def test_status_reads_do_not_query_after_load(self):
+        self.punish(1)
+        cache = get_punishment_cache()
+        cache.reload()
+
+        with patch.object(cache, '_punishment_rows', side_effect=AssertionError("queried")):
+            self.assertFalse(cache.is_active(1))
+            self.assertTrue(cache.is_active(2))
+
+    def test_temporary_punishment_lapses_without_reload(self):
+        self.punish(1, end_date=datetime.now(UTC) + timedelta(days=1))
+        cache = get_punishment_cache()
+        self.assertFalse(cache.is_active(1))
+
+        with patch('src.utils.punishment_cache.time.time', return_value=(datetime.now(UTC) + timedelta(days=2)).timestamp()):
+            self.assertTrue(cache.is_active(1))
+
+    def test_invalidate_picks_up_revert(self):
+        punishment = self.punish(1)
+        self.assertFalse(db.session.get(Restaurant, 1).is_active)
+
+        punishment.is_reverted = True
+        punishment.is_active = False
+        db.session.commit()
+        invalidate_punishment_status(1)
+
+        self.assertTrue(db.session.get(Restaurant, 1).is_active)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from flask import Flask, Blueprint, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from src.utils.expiring_store import MemoryStore
+from src.utils.rate_limit import init_rate_limiter, get_rate_limit_store
+
+
+class TestRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key-with-enough-length'
+        self.app.config['RATE_LIMITS'] = {'search': (2, 60), 'static': None}
+        JWTManager(self.app)
+
+        search_bp = Blueprint('search', __name__)
+        search_bp.add_url_rule('/search', 'search', lambda: jsonify({"success": True}))
+        static_bp = Blueprint('static', __name__)
+        static_bp.add_url_rule('/logo', 'logo', lambda: jsonify({"success": True}))
+        api_v1 = Blueprint('api_v1', __name__, url_prefix='/v1')
+        api_v1.register_blueprint(search_bp)
+        api_v1.register_blueprint(static_bp)
+        self.app.register_blueprint(api_v1)
+        init_rate_limiter(self.app)
+        self.client = self.app.test_client()
+
+    def test_requests_over_the_limit_are_rejected(self):
+        first = self.client.get('/v1/search')
+        second = self.client.get('/v1/search')
+        third = self.client.get('/v1/search')
+
+        self.assertEqual([first.status_code, second.status_code, third.status_code], [200, 200, 429])
+        self.assertEqual(first.headers['X-RateLimit-Limit'], '2')
+        self.assertEqual(first.headers['X-RateLimit-Remaining'], '1')
+        self.assertEqual(third.headers['X-RateLimit-Remaining'], '0')
+        self.assertEqual(third.headers['Retry-After'], '30')
+
+    def test_clients_have_separate_buckets(self):
+        for _ in range(3):
+            self.client.get('/v1/search', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        self.assertEqual(self.client.get('/v1/search', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code, 200)
+
+        with self.app.app_context():
+            token = create_access_token(identity="7")
+        response = self.client.get('/v1/search', environ_base={'REMOTE_ADDR': '10.0.0.1'},
+                                   headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_forwarded_for_header_does_not_reset_the_limit(self):
+        statuses = [
+            self.client.get('/v1/search', environ_base={'REMOTE_ADDR': '10.0.0.1'},
+                            headers={'X-Forwarded-For': f'203.0.113.{index}'}).status_code
+            for index in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 429, 429])
+
+    def test_buckets_stay_in_memory_unless_sql_is_chosen(self):
+        self.app.config['EXPIRING_STORE'] = 'sql'
+        with self.app.app_context():
+            self.assertIsInstance(get_rate_limit_store(), MemoryStore)
+
+    def test_disabled_blueprint_is_not_limited(self):
+        responses = [self.client.get('/v1/logo') for _ in range(5)]
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertNotIn('X-RateLimit-Limit', responses[0].headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
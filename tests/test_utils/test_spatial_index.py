@@ -0,0 +1,120 @@
+import unittest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+from src.models import db, Restaurant, User
+from src.utils.spatial_index import RestaurantSpatialIndex, get_restaurant_index
+from src.services.restaurant_service import get_restaurants_in_proximity, get_flash_deals_service
+
+
+class TestRestaurantSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.owner = User(
+            name="Owner",
+            email="owner@test.com",
+            phone_number="+1234567890",
+            password=generate_password_hash("password"),
+            role="owner",
+            email_verified=True
+        )
+        db.session.add(self.owner)
+        db.session.commit()
+
+        # Kadikoy, Besiktas (~5 km away) and Ankara (~350 km away)
+        self.kadikoy = self._add_restaurant("Kadikoy", 40.990, 29.025, flash_deals_available=True)
+        self.besiktas = self._add_restaurant("Besiktas", 41.043, 29.007)
+        self.ankara = self._add_restaurant("Ankara", 39.925, 32.866, flash_deals_available=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _add_restaurant(self, name, lat, lon, **kwargs):
+        restaurant = Restaurant(
+            owner_id=self.owner.id,
+            restaurantName=name,
+            longitude=lon,
+            latitude=lat,
+            category="Test",
+            workingDays="Monday",
+            workingHoursStart="09:00",
+            workingHoursEnd="18:00",
+            **kwargs
+        )
+        db.session.add(restaurant)
+        db.session.commit()
+        return restaurant
+
+    def test_query_returns_sorted_hits_within_radius(self):
+        index = RestaurantSpatialIndex()
+        index.rebuild()
+
+        hits = index.query(40.991, 29.026, 10)
+
+        self.assertEqual([restaurant_id for restaurant_id, _ in hits], [self.kadikoy.id, self.besiktas.id])
+        self.assertLess(hits[0][1], hits[1][1])
+
+    def test_query_respects_max_delivery_distance(self):
+        self.besiktas.maxDeliveryDistance = 1.0
+        db.session.commit()
+        index = RestaurantSpatialIndex()
+        index.rebuild()
+
+        hits = index.query(40.991, 29.026, 10)
+
+        self.assertEqual([restaurant_id for restaurant_id, _ in hits], [self.kadikoy.id])
+
+    def test_index_follows_restaurant_writes(self):
+        index = get_restaurant_index()
+        index.rebuild()
+
+        new_restaurant = self._add_restaurant("Uskudar", 41.026, 29.015)
+        self.assertIn(new_restaurant.id, [rid for rid, _ in index.query(41.026, 29.015, 1)])
+
+        new_restaurant.latitude = 39.93
+        new_restaurant.longitude = 32.86
+        db.session.commit()
+        self.assertNotIn(new_restaurant.id, [rid for rid, _ in index.query(41.026, 29.015, 1)])
+        self.assertIn(new_restaurant.id, [rid for rid, _ in index.query(39.93, 32.86, 1)])
+
+        db.session.delete(new_restaurant)
+        db.session.commit()
+        self.assertEqual(index.query(39.93, 32.86, 0.1), [])
+
+    def test_query_across_antimeridian(self):
+        self._add_restaurant("Fiji", -17.0, 179.99)
+        index = RestaurantSpatialIndex()
+        index.rebuild()
+
+        hits = index.query(-17.0, -179.99, 10)
+
+        self.assertEqual(len(hits), 1)
+
+    def test_proximity_service_uses_index(self):
+        response, status = get_restaurants_in_proximity(40.991, 29.026, 10)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([r["id"] for r in response["restaurants"]], [self.kadikoy.id, self.besiktas.id])
+        self.assertIn("distance_km", response["restaurants"][0])
+
+    def test_flash_deals_service_only_returns_flash_restaurants(self):
+        response, status = get_flash_deals_service(40.991, 29.026, 30)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([r["id"] for r in response["restaurants"]], [self.kadikoy.id])
+
+        response, status = get_flash_deals_service(0, 0, 30)
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
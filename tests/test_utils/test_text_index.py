@@ -0,0 +1,93 @@
+import unittest
+from decimal import Decimal
+from flask import Flask
+from src.models import db, Restaurant
+from src.services.search_service import search_restaurants
+from src.utils.text_index import InvertedIndex, normalize, get_search_index
+
+
+class TestInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = InvertedIndex({'name': 3.0, 'description': 1.0})
+        self.index.add(1, {'name': "Şiş Köfte Evi", 'description': "Izgara"})
+        self.index.add(2, {'name': "Pizza Palace", 'description': "Köfte pizza"})
+        self.index.add(3, {'name': "İSKENDER Salonu", 'description': None}, group=7)
+
+    def test_turkish_case_folding_and_diacritics(self):
+        self.assertEqual(normalize("İSKENDER ŞİŞ ığdır"), "iskender sis igdir")
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("iskender").hits], [3])
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("sis kofte").hits], [1])
+
+    def test_prefix_matches_and_ranking(self):
+        result = self.index.search("köf")
+
+        self.assertEqual(result.total, 2)
+        # A title match outranks a description match
+        self.assertEqual([doc_id for doc_id, _ in result.hits], [1, 2])
+
+    def test_pagination_groups_and_removal(self):
+        self.assertEqual(self.index.search("kofte", limit=1, offset=1).hits[0][0], 2)
+        self.assertEqual(self.index.search("salon", group=7).total, 1)
+        self.assertEqual(self.index.search("salon", group=8).total, 0)
+
+        self.index.remove(1)
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("kofte").hits], [2])
+        self.assertNotIn("sis", self.index._words)
+
+
+class TestCatalogSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.add_restaurant(1, "Pizza Palace")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_restaurant(self, restaurant_id, name):
+        restaurant = Restaurant(
+            id=restaurant_id, owner_id=1, restaurantName=name, category="Test",
+            longitude=Decimal('28.979530'), latitude=Decimal('41.015137')
+        )
+        db.session.add(restaurant)
+        db.session.commit()
+        return restaurant
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.assertEqual([r["name"] for r in search_restaurants("pal")], ["Pizza Palace"])
+
+        sushi = self.add_restaurant(2, "Sushi Palace")
+        self.assertEqual(len(search_restaurants("palace")), 2)
+
+        sushi.restaurantName = "Sushi Bar"
+        db.session.commit()
+        self.assertEqual([r["name"] for r in search_restaurants("sushi")], ["Sushi Bar"])
+        self.assertEqual(len(search_restaurants("palace")), 1)
+
+        db.session.delete(sushi)
+        db.session.commit()
+        self.assertEqual(search_restaurants("sushi"), [])
+        self.assertEqual(len(get_search_index().restaurants), 1)
+
+    def test_pages(self):
+        for restaurant_id in range(2, 6):
+            self.add_restaurant(restaurant_id, f"Pizza {restaurant_id}")
+
+        first = search_restaurants("pizza", page=1, per_page=3)
+        second = search_restaurants("pizza", page=2, per_page=3)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({r["id"] for r in first} & {r["id"] for r in second})
+
+
+if __name__ == '__main__':
+    unittest.main()